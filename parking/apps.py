@@ -1,5 +1,116 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_save, post_save, post_delete
 
 
 class ParkingConfig(AppConfig):
     name = 'parking'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from parkinglot import authentication
+        from rest_framework.authtoken.models import Token
+        from . import (
+            availability, counters, locations, models, price_cache,
+            reports, response_cache, summaries, tasks)
+        post_save.connect(
+            availability.reservation_changed, sender=models.Reservation,
+            dispatch_uid='availability_reservation_saved')
+        post_delete.connect(
+            availability.reservation_changed, sender=models.Reservation,
+            dispatch_uid='availability_reservation_deleted')
+        post_save.connect(
+            counters.reservation_changed, sender=models.Reservation,
+            dispatch_uid='counters_reservation_saved')
+        post_delete.connect(
+            counters.reservation_changed, sender=models.Reservation,
+            dispatch_uid='counters_reservation_deleted')
+        pre_save.connect(
+            counters.venue_pre_save, sender=models.Venue,
+            dispatch_uid='counters_venue_pre_save')
+        post_save.connect(
+            counters.venue_changed, sender=models.Venue,
+            dispatch_uid='counters_venue_saved')
+        post_delete.connect(
+            counters.venue_changed, sender=models.Venue,
+            dispatch_uid='counters_venue_deleted')
+        pre_save.connect(
+            locations.venue_pre_save, sender=models.Venue,
+            dispatch_uid='locations_venue_pre_save')
+        post_save.connect(
+            locations.venue_saved, sender=models.Venue,
+            dispatch_uid='locations_venue_saved')
+        pre_save.connect(
+            locations.company_pre_save, sender=models.Company,
+            dispatch_uid='locations_company_pre_save')
+        post_save.connect(
+            locations.company_saved, sender=models.Company,
+            dispatch_uid='locations_company_saved')
+        post_delete.connect(
+            authentication.token_deleted, sender=Token,
+            dispatch_uid='authentication_token_deleted')
+        post_save.connect(
+            authentication.user_changed, sender=User,
+            dispatch_uid='authentication_user_saved')
+        post_delete.connect(
+            authentication.user_changed, sender=User,
+            dispatch_uid='authentication_user_deleted')
+        post_save.connect(
+            price_cache.price_changed, sender=models.LotPrice,
+            dispatch_uid='price_cache_price_saved')
+        post_delete.connect(
+            price_cache.price_changed, sender=models.LotPrice,
+            dispatch_uid='price_cache_price_deleted')
+        pre_save.connect(
+            reports.reservation_pre_save, sender=models.Reservation,
+            dispatch_uid='reports_reservation_pre_save')
+        post_save.connect(
+            reports.reservation_moved, sender=models.Reservation,
+            dispatch_uid='reports_reservation_saved')
+        post_delete.connect(
+            reports.forget_reservation, sender=models.Reservation,
+            dispatch_uid='reports_reservation_deleted')
+        post_save.connect(
+            reports.forget_venue, sender=models.Venue,
+            dispatch_uid='reports_venue_saved')
+        post_save.connect(
+            summaries.user_saved, sender=User,
+            dispatch_uid='summaries_user_saved')
+        post_save.connect(
+            summaries.reservation_changed, sender=models.Reservation,
+            dispatch_uid='summaries_reservation_saved')
+        post_delete.connect(
+            summaries.reservation_changed, sender=models.Reservation,
+            dispatch_uid='summaries_reservation_deleted')
+        post_save.connect(
+            summaries.company_changed, sender=models.Company,
+            dispatch_uid='summaries_company_saved')
+        post_delete.connect(
+            summaries.company_changed, sender=models.Company,
+            dispatch_uid='summaries_company_deleted')
+        pre_save.connect(
+            tasks.reservation_pre_save, sender=models.Reservation,
+            dispatch_uid='tasks_reservation_pre_save')
+        post_save.connect(
+            tasks.reservation_saved, sender=models.Reservation,
+            dispatch_uid='tasks_reservation_saved')
+        post_save.connect(
+            response_cache.venue_changed, sender=models.Venue,
+            dispatch_uid='response_cache_venue_saved')
+        post_delete.connect(
+            response_cache.venue_changed, sender=models.Venue,
+            dispatch_uid='response_cache_venue_deleted')
+        post_save.connect(
+            response_cache.price_changed, sender=models.LotPrice,
+            dispatch_uid='response_cache_price_saved')
+        post_delete.connect(
+            response_cache.price_changed, sender=models.LotPrice,
+            dispatch_uid='response_cache_price_deleted')
+        post_save.connect(
+            response_cache.price_saved, sender=models.LotPrice,
+            dispatch_uid='response_cache_price_touch_venues')
+        post_save.connect(
+            response_cache.reservation_changed, sender=models.Reservation,
+            dispatch_uid='response_cache_reservation_saved')
+        post_delete.connect(
+            response_cache.reservation_changed, sender=models.Reservation,
+            dispatch_uid='response_cache_reservation_deleted')
@@ -0,0 +1,239 @@
+""" In-process reservation interval index
+
+Answer "is lot free at time T / during [start, end]" without running the
+`reservation__book_from/book_to` anti join over whole reservation history.
+Each lot keep its reservation intervals ordered by start time along with
+running maximum of end time, so any overlap lookup is a single binary
+search.
+
+Index is filled lazily from database (one query for every batch of
+unknown lots) and bounded to least recently used lots. `Reservation`
+signals registered in `ParkingConfig.ready` bump shared version of lot
+kept in response cache, every process reload lot whose version moved.
+Closed and canceled reservation never block a lot so they are not part
+of index.
+"""
+import bisect
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from parkinglot.fields import to_timestamp
+from parkinglot.mixins import bump_cache_versions, get_cache_versions
+
+from . import models, slots
+
+# SQLite allow limited no. of query parameters
+QUERY_CHUNK_SIZE = 500
+
+# Shared version scope of single lot
+SCOPE = 'lot-intervals:%s'
+
+
+class LotIntervals(object):
+    """ Reservation intervals of single lot ordered by start time
+
+    `max_end[i]` store largest end time from first `i + 1` intervals.
+    Any interval overlapping closed range [start, end] must begin before
+    `end`, so overlap check only need to look at running maximum of
+    intervals starting before `end`.
+    """
+    __slots__ = ('starts', 'max_end', 'version')
+
+    def __init__(self, intervals=(), version=None):
+        intervals = sorted(intervals)
+        self.starts = [start for start, end in intervals]
+        self.max_end = []
+        current = float('-inf')
+        for start, end in intervals:
+            current = max(current, end)
+            self.max_end.append(current)
+        self.version = version
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end):
+        """ Insert interval keeping start order and running maximum"""
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        current = max(self.max_end[index - 1] if index else end, end)
+        self.max_end.insert(index, current)
+        for position in range(index + 1, len(self.max_end)):
+            if self.max_end[position] >= current:
+                break
+            self.max_end[position] = current
+
+    def overlaps(self, start, end):
+        """ Check any reservation overlap with closed range [start, end]"""
+        index = bisect.bisect_right(self.starts, end)
+        return bool(index) and self.max_end[index - 1] >= start
+
+
+class AvailabilityIndex(object):
+    """ Per lot reservation interval index, least recently used lots
+    dropped
+
+    Parameters
+    ----------
+    size : int
+        Max no. of lots kept, `PARKING_AVAILABILITY_SIZE` setting by
+        default
+    """
+
+    def __init__(self, size=None):
+        self._size = size
+        self._lots = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def size(self):
+        if self._size is None:
+            return getattr(settings, 'PARKING_AVAILABILITY_SIZE', 10000)
+        return self._size
+
+    def get_intervals(self, lot_ids, versions=None):
+        """ Return `LotIntervals` for each lot id, loading missing and
+        outdated lots from database in batches
+        """
+        lot_ids = set(lot_ids)
+        if versions is None:
+            versions = lot_versions(lot_ids)
+        result = {}
+        missing = []
+        with self._lock:
+            for lot_id in lot_ids:
+                intervals = self._lots.get(lot_id)
+                if intervals is not None and (
+                        intervals.version == versions[lot_id]):
+                    self._lots.move_to_end(lot_id)
+                    result[lot_id] = intervals
+                else:
+                    missing.append(lot_id)
+
+        # Versions read before rows, intervals loaded while lot changed
+        # are kept under outdated version and reloaded on next lookup
+        for offset in range(0, len(missing), QUERY_CHUNK_SIZE):
+            chunk = missing[offset:offset + QUERY_CHUNK_SIZE]
+            loaded = {lot_id: [] for lot_id in chunk}
+            for venue_id, book_from, book_to in models.Reservation.objects.filter(
+                venue_id__in=chunk
+            ).holding().values_list('venue_id', 'book_from', 'book_to'):
+                loaded[venue_id].append(
+                    (to_timestamp(book_from), to_timestamp(book_to)))
+            with self._lock:
+                for lot_id, intervals in loaded.items():
+                    result[lot_id] = self._lots[lot_id] = LotIntervals(
+                        intervals, version=versions[lot_id])
+                    self._lots.move_to_end(lot_id)
+                while len(self._lots) > self.size:
+                    self._lots.popitem(last=False)
+        return result
+
+    def busy_lots(self, lot_ids, start, end=None, versions=None):
+        """ Return set of lot ids reserved at `start` or during
+        [start, end]
+        """
+        start = to_timestamp(start)
+        end = start if end is None else to_timestamp(end)
+        return set(
+            lot_id for lot_id, intervals in self.get_intervals(
+                lot_ids, versions).items()
+            if intervals.overlaps(start, end)
+        )
+
+    def free_lots(self, lot_ids, start, end=None):
+        """ Return list of lot ids not reserved at `start` or during
+        [start, end], order of `lot_ids` preserved
+        """
+        busy = self.busy_lots(lot_ids, start, end)
+        return [lot_id for lot_id in lot_ids if lot_id not in busy]
+
+    def is_free(self, lot_id, start, end=None):
+        """ Check single lot availability"""
+        return not self.busy_lots([lot_id], start, end)
+
+    def invalidate(self, lot_id):
+        """ Drop lot intervals, next lookup reload it from database"""
+        with self._lock:
+            self._lots.pop(lot_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._lots.clear()
+
+
+def lot_versions(lot_ids):
+    """ Shared version of every lot kept in response cache, see
+    `parkinglot.mixins.get_cache_versions`
+    """
+    lot_ids = list(lot_ids)
+    return dict(zip(lot_ids, get_cache_versions(
+        [SCOPE % (lot_id) for lot_id in lot_ids])))
+
+
+index = AvailabilityIndex()
+
+# Optional slot bitmap store, see `parking.slots`
+slot_store = slots.get_store()
+
+
+def busy_lots(lot_ids, start, end=None):
+    """ Return set of lot ids reserved at `start` or during [start, end]
+
+    Slot store answer window within its horizon, interval index rest
+    """
+    lot_ids = list(lot_ids)
+    versions = lot_versions(lot_ids)
+    if slot_store is not None:
+        busy = slot_store.busy_lots(lot_ids, start, end, versions)
+        if busy is not None:
+            return busy
+    return index.busy_lots(lot_ids, start, end, versions)
+
+
+def free_lots(lot_ids, start, end=None):
+    """ Return list of lot ids not reserved at `start` or during
+    [start, end], order of `lot_ids` preserved
+    """
+    busy = busy_lots(lot_ids, start, end)
+    return [lot_id for lot_id in lot_ids if lot_id not in busy]
+
+
+def exclude_busy(queryset, start, end=None):
+    """ Venue queryset without lots reserved at `start` or during
+    [start, end], checked in SQL with correlated `NOT EXISTS` so whole
+    queryset is never loaded. Same reservations as index, served by
+    `reservation_venue_window_idx`.
+    """
+    reserved = models.Reservation.objects.filter(
+        venue_id=OuterRef('pk')
+    ).overlapping(start, start if end is None else end)
+    return queryset.annotate(
+        is_reserved=Exists(reserved)).filter(is_reserved=False)
+
+
+def is_free(lot_id, start, end=None):
+    """ Check single lot availability"""
+    return not busy_lots([lot_id], start, end)
+
+
+def invalidate(lot_id):
+    """ Drop lot from index and slot store of every process"""
+    index.invalidate(lot_id)
+    if slot_store is not None:
+        slot_store.invalidate(lot_id)
+    bump_cache_versions([SCOPE % (lot_id)])
+
+
+def reservation_changed(sender, instance, **kwargs):
+    """ Signal receiver to keep index in step with reservation table
+
+    Lot dropped immediately and once more after commit, so intervals
+    loaded inside an open transaction never outlive it.
+    """
+    lot_id = instance.venue_id
+    invalidate(lot_id)
+    transaction.on_commit(lambda: invalidate(lot_id))
@@ -0,0 +1,140 @@
+""" Bulk venue tree creation
+
+Whole building (floors, lots) built in memory from nested spec and
+written with one `bulk_create` per tree level instead of one MPTT insert
+per venue. New building always start a new tree, so `tree_id`, `lft`,
+`rght` & `level` numbered in memory by a single pre-order walk, same
+values `TreeManager.partial_rebuild` would produce, and no other tree row
+get rewritten.
+
+Prices given as templates and referenced by key from any venue, lots
+inherit price of closest ancestor which set one.
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from . import models, counters, locations, response_cache
+
+
+class Node(object):
+    """ Venue waiting to be inserted along with its parent"""
+    __slots__ = ('venue', 'parent')
+
+    def __init__(self, venue, parent):
+        self.venue = venue
+        self.parent = parent
+
+
+def iter_children(spec):
+    """ Child specs of venue, generated lots included"""
+    for child in spec.get('children', ()):
+        yield child
+    lots = spec.get('lots')
+    if lots:
+        for number in range(lots['start'], lots['start'] + lots['count']):
+            yield {
+                'name': lots['name'].format(number=number),
+                'category': models.Venue.LOT,
+                'venue_type': lots.get('venue_type', models.Venue.PUBLIC),
+                'price': lots.get('price'),
+            }
+
+
+class TreeBuilder(object):
+    """ Number venue spec in pre-order and group venues by tree level
+
+    Parameters
+    ----------
+    company : Company
+        Owner of every created venue
+    prices : dict
+        `LotPrice` by template key
+    tree_id : int
+        Tree id of new building
+    """
+
+    def __init__(self, company, prices, tree_id):
+        self.company = company
+        self.prices = prices
+        self.tree_id = tree_id
+        self.levels = []
+        self._next = 1
+
+    def add(self, spec, parent=None, level=0, price_key=None, chain=None):
+        price_key = spec.get('price') or price_key
+        category = spec.get('category', models.Venue.BUILDING)
+        venue = models.Venue(
+            name=spec['name'], category=category,
+            venue_type=spec.get('venue_type', models.Venue.PUBLIC),
+            company=self.company,
+            tree_id=self.tree_id, level=level, lft=self._next)
+        # Location follow ancestors, see `locations.compute_locations`
+        if chain is None:
+            venue.location = self.company.name
+        else:
+            venue.location = locations.format_location(chain)
+        chain = locations.location_chain(
+            category, venue.name, self.company.name, chain)
+        # Lot use inherited price, other venue only price set on itself
+        if category == models.Venue.LOT or spec.get('price'):
+            venue.venue_price = self.prices.get(price_key)
+        self._next += 1
+        if len(self.levels) == level:
+            self.levels.append([])
+        self.levels[level].append(Node(venue, parent))
+        for child in iter_children(spec):
+            child_venue = self.add(
+                child, venue, level + 1, price_key, chain)
+            if child_venue.category == models.Venue.LOT:
+                venue.lot_count += 1
+        venue.rght = self._next
+        self._next += 1
+        return venue
+
+    def save(self):
+        """ Insert venues level by level
+
+        Bulk insert do not return primary keys on every database, ids
+        read back by `lft` which is unique within tree
+        """
+        for nodes in self.levels:
+            for node in nodes:
+                if node.parent is not None:
+                    node.venue.parent_id = node.parent.id
+            models.Venue.objects.bulk_create(
+                [node.venue for node in nodes], batch_size=500)
+            ids = dict(models.Venue.objects.filter(
+                tree_id=self.tree_id, level=nodes[0].venue.level
+            ).values_list('lft', 'id'))
+            for node in nodes:
+                node.venue.id = ids[node.venue.lft]
+        return self.levels[0][0].venue
+
+
+def next_tree_id():
+    """ Tree id for new building, taken while root of last tree is row
+    locked so concurrent builds wait for each other instead of sharing id
+    """
+    list(models.Venue.objects.select_for_update().filter(
+        parent=None).order_by('-tree_id').values_list('id', flat=True)[:1])
+    last = models.Venue.objects.aggregate(last=Max('tree_id'))['last']
+    return (last or 0) + 1
+
+
+def build_tree(company, spec):
+    """ Create venue tree of `company` from validated spec and return
+    root venue
+    """
+    with transaction.atomic():
+        prices = {}
+        for template in spec.get('prices', ()):
+            template = dict(template)
+            key = template.pop('key')
+            prices[key] = models.LotPrice.objects.create(
+                company=company, **template)
+        builder = TreeBuilder(company, prices, next_tree_id())
+        builder.add(spec)
+        root = builder.save()
+        counters.recount_companies([company.id])
+    response_cache.invalidate_trees([root.tree_id])
+    return root
@@ -0,0 +1,125 @@
+""" Materialized lot counters for venues and companies
+
+`Venue.lot_count` / `Company.lot_count` store no. of parking lots and
+`occupied_lot_count` no. of lots currently occupied, so serializers read
+them without running COUNT queries per row.
+
+A lot is occupied while it have an active or overdue reservation. Flag
+kept on the lot itself (`Venue.is_occupied`) and counters recomputed with
+set based UPDATE statements whenever a lot is added, moved, removed or
+its occupancy change. UPDATE statements skip `auto_now`, so modification
+time of every touched row set along.
+"""
+from django.db.models import OuterRef
+from django.utils import timezone
+
+from . import models, response_cache
+
+# Reservation status which physically hold a lot
+OCCUPIED_STATUS = (models.Reservation.ACTIVE, models.Reservation.OVERDUE)
+
+
+def _counter_values(lookup):
+    lots = models.Venue.objects.filter(
+        category=models.Venue.LOT, **{lookup: OuterRef('pk')})
+    return {
+        'lot_count': models.lot_count_subquery(lots),
+        'occupied_lot_count': models.lot_count_subquery(
+            lots.filter(is_occupied=True)),
+        'updated_at': timezone.now()
+    }
+
+
+def recount_venues(venue_ids=None):
+    """ Recompute counters of given venues, all venues if `None`"""
+    queryset = models.Venue.objects.exclude(category=models.Venue.LOT)
+    if venue_ids is not None:
+        venue_ids = set(filter(None, venue_ids))
+        if not venue_ids:
+            return 0
+        queryset = queryset.filter(id__in=venue_ids)
+    return queryset.update(**_counter_values('parent_id'))
+
+
+def recount_companies(company_ids=None):
+    """ Recompute counters of given companies, all companies if `None`"""
+    queryset = models.Company.objects.all()
+    if company_ids is not None:
+        company_ids = set(filter(None, company_ids))
+        if not company_ids:
+            return 0
+        queryset = queryset.filter(id__in=company_ids)
+    return queryset.update(**_counter_values('company_id'))
+
+
+def refresh_lots(lot_ids):
+    """ Sync `is_occupied` flag of given lots with their reservations and
+    recount parent venue & company of every lot whose flag changed
+
+    Return no. of lots whose flag changed
+    """
+    lot_ids = set(lot_ids)
+    if not lot_ids:
+        return 0
+    occupied = set(models.Reservation.objects.filter(
+        venue_id__in=lot_ids, status__in=OCCUPIED_STATUS
+    ).values_list('venue_id', flat=True))
+    changed = [
+        lot for lot in models.Venue.objects.filter(
+            id__in=lot_ids, category=models.Venue.LOT
+        ).values('id', 'is_occupied', 'parent_id', 'company_id')
+        if lot['is_occupied'] != (lot['id'] in occupied)
+    ]
+    if not changed:
+        return 0
+    for is_occupied in (True, False):
+        models.Venue.objects.filter(
+            id__in=[
+                lot['id'] for lot in changed
+                if (lot['id'] in occupied) == is_occupied]
+        ).update(is_occupied=is_occupied, updated_at=timezone.now())
+    recount_venues(lot['parent_id'] for lot in changed)
+    recount_companies(lot['company_id'] for lot in changed)
+    response_cache.invalidate_venues(lot['id'] for lot in changed)
+    return len(changed)
+
+
+def rebuild():
+    """ Recompute every occupancy flag and counter from scratch"""
+    occupied = models.Reservation.objects.filter(
+        status__in=OCCUPIED_STATUS).values('venue_id')
+    models.Venue.objects.filter(
+        category=models.Venue.LOT, id__in=occupied
+    ).update(is_occupied=True, updated_at=timezone.now())
+    models.Venue.objects.exclude(
+        category=models.Venue.LOT, id__in=occupied
+    ).update(is_occupied=False, updated_at=timezone.now())
+    recount_venues()
+    recount_companies()
+
+
+def venue_pre_save(sender, instance, **kwargs):
+    """ Remember where venue was placed before save"""
+    instance._counter_origin = None
+    if instance.pk:
+        instance._counter_origin = models.Venue.objects.filter(
+            pk=instance.pk).values_list('parent_id', 'company_id').first()
+
+
+def venue_changed(sender, instance, **kwargs):
+    """ Recount old & new parent venue and company of saved or deleted
+    venue
+    """
+    parent_ids = [instance.parent_id]
+    company_ids = [instance.company_id]
+    origin = getattr(instance, '_counter_origin', None)
+    if origin:
+        parent_ids.append(origin[0])
+        company_ids.append(origin[1])
+    recount_venues(parent_ids)
+    recount_companies(company_ids)
+
+
+def reservation_changed(sender, instance, **kwargs):
+    """ Refresh occupancy of reserved lot"""
+    refresh_lots([instance.venue_id])
@@ -0,0 +1,222 @@
+""" Bulk export of company reservations and payments
+
+Rows of a company within date range read by server side cursor
+(`iterator(chunk_size=...)`) and written out chunk by chunk, so memory
+stay flat whatever the range size. CSV always available, Arrow IPC
+stream and Parquet written when `pyarrow` is installed, CSV used instead
+otherwise.
+"""
+import csv
+import io
+
+from django.utils import timezone
+
+from . import models
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+CSV = 'csv'
+ARROW = 'arrow'
+PARQUET = 'parquet'
+FORMATS = (CSV, ARROW, PARQUET)
+
+CONTENT_TYPES = {
+    CSV: 'text/csv',
+    ARROW: 'application/vnd.apache.arrow.stream',
+    PARQUET: 'application/vnd.apache.parquet',
+}
+
+RESERVATIONS = 'reservations'
+PAYMENTS = 'payments'
+DATASETS = (RESERVATIONS, PAYMENTS)
+
+# (column, lookup, type) of every dataset
+COLUMNS = {
+    RESERVATIONS: (
+        ('id', 'id', 'int'),
+        ('venue_id', 'venue_id', 'int'),
+        ('venue_name', 'venue__name', 'str'),
+        ('user_id', 'user_id', 'int'),
+        ('book_from', 'book_from', 'datetime'),
+        ('book_to', 'book_to', 'datetime'),
+        ('status', 'status', 'str'),
+        ('payment_status', 'payment_status', 'str'),
+        ('license', 'license', 'str'),
+        ('phone_number', 'phone_number', 'str'),
+        ('amount', 'amount', 'decimal'),
+        ('overdue_amount', 'overdue_amount', 'decimal'),
+        ('total_amount', 'total_amount', 'decimal'),
+        ('total_amount_paid', 'total_amount_paid', 'decimal'),
+    ),
+    PAYMENTS: (
+        ('id', 'id', 'int'),
+        ('reservation_id', 'reservation_id', 'int'),
+        ('venue_id', 'reservation__venue_id', 'int'),
+        ('payment_type', 'payment_type', 'str'),
+        ('amount', 'amount', 'decimal'),
+        ('created', 'created', 'datetime'),
+    ),
+}
+
+
+def available_formats():
+    if pyarrow is None:
+        return (CSV,)
+    return FORMATS
+
+
+def resolve_format(format):
+    """ Requested format if it can be written, CSV otherwise"""
+    return format if format in available_formats() else CSV
+
+
+def get_queryset(dataset, company, start, end):
+    """ Rows of `company` within [start, end), reservations by start time
+    and payments by creation time
+    """
+    if dataset == RESERVATIONS:
+        queryset = models.Reservation.objects.filter(
+            venue__company=company, book_from__gte=start, book_from__lt=end)
+    else:
+        queryset = models.PaymentHistory.objects.filter(
+            reservation__venue__company=company,
+            created__gte=start, created__lt=end)
+    return queryset.order_by('id').values_list(
+        *[lookup for name, lookup, kind in COLUMNS[dataset]])
+
+
+def _cell(value, kind):
+    if value is None:
+        return None
+    if kind == 'datetime':
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, timezone.utc)
+        return value
+    if kind == 'str':
+        return str(value)
+    return value
+
+
+def iter_chunks(queryset, kinds, chunk_size):
+    """ Lists of at most `chunk_size` rows read by server side cursor"""
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append([_cell(value, kind) for value, kind in zip(row, kinds)])
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ChunkSink(object):
+    """ Write only file collecting bytes until drained"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.buffer.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = self.buffer.getvalue()
+        self.buffer = io.BytesIO()
+        return data
+
+
+class Exporter(object):
+    """ Stream dataset of company as bytes
+
+    Parameters
+    ----------
+    dataset : str
+        `reservations` or `payments`
+    format : str
+        Output format, CSV when format can not be written
+    chunk_size : int
+        No. of rows fetched and written together
+    """
+
+    def __init__(self, dataset, format=CSV, chunk_size=2000):
+        self.dataset = dataset
+        self.format = resolve_format(format)
+        self.chunk_size = chunk_size
+        self.columns = COLUMNS[dataset]
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES[self.format]
+
+    def export(self, company, start, end):
+        """ Generator of output bytes"""
+        chunks = iter_chunks(
+            get_queryset(self.dataset, company, start, end),
+            [kind for name, lookup, kind in self.columns], self.chunk_size)
+        if self.format == CSV:
+            return self.write_csv(chunks)
+        return self.write_arrow(chunks)
+
+    def write_csv(self, chunks):
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow([name for name, lookup, kind in self.columns])
+        for chunk in chunks:
+            writer.writerows(
+                [value.isoformat() if hasattr(value, 'isoformat') else value
+                 for value in row] for row in chunk)
+            yield text.getvalue().encode('utf-8')
+            text.seek(0)
+            text.truncate()
+        yield text.getvalue().encode('utf-8')
+
+    def arrow_schema(self):
+        types = {
+            'int': pyarrow.int64(),
+            'str': pyarrow.string(),
+            'datetime': pyarrow.timestamp('us', tz='UTC'),
+            'decimal': pyarrow.decimal128(10, 2),
+        }
+        return pyarrow.schema([
+            (name, types[kind]) for name, lookup, kind in self.columns])
+
+    def write_arrow(self, chunks):
+        """ Arrow IPC stream with record batch per chunk, Parquet with
+        row group per chunk
+        """
+        schema = self.arrow_schema()
+        sink = ChunkSink()
+        if self.format == PARQUET:
+            writer = pyarrow.parquet.ParquetWriter(sink, schema)
+            write = writer.write_table
+            build = pyarrow.Table.from_arrays
+        else:
+            writer = pyarrow.ipc.new_stream(sink, schema)
+            write = writer.write_batch
+            build = pyarrow.RecordBatch.from_arrays
+        for chunk in chunks:
+            write(build(
+                [pyarrow.array(column, type=field.type)
+                 for column, field in zip(zip(*chunk), schema)],
+                schema=schema))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
@@ -4,7 +4,7 @@ import django_filters as filters
 from django.conf import settings
 from django.utils.translation import gettext as _
 
-from . import models
+from . import models, availability
 
 
 class NumberRangeFilter(filters.NumberFilter):
@@ -16,11 +16,14 @@ class NumberRangeFilter(filters.NumberFilter):
         if value is not None:
             if value:
                 time = datetime.fromtimestamp(
-                    value).replace(tzinfo=pytz.utc)
-                return qs.exclude(
-                    reservation__book_from__lte=time,
-                    reservation__book_to__gte=time
-                )
+                    float(value)).replace(tzinfo=pytz.utc)
+                end_time = None
+                available_to = self.parent.form.cleaned_data.get(
+                    'available_to')
+                if available_to:
+                    end_time = datetime.fromtimestamp(
+                        float(available_to)).replace(tzinfo=pytz.utc)
+                return availability.exclude_busy(qs, time, end_time)
         return super().filter(qs, value)
 
 
@@ -32,10 +35,19 @@ class VenueFilter(filters.FilterSet):
     available = NumberRangeFilter(
         help_text=_('Check venue availability filter')
     )
+    available_to = filters.NumberFilter(
+        method='filter_available_to',
+        help_text=_(
+            'End of availability window, used along with `available`')
+    )
 
     class Meta:
         model = models.Venue
-        fields = ['available', 'company', 'parent']
+        fields = ['available', 'available_to', 'company', 'parent']
+
+    def filter_available_to(self, queryset, name, value):
+        """ Applied by `available` filter"""
+        return queryset
 
 
 class ReservationFilter(filters.FilterSet):
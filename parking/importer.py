@@ -0,0 +1,194 @@
+""" Bulk reservation import
+
+Existing bookings of an operator imported from NDJSON or CSV stream.
+Rows validated in batches, checked for overlap against per lot interval
+index and inserted with `bulk_create`. Index of every batch built in one
+pass from stored reservations of its lots within batch time range, read
+while lots locked, plus rows accepted earlier in same batch. Invalid
+rows are skipped and reported back ordered by their row no.
+"""
+import csv
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from parkinglot.fields import to_timestamp
+
+from . import (
+    models, serializers, availability, counters, response_cache, summaries,
+    tasks)
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+FORMATS = (NDJSON, CSV)
+
+
+def read_rows(lines, format=NDJSON):
+    """ Parse rows from iterable of text or byte lines
+
+    Row which can not be parsed yielded as `None` to keep row no. in
+    step with input
+    """
+    lines = (
+        line.decode('utf-8') if isinstance(line, bytes) else line
+        for line in lines)
+    if format == CSV:
+        for row in csv.DictReader(lines):
+            # Empty CSV cell means value not given
+            yield dict(
+                (key, value) for key, value in row.items()
+                if key and value not in ('', None))
+        return
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else None
+
+
+class ReservationImporter(object):
+    """ Import reservations of company lots
+
+    Parameters
+    ----------
+    company : Company
+        Only lots of this company can be reserved
+    batch_size : int
+        No. of rows validated & inserted together
+    """
+
+    def __init__(self, company, batch_size=500):
+        self.company = company
+        self.batch_size = batch_size
+        self.created = 0
+        self.errors = []
+        self.lot_ids = set()
+
+    def run(self, rows):
+        """ Import all rows and return report"""
+        batch = []
+        for row_no, row in enumerate(rows, 1):
+            batch.append((row_no, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        for lot_id in self.lot_ids:
+            availability.invalidate(lot_id)
+        counters.refresh_lots(self.lot_ids)
+        response_cache.invalidate_venues(self.lot_ids)
+        self.errors.sort(key=lambda error: error['row'])
+        return {
+            'created': self.created,
+            'errors': self.errors
+        }
+
+    def add_error(self, row_no, errors):
+        self.errors.append({'row': row_no, 'errors': errors})
+
+    def validate_batch(self, batch):
+        """ Return list of (row no., validated data) of valid rows"""
+        valid = []
+        for row_no, row in batch:
+            if row is None:
+                self.add_error(row_no, {
+                    'non_field_errors': [_('Row could not be parsed')]})
+                continue
+            serializer = serializers.ReservationImportSerializer(data=row)
+            if serializer.is_valid():
+                data = serializer.validated_data
+                for field in ('book_from', 'book_to'):
+                    if timezone.is_naive(data[field]):
+                        data[field] = timezone.make_aware(data[field])
+                valid.append((row_no, data))
+            else:
+                self.add_error(row_no, serializer.errors)
+        return valid
+
+    def load_intervals(self, lot_ids, valid):
+        """ Index of holding reservations of locked lots stored within time
+        range of batch rows. Read fresh every batch while lots locked, so
+        rows written, canceled or deleted by others meanwhile are seen.
+        """
+        start = min(data['book_from'] for row_no, data in valid)
+        end = max(data['book_to'] for row_no, data in valid)
+        rows = dict((lot_id, []) for lot_id in lot_ids)
+        for venue_id, book_from, book_to in models.Reservation.objects.filter(
+            venue_id__in=lot_ids
+        ).overlapping(start, end).values_list(
+                'venue_id', 'book_from', 'book_to'):
+            rows[venue_id].append(
+                (to_timestamp(book_from), to_timestamp(book_to)))
+        return dict(
+            (lot_id, availability.LotIntervals(lot_rows))
+            for lot_id, lot_rows in rows.items())
+
+    def schedule_transitions(self, reservations, started):
+        """ Queue transitions of inserted reservations within horizon, bulk
+        insert send no `post_save`. Called with lots locked, so rows of
+        their lots written since `started` are the inserted ones.
+        """
+        until = tasks.get_horizon(started)
+        lot_ids = set(
+            reservation.venue_id for reservation in reservations
+            if any(boundary < until for boundary in tasks.get_boundaries(
+                reservation.status, reservation.book_from,
+                reservation.book_to)))
+        if not lot_ids:
+            return
+        rows = list(models.Reservation.objects.filter(
+            venue_id__in=lot_ids, updated_at__gte=started
+        ).values_list('id', 'status', 'book_from', 'book_to'))
+
+        def schedule():
+            for row in rows:
+                tasks.schedule_reservation(*row, until=until)
+        transaction.on_commit(schedule)
+
+    def import_batch(self, batch):
+        valid = self.validate_batch(batch)
+        venue_ids = set(data['venue_id'] for row_no, data in valid)
+        if not venue_ids:
+            return
+        with serializers.booking_transaction():
+            lot_ids = set(models.Venue.objects.select_for_update().filter(
+                id__in=venue_ids, company=self.company,
+                category=models.Venue.LOT
+            ).values_list('id', flat=True))
+            intervals = self.load_intervals(lot_ids, valid)
+
+            reservations = []
+            for row_no, data in valid:
+                if data['venue_id'] not in lot_ids:
+                    self.add_error(row_no, {
+                        'venue': [_('Lot not found in company')]})
+                    continue
+                start = to_timestamp(data['book_from'])
+                end = to_timestamp(data['book_to'])
+                holding = data.get('status') not in (
+                    models.Reservation.INACTIVE_STATUS)
+                if holding:
+                    if intervals[data['venue_id']].overlaps(start, end):
+                        self.add_error(row_no, {
+                            'non_field_errors': [
+                                serializers.VENUE_NOT_AVAILABLE]})
+                        continue
+                    intervals[data['venue_id']].add(start, end)
+                reservations.append(models.Reservation(**data))
+            started = timezone.now()
+            models.Reservation.objects.bulk_create(
+                reservations, batch_size=self.batch_size)
+            self.schedule_transitions(reservations, started)
+            # Bulk insert send no `post_save` to `summaries`
+            summaries.refresh_users(
+                [reservation.user_id for reservation in reservations],
+                fields=('reservation_count', 'active_reservation_count'))
+        self.created += len(reservations)
+        self.lot_ids.update(
+            reservation.venue_id for reservation in reservations)
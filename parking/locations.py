@@ -0,0 +1,122 @@
+""" Materialized venue location
+
+`Venue.location` store location string shown for venue, built from its
+ancestors: name of every floor ancestor nearest first followed by company
+name of nearest ancestor owned by a company. Root venue show its own
+company name.
+
+Location of a venue depend only on its ancestors, so it's recomputed for
+subtree of every venue renamed, moved, recategorized or given another
+company, and for every tree of company when company renamed. Subtree read
+along with its ancestors by single tree range query and only rows whose
+location changed get updated.
+"""
+from django.db.models import Q
+from django.utils import timezone
+
+from . import models
+
+LOCATION_FIELDS = ('parent_id', 'company_id', 'name', 'category')
+
+
+def location_chain(category, name, company_name, parent_chain=None):
+    """ (floors, company name) venue pass on to its children"""
+    floors, parent_company = parent_chain or ('', None)
+    if category == models.Venue.FLOOR:
+        floors = '%s floor, ' % (name) + floors
+    return floors, company_name or parent_company
+
+
+def format_location(parent_chain):
+    floors, company_name = parent_chain
+    return floors + (company_name or '')
+
+
+def compute_locations(rows):
+    """ Location of every venue row, rows given in tree order with their
+    ancestors before them
+    """
+    chains = {}
+    locations = {}
+    for row in rows:
+        parent_chain = chains.get(row['parent_id'])
+        if row['parent_id'] is None:
+            locations[row['id']] = row['company__name'] or ''
+        else:
+            locations[row['id']] = format_location(
+                parent_chain or ('', None))
+        chains[row['id']] = location_chain(
+            row['category'], row['name'], row['company__name'],
+            parent_chain)
+    return locations
+
+
+def _refresh(condition):
+    """ Recompute locations of venues matching `condition` and write the
+    changed ones, return location by venue id
+    """
+    rows = list(models.Venue.objects.filter(condition).order_by(
+        'tree_id', 'lft'
+    ).values(
+        'id', 'parent_id', 'category', 'name', 'company__name', 'location'))
+    locations = compute_locations(rows)
+    changed = {}
+    for row in rows:
+        if locations[row['id']] != row['location']:
+            changed.setdefault(locations[row['id']], []).append(row['id'])
+    now = timezone.now()
+    for location, venue_ids in changed.items():
+        models.Venue.objects.filter(id__in=venue_ids).update(
+            location=location, updated_at=now)
+    return locations
+
+
+def refresh_subtree(venue):
+    """ Recompute locations of venue and its descendants"""
+    locations = _refresh(
+        Q(tree_id=venue.tree_id, lft__lte=venue.lft, rght__gte=venue.rght) |
+        Q(tree_id=venue.tree_id, lft__gt=venue.lft, rght__lt=venue.rght))
+    venue.location = locations.get(venue.id, venue.location)
+    return locations
+
+
+def refresh_trees(tree_ids):
+    """ Recompute locations of every venue in given trees"""
+    tree_ids = set(filter(None, tree_ids))
+    if not tree_ids:
+        return {}
+    return _refresh(Q(tree_id__in=tree_ids))
+
+
+def venue_pre_save(sender, instance, **kwargs):
+    """ Remember location inputs of venue before save"""
+    instance._location_origin = None
+    if instance.pk:
+        instance._location_origin = models.Venue.objects.filter(
+            pk=instance.pk).values_list(*LOCATION_FIELDS).first()
+
+
+def venue_saved(sender, instance, created, **kwargs):
+    """ Refresh subtree of new venue or venue whose location inputs
+    changed
+    """
+    origin = getattr(instance, '_location_origin', None)
+    if created or origin != tuple(
+            getattr(instance, name) for name in LOCATION_FIELDS):
+        refresh_subtree(instance)
+
+
+def company_pre_save(sender, instance, **kwargs):
+    """ Remember company name before save"""
+    instance._location_origin = None
+    if instance.pk:
+        instance._location_origin = models.Company.objects.filter(
+            pk=instance.pk).values_list('name', flat=True).first()
+
+
+def company_saved(sender, instance, created, **kwargs):
+    """ Refresh every tree holding venue of renamed company"""
+    origin = getattr(instance, '_location_origin', None)
+    if not created and origin != instance.name:
+        refresh_trees(instance.venues.values_list(
+            'tree_id', flat=True).distinct())
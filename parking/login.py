@@ -0,0 +1,104 @@
+""" Login fast path
+
+User read with single query carrying its token and summary
+(`summaries.user_queryset`), so login response rendered without further
+queries. Token created only on first login.
+
+Password hashing (PBKDF2 by default) is CPU bound, so it run in bounded
+per process worker pool. Login arriving while every worker busy and
+`LOGIN_HASH_QUEUE` logins already waiting is throttled instead of queued,
+login storm can not hold every request thread of process.
+
+Same checks as `ModelBackend`: unknown username still hash once so
+response time do not reveal existing usernames, inactive user rejected,
+hash made by outdated hasher upgraded. Workers only hash, rows read and
+written by request thread.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_login_failed
+from django.utils.translation import gettext as _
+
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from . import summaries
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def get_pool():
+    """ Hashing worker pool & semaphore bounding running and waiting
+    logins, created on first login
+    """
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, 'LOGIN_HASH_WORKERS', 2)
+            _slots = threading.BoundedSemaphore(
+                workers + getattr(settings, 'LOGIN_HASH_QUEUE', 8))
+            _pool = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='login-hash')
+        return _pool, _slots
+
+
+def run_hasher(function, *args):
+    """ Run hashing function in worker pool, throttle when pool full"""
+    pool, slots = get_pool()
+    busy = exceptions.Throttled(
+        wait=1, detail=_('Too many login requests, try again later.'))
+    if not slots.acquire(blocking=False):
+        raise busy
+    try:
+        future = pool.submit(function, *args)
+    except Exception:
+        slots.release()
+        raise
+    # Slot held till hash done or cancelled, so abandoned hash still
+    # count against pool bound
+    future.add_done_callback(lambda future: slots.release())
+    try:
+        return future.result(
+            timeout=getattr(settings, 'LOGIN_HASH_TIMEOUT', 10))
+    except TimeoutError:
+        future.cancel()
+        raise busy
+
+
+def login(request, username, password):
+    """ User with given credentials along with its login token, `None` when
+    credentials do not match
+    """
+    user = summaries.user_queryset().filter(
+        **{User.USERNAME_FIELD: username}).first()
+    if user is None:
+        # Hash anyway, see `ModelBackend.authenticate`
+        run_hasher(User().set_password, password)
+    else:
+        upgrade = []
+        valid = run_hasher(
+            check_password, password, user.password, upgrade.append)
+        if valid and upgrade:
+            run_hasher(user.set_password, password)
+            user.save(update_fields=['password'])
+        if valid and user.is_active:
+            return with_token(user)
+    user_login_failed.send(
+        sender=__name__, credentials={'username': username},
+        request=request)
+    return None
+
+
+def with_token(user):
+    """ User with its login token, created on first login"""
+    try:
+        user.auth_token
+    except Token.DoesNotExist:
+        user.auth_token, new = Token.objects.get_or_create(user=user)
+    return user
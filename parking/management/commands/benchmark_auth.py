@@ -0,0 +1,87 @@
+""" Compare per request latency of token authentication classes"""
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from parkinglot.authentication import CachedTokenAuthentication, tokens
+from rest_framework.authentication import (
+    BasicAuthentication, SessionAuthentication, TokenAuthentication)
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+# (name, authentication classes) compared
+CANDIDATES = (
+    ('session, basic, token', (
+        SessionAuthentication, BasicAuthentication, TokenAuthentication)),
+    ('cached token', (CachedTokenAuthentication,)),
+)
+
+
+class Ping(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        return Response({'id': request.user.id})
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure per request latency & queries of token authenticated '
+        'request with former and cached authentication classes. Temporary '
+        'user created and rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='No. of requests timed for every class')
+
+    def measure(self, view, make_request):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for x in range(self.requests):
+                # Fresh request, authenticated user is kept on request
+                request = make_request()
+                started = time.perf_counter()
+                response = view(request)
+                timings.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.data
+        timings.sort()
+        return {
+            'mean': statistics.mean(timings) * 1000,
+            'p50': timings[len(timings) // 2] * 1000,
+            'p95': timings[int(len(timings) * 0.95)] * 1000,
+            'queries': len(queries) / self.requests,
+        }
+
+    def handle(self, *args, **options):
+        self.requests = max(options['requests'], 1)
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username='benchmark-auth-%s' % (int(time.time() * 1000)),
+                password='benchmark')
+            token = Token.objects.create(user=user)
+            factory = APIRequestFactory()
+
+            def make_request():
+                return factory.get(
+                    '/', HTTP_AUTHORIZATION='Token %s' % (token.key))
+
+            tokens.clear()
+            for name, classes in CANDIDATES:
+                view = Ping.as_view(authentication_classes=classes)
+                # Warm up connection & cache
+                view(make_request())
+                result = self.measure(view, make_request)
+                self.stdout.write(
+                    '%-24s mean %.3f ms  p50 %.3f ms  p95 %.3f ms  '
+                    'queries/request %.2f' % (
+                        name, result['mean'], result['p50'],
+                        result['p95'], result['queries']))
+            transaction.set_rollback(True)
@@ -0,0 +1,63 @@
+""" Export reservations or payments of company to CSV, Arrow or Parquet"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from parking import exporter, models
+
+
+def parse_moment(value):
+    """ ISO date or date time, naive value taken in current time zone"""
+    moment = parse_datetime(value)
+    if moment is None:
+        date = parse_date(value)
+        if date is None:
+            raise CommandError('Invalid date %s' % (value))
+        moment = timezone.datetime(date.year, date.month, date.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = 'Export reservations or payments of company within date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('company_id', type=int)
+        parser.add_argument('dataset', choices=exporter.DATASETS)
+        parser.add_argument('start', help='Range start, ISO date')
+        parser.add_argument('end', help='Range end exclusive, ISO date')
+        parser.add_argument(
+            '--format', choices=exporter.FORMATS, default=exporter.CSV,
+            help='Output format, CSV when pyarrow not installed')
+        parser.add_argument(
+            '--output', help='Output file, standard output by default')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='No. of rows fetched & written together')
+
+    def handle(self, *args, **options):
+        try:
+            company = models.Company.objects.get(id=options['company_id'])
+        except models.Company.DoesNotExist:
+            raise CommandError(
+                'Company %s does not exist' % options['company_id'])
+        export = exporter.Exporter(
+            options['dataset'], format=options['format'],
+            chunk_size=options['chunk_size'])
+        if export.format != options['format']:
+            self.stderr.write(
+                'pyarrow not installed, writing %s' % (export.format))
+        chunks = export.export(
+            company, parse_moment(options['start']),
+            parse_moment(options['end']))
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,41 @@
+""" Import existing reservations of company from NDJSON or CSV file"""
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from parking import importer, models
+
+
+class Command(BaseCommand):
+    help = 'Import reservations of company lots from NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('company_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=importer.FORMATS,
+            help='File format, guessed from file extension by default')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='No. of rows validated & inserted together')
+
+    def handle(self, *args, **options):
+        try:
+            company = models.Company.objects.get(id=options['company_id'])
+        except models.Company.DoesNotExist:
+            raise CommandError(
+                'Company %s does not exist' % options['company_id'])
+        format = options['format']
+        if format is None:
+            extension = os.path.splitext(options['path'])[1].lower()
+            format = importer.CSV if extension == '.csv' else importer.NDJSON
+        with open(options['path'], newline='') as lines:
+            report = importer.ReservationImporter(
+                company, batch_size=options['batch_size']
+            ).run(importer.read_rows(lines, format=format))
+        for error in report['errors']:
+            self.stderr.write(json.dumps(error))
+        self.stdout.write(
+            'Created %s reservations, rejected %s rows' % (
+                report['created'], len(report['errors'])))
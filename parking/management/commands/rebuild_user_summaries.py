@@ -0,0 +1,19 @@
+""" Repair materialized user summaries"""
+from django.core.management.base import BaseCommand
+
+from parking import summaries
+
+
+class Command(BaseCommand):
+    help = (
+        'Create missing user summaries and recompute reservation counts '
+        '& last company from scratch')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'user_ids', nargs='*', type=int,
+            help='Users to rebuild, every user by default')
+
+    def handle(self, *args, **options):
+        updated = summaries.rebuild(options['user_ids'] or None)
+        self.stdout.write('%s user summaries rebuilt' % (updated))
@@ -0,0 +1,66 @@
+# Generated by Django 2.2.1 on 2026-10-18 18:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_lot_counters(apps, schema_editor):
+    """ Compute counters for existing venues and companies"""
+    Company = apps.get_model('parking', 'Company')
+    Venue = apps.get_model('parking', 'Venue')
+    Reservation = apps.get_model('parking', 'Reservation')
+
+    Venue.objects.filter(
+        category='lot',
+        id__in=Reservation.objects.filter(
+            status__in=('active', 'overdue')).values('venue_id')
+    ).update(is_occupied=True)
+
+    def count(lots):
+        return Coalesce(Subquery(
+            lots.order_by().values('category').annotate(
+                total=Count('id')).values('total')[:1]), 0)
+
+    for model, lookup in ((Venue, 'parent_id'), (Company, 'company_id')):
+        lots = Venue.objects.filter(
+            category='lot', **{lookup: OuterRef('pk')})
+        model.objects.update(
+            lot_count=count(lots),
+            occupied_lot_count=count(lots.filter(is_occupied=True)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0007_auto_20190510_1912'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='lot_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Materialized no. of parking lot in company', verbose_name='lot_count'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='occupied_lot_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Materialized no. of occupied parking lot in company', verbose_name='occupied_lot_count'),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='is_occupied',
+            field=models.BooleanField(default=False, editable=False, help_text='Lot have active or overdue reservation right now.Maintained by reservation changes', verbose_name='is_occupied'),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='lot_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Materialized no. of child parking lot', verbose_name='lot_count'),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='occupied_lot_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Materialized no. of occupied child parking lot', verbose_name='occupied_lot_count'),
+        ),
+        migrations.RunPython(fill_lot_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.1 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+def fill_locations(apps, schema_editor):
+    """ Compute location of existing venues tree by tree"""
+    Venue = apps.get_model('parking', 'Venue')
+    # (floors, nearest company name) every venue pass on to children
+    chains = {}
+    changed = {}
+    for row in Venue.objects.order_by('tree_id', 'lft').values(
+            'id', 'parent_id', 'category', 'name', 'company__name'):
+        floors, company_name = chains.get(row['parent_id'], ('', None))
+        if row['parent_id'] is None:
+            location = row['company__name'] or ''
+        else:
+            location = floors + (company_name or '')
+        if row['category'] == 'floor':
+            floors = '%s floor, ' % (row['name']) + floors
+        chains[row['id']] = (floors, row['company__name'] or company_name)
+        if location:
+            changed.setdefault(location, []).append(row['id'])
+    for location, venue_ids in changed.items():
+        Venue.objects.filter(id__in=venue_ids).update(location=location)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venue',
+            name='location',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Materialized location string from floor and company of ancestors. Maintained by venue and company changes', verbose_name='location'),
+        ),
+        migrations.RunPython(fill_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.1 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0011_venue_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], help_text='Period length', max_length=10, verbose_name='bucket')),
+                ('period_start', models.DateTimeField(help_text='Period start date time', verbose_name='period_start')),
+                ('period_end', models.DateTimeField(help_text='Period end date time, exclusive', verbose_name='period_end')),
+                ('reservation_count', models.PositiveIntegerField(default=0, help_text='No. of reservation started in period', verbose_name='reservation_count')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, help_text='Sum of reservation total amount', max_digits=14, verbose_name='total_amount')),
+                ('total_amount_paid', models.DecimalField(decimal_places=2, default=0, help_text='Sum of reservation amount paid', max_digits=14, verbose_name='total_amount_paid')),
+                ('overdue_amount', models.DecimalField(decimal_places=2, default=0, help_text='Sum of reservation overdue amount', max_digits=14, verbose_name='overdue_amount')),
+                ('occupied_seconds', models.BigIntegerField(default=0, help_text='Lot seconds reserved by reservations', verbose_name='occupied_seconds')),
+                ('computed_at', models.DateTimeField(help_text='Date time totals computed', verbose_name='computed_at')),
+                ('company', models.ForeignKey(help_text='Company owning venue', on_delete=django.db.models.deletion.CASCADE, related_name='reservation_rollups', to='parking.Company', verbose_name='company')),
+                ('venue', models.ForeignKey(help_text='Root of aggregated venue subtree', on_delete=django.db.models.deletion.CASCADE, related_name='reservation_rollups', to='parking.Venue', verbose_name='venue')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='reservationrollup',
+            index=models.Index(fields=['company', 'bucket', 'period_start'], name='rollup_company_period_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reservationrollup',
+            unique_together={('venue', 'bucket', 'period_start')},
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 2.2.1 on 2026-10-18 18:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_summaries(apps, schema_editor):
+    """ Summarize existing users"""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserSummary = apps.get_model('parking', 'UserSummary')
+    Company = apps.get_model('parking', 'Company')
+    Reservation = apps.get_model('parking', 'Reservation')
+    UserSummary.objects.bulk_create(
+        [UserSummary(user_id=user_id)
+         for user_id in User.objects.values_list('id', flat=True)],
+        batch_size=500)
+
+    def count(queryset):
+        return Coalesce(Subquery(
+            queryset.order_by().values('user').annotate(
+                total=Count('id')).values('total')[:1],
+            output_field=models.IntegerField()), 0)
+
+    reservations = Reservation.objects.filter(user_id=OuterRef('user_id'))
+    UserSummary.objects.update(
+        reservation_count=count(reservations),
+        active_reservation_count=count(reservations.exclude(
+            status__in=('closed', 'canceled'))),
+        company_id=Subquery(
+            Company.objects.filter(
+                user_id=OuterRef('user_id')
+            ).order_by('-id').values('id')[:1],
+            output_field=models.IntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('parking', '0012_reservation_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSummary',
+            fields=[
+                ('user', models.OneToOneField(help_text='Summarized user', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='user')),
+                ('reservation_count', models.PositiveIntegerField(default=0, editable=False, help_text='Materialized no. of reservation of user', verbose_name='reservation_count')),
+                ('active_reservation_count', models.PositiveIntegerField(default=0, editable=False, help_text='Materialized no. of reservation of user still holding lot', verbose_name='active_reservation_count')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Last modification date time of summary', verbose_name='updated_at')),
+                ('company', models.ForeignKey(editable=False, help_text='Last created company of user', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parking.Company', verbose_name='company')),
+            ],
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
-from django.utils import timezone
 from django.db import models
-from django.db.models import Q
+from django.db.models import Count, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.utils.translation import gettext as _
 
@@ -9,6 +9,16 @@ from phonenumber_field.modelfields import PhoneNumberField
 # Create your models here.
 
 
+def lot_count_subquery(lots):
+    """ Scalar subquery counting lots related to outer reference"""
+    return Coalesce(
+        Subquery(
+            lots.order_by().values('category').annotate(
+                total=Count('id')).values('total')[:1],
+            output_field=models.IntegerField()
+        ), 0)
+
+
 class Company(models.Model):
     """ Model to stor user company information"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
@@ -20,32 +30,28 @@ class Company(models.Model):
         _('name'),
         help_text=_('Name of the company'),
         max_length=100)
+    lot_count = models.PositiveIntegerField(
+        _('lot_count'), default=0, editable=False,
+        help_text=_('Materialized no. of parking lot in company'))
+    occupied_lot_count = models.PositiveIntegerField(
+        _('occupied_lot_count'), default=0, editable=False,
+        help_text=_('Materialized no. of occupied parking lot in company'))
+    updated_at = models.DateTimeField(
+        _('updated_at'), auto_now=True, db_index=True,
+        help_text=_('Last modification date time of company'))
+
+    @property
+    def free_lot_count(self):
+        """ No. of parking lot not occupied right now"""
+        return self.lot_count - self.occupied_lot_count
 
     def total_lot(self):
         """ Total no. of parking lot created this company"""
-        non_lot_venue = list(self.venues.exclude(
-            category=Venue.LOT).values_list('id', flat=True))
-        return Venue.objects.filter(
-            category=Venue.LOT
-        ).filter(
-            Q(company_id=self.id) |
-            Q(parent_id__in=non_lot_venue)
-        ).count()
+        return self.lot_count
 
     def available_lot(self):
         """ Total no. of parking lot available now for this company"""
-        non_lot_venue = list(self.venues.exclude(
-            category=Venue.LOT).values_list('id', flat=True))
-
-        return Venue.objects.filter(
-            category=Venue.LOT
-        ).filter(
-            Q(company_id=self.id) |
-            Q(parent_id__in=non_lot_venue)
-        ).exclude(
-            reservation__book_from__lte=timezone.now(),
-            reservation__book_to__gte=timezone.now()
-        ).count()
+        return self.free_lot_count
 
 
 class LotPrice(models.Model):
@@ -90,24 +96,14 @@ class LotPrice(models.Model):
             'Amount to be added in total amount if reservation cross'
             'it\'s reservation time. Overcharge amount set based on duration')
     )
+    updated_at = models.DateTimeField(
+        _('updated_at'), auto_now=True, db_index=True,
+        help_text=_('Last modification date time of price'))
 
     def __str__(self):
         return '%s - %s' % (self.id, self.name)
 
 
-def get_location_string(obj, location=''):
-    """ String to show parking location in company"""
-    if obj.parent:
-        if obj.parent.category == Venue.FLOOR:
-            location = location + '%s floor, ' % (obj.parent.name)
-        if obj.parent.company:
-            location = location + obj.parent.company.name
-        if obj.parent.parent:
-            location = get_location_string(
-                obj.parent.parent, location=location)
-    return location
-
-
 class Venue(MPTTModel):
     """ """
     BUILDING = 'building'
@@ -178,40 +174,57 @@ class Venue(MPTTModel):
         ),
         db_index=True,
         default=PUBLIC)
+    is_occupied = models.BooleanField(
+        _('is_occupied'), default=False, editable=False,
+        help_text=_(
+            'Lot have active or overdue reservation right now.'
+            'Maintained by reservation changes'))
+    lot_count = models.PositiveIntegerField(
+        _('lot_count'), default=0, editable=False,
+        help_text=_('Materialized no. of child parking lot'))
+    occupied_lot_count = models.PositiveIntegerField(
+        _('occupied_lot_count'), default=0, editable=False,
+        help_text=_('Materialized no. of occupied child parking lot'))
+    location = models.TextField(
+        _('location'), blank=True, default='', editable=False,
+        help_text=_(
+            'Materialized location string from floor and company of'
+            ' ancestors. Maintained by venue and company changes'))
+    updated_at = models.DateTimeField(
+        _('updated_at'), auto_now=True, db_index=True,
+        help_text=_('Last modification date time of venue'))
+
+    class Meta:
+        indexes = [
+            # Company venue search by category & type
+            models.Index(
+                fields=['company', 'category', 'venue_type'],
+                name='venue_company_category_idx'),
+            # Tree rendering & keyset pages
+            models.Index(
+                fields=['tree_id', 'lft'], name='venue_tree_order_idx'),
+        ]
+
+    @property
+    def free_lot_count(self):
+        """ No. of child parking lot not occupied right now"""
+        return self.lot_count - self.occupied_lot_count
 
     def get_location(self):
-        """ """
-        location = ''
-        if self.parent:
-            location = get_location_string(self)
-        elif self.company:
-            location = location + '%s' % (self.company.name)
-        return location
+        """ String to show parking location in company"""
+        return self.location
 
     def total_lot(self):
         """ """
         if self.category == self.LOT:
             return 0
-        else:
-            children = self.get_children()
-            if not children:
-                return 0
-            return children.filter(category=Venue.LOT).count()
+        return self.lot_count
 
     def available_lot(self):
         """ """
         if self.category == self.LOT:
             return 0
-        else:
-            children = self.get_children()
-            if not children:
-                return 0
-            return children.filter(
-                category=Venue.LOT
-            ).exclude(
-                reservation__book_from__lte=timezone.now(),
-                reservation__book_to__gte=timezone.now()
-            ).count()
+        return self.free_lot_count
 
     def save(self, *args, **kwargs):
         if not self.company:
@@ -220,6 +233,21 @@ class Venue(MPTTModel):
         super(Venue, self).save(*args, **kwargs)
 
 
+class ReservationQuerySet(models.QuerySet):
+    """ """
+
+    def holding(self):
+        """ Reservations which still hold their lot"""
+        return self.exclude(status__in=Reservation.INACTIVE_STATUS)
+
+    def overlapping(self, book_from, book_to):
+        """ Reservations holding lot at any time of [book_from, book_to]
+        including those which fully contain the range
+        """
+        return self.holding().filter(
+            book_from__lte=book_to, book_to__gte=book_from)
+
+
 class Reservation(models.Model):
     """ """
     PENDING = 'pending'
@@ -237,6 +265,9 @@ class Reservation(models.Model):
         (CLOSED, _('Closed')),
         (CANCELED, ('Canceled')))
 
+    # Reservation status which no longer hold a lot
+    INACTIVE_STATUS = (CLOSED, CANCELED)
+
     PARTIAL_PAID = 'partial paid'
     FULL_PAID = 'full paid'
 
@@ -299,6 +330,31 @@ class Reservation(models.Model):
         help_text=_('Final amount to be paid for reservation'),
         default=0,
         max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(
+        _('updated_at'), auto_now=True, db_index=True,
+        help_text=_('Last modification date time of reservation'))
+
+    objects = ReservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Booking conflict check & availability index load
+            models.Index(
+                fields=['venue', 'book_from', 'book_to'],
+                name='reservation_venue_window_idx'),
+            # User reservation list in keyset order
+            models.Index(
+                fields=['user', 'book_from'],
+                name='reservation_user_start_idx'),
+            # Status transitions
+            models.Index(
+                fields=['status', 'book_from'],
+                name='reservation_status_start_idx'),
+            # Overdue sweep only look at active reservations
+            models.Index(
+                fields=['book_to'], name='reservation_active_end_idx',
+                condition=Q(status='active')),
+        ]
 
 
 class PaymentHistory(models.Model):
@@ -330,3 +386,85 @@ class PaymentHistory(models.Model):
         auto_now_add=True,
         verbose_name=_('created'),
         help_text=_('Payment entry creation date'))
+
+
+class ReservationRollup(models.Model):
+    """ Reservation totals of venue subtree over closed period, kept so
+    reports do not rescan history
+    """
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+
+    BUCKETS = (
+        (DAY, _('Day')),
+        (WEEK, _('Week')),
+        (MONTH, _('Month'))
+    )
+
+    company = models.ForeignKey(
+        Company, on_delete=models.CASCADE,
+        verbose_name=_('company'),
+        help_text=_('Company owning venue'),
+        related_name='reservation_rollups')
+    venue = models.ForeignKey(
+        Venue, on_delete=models.CASCADE,
+        verbose_name=_('venue'),
+        help_text=_('Root of aggregated venue subtree'),
+        related_name='reservation_rollups')
+    bucket = models.CharField(
+        _('bucket'), max_length=10, choices=BUCKETS,
+        help_text=_('Period length'))
+    period_start = models.DateTimeField(
+        _('period_start'), help_text=_('Period start date time'))
+    period_end = models.DateTimeField(
+        _('period_end'), help_text=_('Period end date time, exclusive'))
+    reservation_count = models.PositiveIntegerField(
+        _('reservation_count'), default=0,
+        help_text=_('No. of reservation started in period'))
+    total_amount = models.DecimalField(
+        _('total_amount'), default=0, max_digits=14, decimal_places=2,
+        help_text=_('Sum of reservation total amount'))
+    total_amount_paid = models.DecimalField(
+        _('total_amount_paid'), default=0, max_digits=14, decimal_places=2,
+        help_text=_('Sum of reservation amount paid'))
+    overdue_amount = models.DecimalField(
+        _('overdue_amount'), default=0, max_digits=14, decimal_places=2,
+        help_text=_('Sum of reservation overdue amount'))
+    occupied_seconds = models.BigIntegerField(
+        _('occupied_seconds'), default=0,
+        help_text=_('Lot seconds reserved by reservations'))
+    computed_at = models.DateTimeField(
+        _('computed_at'), help_text=_('Date time totals computed'))
+
+    class Meta:
+        unique_together = ('venue', 'bucket', 'period_start')
+        indexes = [
+            models.Index(
+                fields=['company', 'bucket', 'period_start'],
+                name='rollup_company_period_idx'),
+        ]
+
+
+class UserSummary(models.Model):
+    """ Materialized reservation & company summary of user, see
+    `parking.summaries`
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        primary_key=True, verbose_name=_('user'),
+        help_text=_('Summarized user'), related_name='summary')
+    company = models.ForeignKey(
+        Company, null=True, on_delete=models.SET_NULL, editable=False,
+        verbose_name=_('company'),
+        help_text=_('Last created company of user'), related_name='+')
+    reservation_count = models.PositiveIntegerField(
+        _('reservation_count'), default=0, editable=False,
+        help_text=_('Materialized no. of reservation of user'))
+    active_reservation_count = models.PositiveIntegerField(
+        _('active_reservation_count'), default=0, editable=False,
+        help_text=_(
+            'Materialized no. of reservation of user still holding lot'))
+    updated_at = models.DateTimeField(
+        _('updated_at'), auto_now=True,
+        help_text=_('Last modification date time of summary'))
@@ -0,0 +1,156 @@
+""" Per process LRU cache of `LotPrice`
+
+Booking dereference price of reserved lot on every validation and
+creation while prices change rarely, so prices kept in process memory
+by id and price list of a company by company id.
+
+Every process compare its entries with version stamp kept in shared
+response cache (see `parkinglot.mixins.get_cache_versions`) before use.
+Saving or deleting a price bump the stamp, now and once more after commit,
+and every process drop its entries on next lookup. Stamp read before
+rows fetched, so entry filled from row older than stamp never survive.
+
+Cached instances are shared, they should not be modified. Hit & miss
+counters of process logged every `LOT_PRICE_CACHE_LOG_EVERY` lookups.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from parkinglot.mixins import bump_cache_versions, get_cache_versions
+
+from . import models
+
+logs = logging.getLogger(__name__)
+
+SCOPE = 'lot-price'
+
+
+class PriceCache(object):
+    """ LRU of prices by id and price lists by company
+
+    Parameters
+    ----------
+    size : int
+        Max no. of prices and company lists kept, `LOT_PRICE_CACHE_SIZE`
+        setting by default
+    """
+
+    def __init__(self, size=None):
+        self._size = size
+        self.lock = threading.Lock()
+        self.version = None
+        self.prices = OrderedDict()
+        self.companies = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self):
+        if self._size is None:
+            return getattr(settings, 'LOT_PRICE_CACHE_SIZE', 1000)
+        return self._size
+
+    def clear(self):
+        with self.lock:
+            self.prices.clear()
+            self.companies.clear()
+
+    def sync(self):
+        """ Drop every entry when shared version moved"""
+        version = get_cache_versions([SCOPE])[0]
+        with self.lock:
+            if version != self.version:
+                self.prices.clear()
+                self.companies.clear()
+                self.version = version
+
+    def _remember(self, entries, key, value):
+        with self.lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.size:
+                entries.popitem(last=False)
+
+    def _lookup(self, entries, key):
+        with self.lock:
+            found = key in entries
+            if found:
+                entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            value = entries.get(key)
+            lookups = self.hits + self.misses
+        every = getattr(settings, 'LOT_PRICE_CACHE_LOG_EVERY', 1000)
+        if every and lookups % every == 0:
+            logs.info('Lot price cache %s', self.stats())
+        return found, value
+
+    def get_many(self, price_ids):
+        """ Prices by id, unknown ids left out"""
+        price_ids = set(filter(None, price_ids))
+        if not price_ids:
+            return {}
+        self.sync()
+        prices, missing = {}, []
+        for price_id in price_ids:
+            found, price = self._lookup(self.prices, price_id)
+            if found:
+                prices[price_id] = price
+            else:
+                missing.append(price_id)
+        if missing:
+            for price in models.LotPrice.objects.filter(id__in=missing):
+                self._remember(self.prices, price.id, price)
+                prices[price.id] = price
+        return prices
+
+    def get(self, price_id):
+        """ Price with given id, `None` for free lot or unknown id"""
+        return self.get_many([price_id]).get(price_id)
+
+    def company_prices(self, company_id):
+        """ Prices of company ordered by id"""
+        self.sync()
+        found, prices = self._lookup(self.companies, company_id)
+        if not found:
+            prices = tuple(models.LotPrice.objects.filter(
+                company_id=company_id).order_by('id'))
+            self._remember(self.companies, company_id, prices)
+            for price in prices:
+                self._remember(self.prices, price.id, price)
+        return list(prices)
+
+    def stats(self):
+        """ Hit & miss counters of process"""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'prices': len(self.prices),
+                'companies': len(self.companies),
+            }
+
+
+lot_prices = PriceCache()
+
+
+def price_of_venue(venue):
+    """ Price of venue read through cache"""
+    return lot_prices.get(venue.venue_price_id)
+
+
+def invalidate():
+    lot_prices.clear()
+    bump_cache_versions([SCOPE])
+
+
+def price_changed(sender, instance, **kwargs):
+    """ Expire cached prices of every process, once more after commit so
+    row read by concurrent process before commit is not kept
+    """
+    invalidate()
+    transaction.on_commit(invalidate)
@@ -0,0 +1,110 @@
+""" Reservation price calculation
+
+Single engine which turn `LotPrice` and reservation window into amount,
+used by booking, search and quote so quoted and charged amounts never
+disagree.
+
+Many (price, window) pairs priced at once: window lengths bucketed into
+whole price units vectorized with NumPy when available and with plain
+Python otherwise. Amounts multiplied in integer cents, so both give
+exactly same result.
+"""
+from decimal import Decimal
+
+from . import models
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DAY_SECONDS = 24 * 3600
+HOUR_SECONDS = 3600
+
+
+def window_seconds(book_from, book_to):
+    """ Whole seconds of reservation window"""
+    td = book_to - book_from
+    return td.days * DAY_SECONDS + td.seconds
+
+
+def _units_python(seconds, durations, daily):
+    units = []
+    for total, duration, is_daily in zip(seconds, durations, daily):
+        days, hours = total // DAY_SECONDS, total % DAY_SECONDS // HOUR_SECONDS
+        if is_daily:
+            count = days + (1 if hours else 0)
+        else:
+            count = hours + days * 24
+        # Integer ceil of count / duration
+        units.append(-(-count // duration))
+    return units
+
+
+def _units_numpy(seconds, durations, daily):
+    seconds = numpy.asarray(seconds, dtype=numpy.int64)
+    durations = numpy.asarray(durations, dtype=numpy.int64)
+    days = seconds // DAY_SECONDS
+    hours = seconds % DAY_SECONDS // HOUR_SECONDS
+    count = numpy.where(
+        numpy.asarray(daily, dtype=bool),
+        days + (hours > 0), hours + days * 24)
+    return (-(-count // durations)).tolist()
+
+
+def quote_many(prices, windows, use_numpy=None):
+    """ Amount to be paid for every (price, window) pair
+
+    Started day count as whole day for daily price, whole hours for
+    hourly price. Lot without price is free.
+
+    Parameters
+    ----------
+    prices : list
+        (amount, duration, duration_unit) of every pair, `None` if lot have
+        no price
+    windows : list
+        (book_from, book_to) of every pair
+    use_numpy : bool
+        Bucket windows with NumPy, default when NumPy installed
+
+    Return list of `Decimal` amounts
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    priced = [index for index, price in enumerate(prices) if price]
+    amounts = [Decimal('0')] * len(prices)
+    if not priced:
+        return amounts
+    seconds, durations, daily, cents = [], [], [], []
+    for index in priced:
+        amount, duration, duration_unit = prices[index]
+        if duration < 1:
+            raise ValueError('Price duration should be positive')
+        seconds.append(window_seconds(*windows[index]))
+        durations.append(duration)
+        daily.append(duration_unit == models.LotPrice.DAY)
+        cents.append(int((Decimal(amount) * 100).to_integral_value()))
+    bucket = _units_numpy if use_numpy else _units_python
+    for index, units, unit_cents in zip(
+            priced, bucket(seconds, durations, daily), cents):
+        amounts[index] = Decimal(unit_cents * units).scaleb(-2)
+    return amounts
+
+
+def price_of(lot_price):
+    """ Pricing tuple of `LotPrice`, `None` for free lot"""
+    if lot_price is None:
+        return None
+    return (lot_price.amount, lot_price.duration, lot_price.duration_unit)
+
+
+def get_total_amount(amount, duration, duration_unit, book_from, book_to):
+    """ Amount to be paid for reserving lot during [book_from, book_to]"""
+    return quote_many(
+        [(amount, duration, duration_unit)], [(book_from, book_to)])[0]
+
+
+def quote(lot_price, book_from, book_to):
+    """ Amount to be paid for `LotPrice`, free if lot have no price"""
+    return quote_many([price_of(lot_price)], [(book_from, book_to)])[0]
@@ -0,0 +1,292 @@
+""" Company revenue & occupancy report
+
+Reservations of company aggregated per venue subtree and period (day,
+week or month of reservation start) with single GROUP BY statement.
+Subtree of each reservation found by MPTT range of its lot
+(`tree_id`, `lft` within group venue `lft`/`rght`), compared in SQL by
+correlated subquery. Canceled reservations left out.
+
+Totals of periods already ended stored in `ReservationRollup` and reused
+by later reports. Stored period recomputed when any of its reservations
+modified after totals computed (`Reservation.updated_at`) and dropped when
+reservation deleted, moved to other start time or lot moved to another
+subtree.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Count, DurationField, ExpressionWrapper, F, Max, OuterRef, Q, Subquery,
+    Sum)
+from django.db.models.functions import (
+    Coalesce, TruncDay, TruncMonth, TruncWeek)
+from django.utils import timezone
+
+from . import models
+
+Rollup = models.ReservationRollup
+
+TRUNCATE = {
+    Rollup.DAY: TruncDay,
+    Rollup.WEEK: TruncWeek,
+    Rollup.MONTH: TruncMonth,
+}
+
+TOTALS = (
+    'reservation_count', 'total_amount', 'total_amount_paid',
+    'overdue_amount', 'occupied_seconds')
+
+
+def period_start(moment, bucket):
+    """ Start of period holding `moment` in current time zone, same as
+    SQL truncation
+    """
+    day = timezone.localtime(moment).date()
+    if bucket == Rollup.WEEK:
+        day -= timedelta(days=day.weekday())
+    elif bucket == Rollup.MONTH:
+        day = day.replace(day=1)
+    return timezone.make_aware(datetime.combine(day, time()))
+
+
+def period_end(start, bucket):
+    day = timezone.localtime(start).date()
+    if bucket == Rollup.DAY:
+        day += timedelta(days=1)
+    elif bucket == Rollup.WEEK:
+        day += timedelta(days=7)
+    else:
+        day = (day + timedelta(days=32)).replace(day=1)
+    return timezone.make_aware(datetime.combine(day, time()))
+
+
+def iter_periods(start, end, bucket):
+    """ (start, end) of every period overlapping [start, end)"""
+    current = period_start(start, bucket)
+    while current < end:
+        following = period_end(current, bucket)
+        yield current, following
+        current = following
+
+
+def merge_periods(periods):
+    """ Join adjacent periods into ranges"""
+    ranges = []
+    for start, end in sorted(periods):
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def group_venues(company, venue=None):
+    """ Venues whose subtrees are reported, children of `venue` or root
+    venues of company
+    """
+    queryset = models.Venue.objects.filter(company=company)
+    if venue is not None:
+        queryset = queryset.filter(parent=venue)
+    else:
+        queryset = queryset.filter(parent=None)
+    return list(queryset.order_by('tree_id', 'lft'))
+
+
+def aggregate(groups, bucket, periods):
+    """ Totals by (group venue id, period start) of reservations started
+    within given periods, computed by database
+    """
+    within = Q()
+    for start, end in merge_periods(periods):
+        within |= Q(book_from__gte=start, book_from__lt=end)
+    group = Subquery(
+        models.Venue.objects.filter(
+            id__in=[venue.id for venue in groups],
+            tree_id=OuterRef('venue__tree_id'),
+            lft__lte=OuterRef('venue__lft'),
+            rght__gte=OuterRef('venue__rght')
+        ).order_by().values('id')[:1])
+    tree_ids = set(venue.tree_id for venue in groups)
+    rows = models.Reservation.objects.filter(
+        within, venue__tree_id__in=tree_ids
+    ).exclude(
+        status=models.Reservation.CANCELED
+    ).annotate(
+        group=group, period=TRUNCATE[bucket]('book_from')
+    ).filter(
+        group__isnull=False
+    ).values('group', 'period').annotate(
+        reservation_count=Count('id'),
+        total_amount=Coalesce(Sum('total_amount'), 0),
+        total_amount_paid=Coalesce(Sum('total_amount_paid'), 0),
+        overdue_amount=Coalesce(Sum('overdue_amount'), 0),
+        occupied=Sum(ExpressionWrapper(
+            F('book_to') - F('book_from'), output_field=DurationField()))
+    ).order_by()
+    totals = {}
+    for row in rows:
+        occupied = row.pop('occupied') or timedelta()
+        row['occupied_seconds'] = int(occupied.total_seconds())
+        totals[(row.pop('group'), row.pop('period'))] = row
+    return totals
+
+
+def stale_periods(groups, bucket, rollups):
+    """ Start of stored periods with reservation modified after totals
+    computed
+    """
+    if not rollups:
+        return set()
+    computed = {}
+    for rollup in rollups:
+        computed[rollup.period_start] = min(
+            rollup.computed_at,
+            computed.get(rollup.period_start, rollup.computed_at))
+    changed = models.Reservation.objects.filter(
+        venue__tree_id__in=set(venue.tree_id for venue in groups),
+        book_from__gte=min(computed),
+        book_from__lt=period_end(max(computed), bucket),
+        updated_at__gte=min(computed.values())
+    ).annotate(
+        period=TRUNCATE[bucket]('book_from')
+    ).values('period').annotate(
+        last_updated=Max('updated_at')
+    ).order_by()
+    return set(
+        row['period'] for row in changed
+        if row['period'] in computed and (
+            row['last_updated'] >= computed[row['period']]))
+
+
+def store_rollups(company, groups, bucket, periods, totals, now):
+    """ Replace stored totals of given closed periods
+
+    Concurrent report may store same periods first, its rows are kept
+    instead of failing on unique constraint. Both computed same totals.
+    """
+    starts = [start for start, end in periods]
+    rollups = [
+        Rollup(
+            company=company, venue=venue, bucket=bucket,
+            period_start=start, period_end=end, computed_at=now,
+            **totals.get((venue.id, start), {}))
+        for start, end in periods for venue in groups]
+    with transaction.atomic():
+        Rollup.objects.filter(
+            venue__in=groups, bucket=bucket, period_start__in=starts
+        ).delete()
+        Rollup.objects.bulk_create(
+            rollups, batch_size=500, ignore_conflicts=True)
+
+
+def company_report(company, bucket, start, end, venue=None):
+    """ Totals of every venue subtree & period overlapping [start, end)
+
+    Return list of dict ordered by venue tree position and period
+    """
+    now = timezone.now()
+    start, end = [
+        timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+        for moment in (start, end)]
+    groups = group_venues(company, venue)
+    periods = list(iter_periods(start, end, bucket))
+    if not groups or not periods:
+        return []
+    closed = [period for period in periods if period[1] <= now]
+
+    rollups = list(Rollup.objects.filter(
+        venue__in=groups, bucket=bucket,
+        period_start__in=[period[0] for period in closed]))
+    stale = stale_periods(groups, bucket, rollups)
+    stored = {}
+    for rollup in rollups:
+        if rollup.period_start not in stale:
+            stored[(rollup.venue_id, rollup.period_start)] = dict(
+                (name, getattr(rollup, name)) for name in TOTALS)
+    missing = [
+        period for period in closed
+        if any((venue.id, period[0]) not in stored for venue in groups)]
+    pending = missing + [period for period in periods if period[1] > now]
+
+    totals = {}
+    if pending:
+        totals = aggregate(groups, bucket, pending)
+    if missing:
+        store_rollups(company, groups, bucket, missing, totals, now)
+    totals.update(stored)
+
+    lot_counts = dict(models.Venue.objects.filter(
+        id__in=[venue.id for venue in groups]
+    ).annotate(
+        subtree_lots=models.lot_count_subquery(models.Venue.objects.filter(
+            category=models.Venue.LOT, tree_id=OuterRef('tree_id'),
+            lft__gte=OuterRef('lft'), rght__lte=OuterRef('rght')))
+    ).values_list('id', 'subtree_lots'))
+
+    report = []
+    for venue in groups:
+        for period_from, period_to in periods:
+            row = totals.get((venue.id, period_from)) or dict(
+                (name, 0) for name in TOTALS)
+            capacity = lot_counts.get(venue.id, 0) * (
+                period_to - period_from).total_seconds()
+            report.append({
+                'venue': venue.id,
+                'venue_name': venue.name,
+                'period_start': period_from,
+                'period_end': period_to,
+                'closed': period_to <= now,
+                'reservation_count': row['reservation_count'],
+                'total_amount': row['total_amount'],
+                'total_amount_paid': row['total_amount_paid'],
+                'overdue_amount': row['overdue_amount'],
+                'lot_hours': (
+                    Decimal(row['occupied_seconds']) / 3600
+                ).quantize(Decimal('0.01')),
+                'occupancy_rate': round(
+                    row['occupied_seconds'] / capacity, 4) if capacity else 0
+            })
+    return report
+
+
+def _forget_periods(venue_id, book_from):
+    """ Drop stored totals of company of venue for periods holding
+    `book_from`
+    """
+    Rollup.objects.filter(
+        company__venues=venue_id,
+        period_start__lte=book_from,
+        period_end__gt=book_from).delete()
+
+
+def forget_reservation(sender, instance, **kwargs):
+    """ Drop stored totals of periods deleted reservation counted in"""
+    _forget_periods(instance.venue_id, instance.book_from)
+
+
+def reservation_pre_save(sender, instance, **kwargs):
+    """ Remember lot & start time of reservation before save"""
+    instance._report_origin = None
+    if instance.pk:
+        instance._report_origin = models.Reservation.objects.filter(
+            pk=instance.pk).values_list('venue_id', 'book_from').first()
+
+
+def reservation_moved(sender, instance, **kwargs):
+    """ Drop stored totals of periods reservation counted in before it
+    moved to other lot or start time, new periods found stale by
+    `stale_periods`
+    """
+    origin = getattr(instance, '_report_origin', None)
+    if origin and origin != (instance.venue_id, instance.book_from):
+        _forget_periods(*origin)
+
+
+def forget_venue(sender, instance, **kwargs):
+    """ Drop stored totals of company when venue moved between subtrees"""
+    origin = getattr(instance, '_counter_origin', None)
+    if origin and origin[0] != instance.parent_id:
+        Rollup.objects.filter(
+            Q(company_id=instance.company_id) | Q(company_id=origin[1])
+        ).delete()
@@ -0,0 +1,111 @@
+""" Response cache scopes of public venue endpoints
+
+`VenueTree` responses cached under company scope and `Venue` responses
+under tree scope of requested venue (see
+`parkinglot.mixins.ResponseCacheMixin`). Writes to venues, prices and
+reservations bump tree of every touched venue along with every company
+owning a venue in that tree, so next request render fresh response.
+"""
+from django.conf import settings
+from django.db import transaction
+from parkinglot.mixins import bump_cache_versions, get_response_cache
+
+from . import models
+
+
+def company_scope(company_id):
+    return 'company:%s' % (company_id)
+
+
+def tree_scope(tree_id):
+    return 'tree:%s' % (tree_id)
+
+
+def _tree_key(venue_id):
+    return 'venue-tree:%s' % (venue_id)
+
+
+def tree_of(venue_id):
+    """ Tree id of venue, remembered in cache till venue moved"""
+    cache = get_response_cache()
+    tree_id = cache.get(_tree_key(venue_id))
+    if tree_id is None:
+        tree_id = models.Venue.objects.filter(
+            id=venue_id).values_list('tree_id', flat=True).first()
+        if tree_id is not None:
+            cache.set(
+                _tree_key(venue_id), tree_id,
+                getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+    return tree_id
+
+
+def invalidate_trees(tree_ids):
+    """ Expire responses of given trees and companies owning them"""
+    tree_ids = set(filter(None, tree_ids))
+    if not tree_ids:
+        return
+    company_ids = models.Venue.objects.filter(
+        tree_id__in=tree_ids
+    ).exclude(company=None).values_list('company_id', flat=True).distinct()
+    bump_cache_versions(
+        [tree_scope(tree_id) for tree_id in tree_ids] +
+        [company_scope(company_id) for company_id in company_ids])
+
+
+def invalidate_venues(venue_ids):
+    """ Expire responses of trees holding given venues"""
+    venue_ids = set(filter(None, venue_ids))
+    if not venue_ids:
+        return
+    invalidate_trees(models.Venue.objects.filter(
+        id__in=venue_ids).values_list('tree_id', flat=True).distinct())
+
+
+def _on_commit(function, *args):
+    """ Run now and once more after commit, so response rendered from
+    uncommitted rows by concurrent request do not outlive transaction
+    """
+    function(*args)
+    transaction.on_commit(lambda: function(*args))
+
+
+def venue_changed(sender, instance, **kwargs):
+    """ Expire tree of saved or deleted venue, previous parent tree as well
+    when venue moved
+    """
+    trees = [instance.tree_id]
+    origin = getattr(instance, '_counter_origin', None)
+    if origin and origin[0] != instance.parent_id:
+        trees.extend(models.Venue.objects.filter(
+            id=origin[0]).values_list('tree_id', flat=True))
+        # Whole subtree may have moved to another tree
+        get_response_cache().delete_many([
+            _tree_key(venue_id) for venue_id in
+            instance.get_descendants(include_self=True).values_list(
+                'id', flat=True)])
+    company_ids = [instance.company_id, origin and origin[1]]
+    bump_cache_versions(
+        company_scope(company_id) for company_id in company_ids
+        if company_id)
+    _on_commit(invalidate_trees, trees)
+
+
+def price_changed(sender, instance, **kwargs):
+    """ Expire company of saved or deleted price with all its trees"""
+    bump_cache_versions([company_scope(instance.company_id)])
+    _on_commit(invalidate_trees, list(models.Venue.objects.filter(
+        company_id=instance.company_id
+    ).values_list('tree_id', flat=True).distinct()))
+
+
+def price_saved(sender, instance, **kwargs):
+    """ Venue representation embed its price, so venue modification time
+    follow price change for conditional requests
+    """
+    models.Venue.objects.filter(venue_price=instance).update(
+        updated_at=instance.updated_at)
+
+
+def reservation_changed(sender, instance, **kwargs):
+    """ Expire tree of reserved lot"""
+    _on_commit(invalidate_venues, [instance.venue_id])
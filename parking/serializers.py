@@ -1,17 +1,20 @@
 """ """
-import math
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from parkinglot.fields import TimestampField
+from parkinglot.fields import TimestampField, to_timestamp
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate
-from django.db import transaction
-from django.db.models import Q
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext as _
 
 from rest_framework import serializers, exceptions
-from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
 
-from . import models
+from . import (
+    models, pricing, availability, builder, exporter, login, price_cache,
+    reports, summaries)
 
 
 class RegistrationSerializer(serializers.ModelSerializer):
@@ -54,15 +57,13 @@ class UserLoginSerializer(serializers.ModelSerializer):
 
     def validate(self, validated_data):
         """ """
-        user = authenticate(
-            request=self.context.get('request'),
-            username=validated_data['username'],
-            password=validated_data['password'])
+        user = login.login(
+            self.context.get('request'),
+            validated_data['username'], validated_data['password'])
         if user is None:
             raise serializers.ValidationError(
                 _('Invalid username and password')
             )
-        token, new = Token.objects.get_or_create(user=user)
         self.instance = user
         return validated_data
 
@@ -82,31 +83,40 @@ class UserDetailSerializer(serializers.ModelSerializer):
             'Total no. of reservation user had till now'
         )
     )
+    active_reservation_count = serializers.IntegerField(
+        default=0, help_text=_(
+            'No. of reservation of user still holding lot'
+        )
+    )
 
     class Meta:
         model = User
         fields = (
             'id', 'first_name', 'last_name',
             'email', 'company_id', 'authentication_code',
-            'username', 'reservation_count')
+            'username', 'reservation_count', 'active_reservation_count')
         read_only_fields = (
             'id', 'company_id', 'authentication_code',
-            'reservation_count')
+            'reservation_count', 'active_reservation_count')
 
     def to_representation(self, instance):
         representation = super(
             UserDetailSerializer, self).to_representation(instance)
-        company = instance.companies.last()
-        if company:
-            representation['company_id'] = company.id
-        representation['reservation_count'] = instance.user_reservation.count()
+        summary = summaries.get_summary(instance)
+        if summary.company_id:
+            representation['company_id'] = summary.company_id
+        representation['reservation_count'] = summary.reservation_count
+        representation['active_reservation_count'] = (
+            summary.active_reservation_count)
         return representation
 
 
 class CompanySerializer(serializers.ModelSerializer):
     """ """
-    total_lot = serializers.IntegerField(default=0, read_only=True)
-    available_lot = serializers.IntegerField(default=0, read_only=True)
+    total_lot = serializers.IntegerField(
+        default=0, read_only=True, source='lot_count')
+    available_lot = serializers.IntegerField(
+        default=0, read_only=True, source='free_lot_count')
 
     class Meta:
         model = models.Company
@@ -114,10 +124,66 @@ class CompanySerializer(serializers.ModelSerializer):
         read_only_fields = ('total_lot', 'available_lot')
 
 
+def render_venue_tree(venues):
+    """ Render nested tree of given venues
+
+    All descendants fetched with single `tree_id/lft` ordered query and
+    nested representation built in one linear pass. Tree ordering
+    guarantee every parent come before its children, so lot counts of
+    each node aggregated in the same pass.
+    """
+    if not venues:
+        return []
+    ranges = {}
+    for venue in venues:
+        lft, rght = ranges.get(venue.tree_id, (venue.lft, venue.rght))
+        ranges[venue.tree_id] = (
+            min(lft, venue.lft), max(rght, venue.rght))
+    condition = Q()
+    for tree_id, (lft, rght) in ranges.items():
+        condition |= Q(tree_id=tree_id, lft__gte=lft, rght__lte=rght)
+
+    nodes = {}
+    for node in models.Venue.objects.filter(condition).order_by(
+        'tree_id', 'lft'
+    ).values(
+        'id', 'name', 'category', 'venue_type', 'parent_id', 'is_occupied'
+    ):
+        parent = nodes.get(node['parent_id'])
+        representation = nodes[node['id']] = {
+            'id': node['id'],
+            'name': node['name'],
+            'category': node['category'],
+            'children': [],
+            'venue_type': node['venue_type'],
+            'total_lot': 0,
+            'available_lot': 0
+        }
+        if parent is None:
+            continue
+        parent['children'].append(representation)
+        if node['category'] == models.Venue.LOT:
+            parent['total_lot'] += 1
+            if not node['is_occupied']:
+                parent['available_lot'] += 1
+    return [nodes[venue.id] for venue in venues]
+
+
+class VenueTreeListSerializer(serializers.ListSerializer):
+    """ Render whole page of venue trees at once"""
+
+    def to_representation(self, data):
+        return render_venue_tree(list(data))
+
+
 class VenueTreeSerializer(serializers.ModelSerializer):
     """ """
-    total_lot = serializers.IntegerField(default=0, read_only=True)
-    available_lot = serializers.IntegerField(default=0, read_only=True)
+    # Rendered from its own tree query, see `render_venue_tree`
+    plan_queries = False
+    total_lot = serializers.IntegerField(
+        default=0, read_only=True, source='lot_count')
+    available_lot = serializers.IntegerField(
+        default=0, read_only=True, source='free_lot_count')
 
     class Meta:
         model = models.Venue
@@ -126,13 +192,10 @@ class VenueTreeSerializer(serializers.ModelSerializer):
                   'total_lot', 'available_lot')
         read_only_fields = (
             'children', 'total_lot', 'available_lot')
+        list_serializer_class = VenueTreeListSerializer
 
     def to_representation(self, instance):
-        representation = super(
-            VenueTreeSerializer, self).to_representation(instance)
-        representation['children'] = VenueTreeSerializer(
-            instance.get_children(), many=True).data
-        return representation
+        return render_venue_tree([instance])[0]
 
 
 class LotPriceSerializer(serializers.ModelSerializer):
@@ -148,11 +211,12 @@ class VenueViewSerializer(serializers.ModelSerializer):
     """ """
     price = LotPriceSerializer(
         allow_null=True, required=False, source='venue_price')
-    total_lot = serializers.IntegerField(default=0, read_only=True)
-    available_lot = serializers.IntegerField(default=0, read_only=True)
+    total_lot = serializers.IntegerField(
+        default=0, read_only=True, source='lot_count')
+    available_lot = serializers.IntegerField(
+        default=0, read_only=True, source='free_lot_count')
     location = serializers.CharField(
-        max_length=200, allow_null=True, read_only=True,
-        allow_blank=True, source='get_location')
+        allow_null=True, read_only=True, allow_blank=True)
     company_name = serializers.CharField(
         max_length=200, allow_null=True, read_only=True,
         allow_blank=True, source='company.name'
@@ -172,14 +236,16 @@ class VenueViewSerializer(serializers.ModelSerializer):
 
 class VenueSerializer(serializers.ModelSerializer):
     """ """
+    representation_class = VenueViewSerializer
     price = serializers.PrimaryKeyRelatedField(
         queryset=models.LotPrice.objects.all(),
         allow_null=True, source='venue_price', required=False)
-    total_lot = serializers.IntegerField(default=0, read_only=True)
-    available_lot = serializers.IntegerField(default=0, read_only=True)
+    total_lot = serializers.IntegerField(
+        default=0, read_only=True, source='lot_count')
+    available_lot = serializers.IntegerField(
+        default=0, read_only=True, source='free_lot_count')
     location = serializers.CharField(
-        max_length=200, allow_null=True, allow_blank=True,
-        read_only=True, source='get_location')
+        allow_null=True, allow_blank=True, read_only=True)
     company_name = serializers.CharField(
         max_length=200, allow_null=True, read_only=True,
         allow_blank=True, source='company.name'
@@ -205,10 +271,332 @@ class VenueSerializer(serializers.ModelSerializer):
             )
 
     def to_representation(self, instance):
-        representation = VenueViewSerializer(instance).data
+        representation = self.representation_class(instance).data
         return representation
 
 
+# Largest no. of venues created by single bulk request
+MAX_BULK_VENUES = 10000
+
+
+class LotTemplateSerializer(serializers.Serializer):
+    """ Lots generated under venue"""
+    count = serializers.IntegerField(
+        min_value=1, help_text=_('No. of lots'))
+    name = serializers.CharField(
+        max_length=100, default='Lot {number}',
+        help_text=_('Lot name, `{number}` replaced by lot no.'))
+    start = serializers.IntegerField(
+        default=1, help_text=_('No. of first lot'))
+    venue_type = serializers.ChoiceField(
+        choices=models.Venue.VENUE_TYPE, default=models.Venue.PUBLIC)
+    price = serializers.CharField(
+        required=False, allow_null=True,
+        help_text=_('Price template key'))
+
+    def validate_name(self, value):
+        try:
+            value.format(number=1)
+        except (KeyError, IndexError, ValueError):
+            raise serializers.ValidationError(
+                _('Only {number} placeholder allowed'))
+        return value
+
+
+class VenueSpecSerializer(serializers.Serializer):
+    """ Venue of bulk created tree along with its children"""
+    name = serializers.CharField(max_length=100)
+    category = serializers.ChoiceField(
+        choices=models.Venue.VENUE_CATEGORY, default=models.Venue.FLOOR)
+    venue_type = serializers.ChoiceField(
+        choices=models.Venue.VENUE_TYPE, default=models.Venue.PUBLIC)
+    price = serializers.CharField(
+        required=False, allow_null=True,
+        help_text=_('Price template key, inherited by lots below venue'))
+    lots = LotTemplateSerializer(required=False)
+    children = serializers.ListField(
+        child=serializers.DictField(), required=False, default=list,
+        help_text=_('Child venues in same format'))
+
+    def validate_children(self, value):
+        children, errors = [], []
+        for child in value:
+            serializer = VenueSpecSerializer(data=child)
+            if serializer.is_valid():
+                children.append(serializer.validated_data)
+                errors.append({})
+            else:
+                errors.append(serializer.errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return children
+
+    def validate(self, validated_data):
+        """ """
+        if validated_data['category'] == models.Venue.LOT and (
+            validated_data['children'] or validated_data.get('lots')
+        ):
+            raise serializers.ValidationError(
+                _('Lot can not have child venue'))
+        return validated_data
+
+
+class PriceTemplateSerializer(LotPriceSerializer):
+    """ Price created along with venue tree"""
+    key = serializers.CharField(
+        max_length=100, help_text=_('Key venues refer price by'))
+
+    class Meta(LotPriceSerializer.Meta):
+        fields = (
+            'key', 'duration', 'duration_unit', 'pre_paid_amount',
+            'amount', 'overdue_amount', 'name')
+
+
+class VenueBuildSerializer(VenueSpecSerializer):
+    """ Whole building with floors, lots & price templates"""
+    category = serializers.ChoiceField(
+        choices=models.Venue.VENUE_CATEGORY, default=models.Venue.BUILDING)
+    prices = PriceTemplateSerializer(many=True, required=False)
+
+    def validate(self, validated_data):
+        """ Check price keys & size of tree"""
+        validated_data = super(VenueBuildSerializer, self).validate(
+            validated_data)
+        keys = set(price['key'] for price in validated_data.get('prices', ()))
+        count = 0
+        specs = [validated_data]
+        while specs:
+            spec = specs.pop()
+            count += 1 + spec.get('lots', {}).get('count', 0)
+            for price in (spec.get('price'),
+                          spec.get('lots', {}).get('price')):
+                if price and price not in keys:
+                    raise serializers.ValidationError(
+                        _('Price template %s not defined') % (price))
+            specs.extend(spec['children'])
+        if count > MAX_BULK_VENUES:
+            raise serializers.ValidationError(
+                _('Can not create more than %s venues at once') % (
+                    MAX_BULK_VENUES))
+        return validated_data
+
+    def create(self, validated_data):
+        return builder.build_tree(validated_data['company'], validated_data)
+
+    def to_representation(self, instance):
+        return render_venue_tree([instance])[0]
+
+
+# Lot columns pricing read
+LOT_PRICE_FIELDS = (
+    'venue_price_id', 'venue_price__amount', 'venue_price__duration',
+    'venue_price__duration_unit')
+
+
+def lot_pricing(row):
+    """ Pricing tuple of lot row read with `LOT_PRICE_FIELDS`"""
+    if not row['venue_price_id']:
+        return None
+    return (
+        row['venue_price__amount'], row['venue_price__duration'],
+        row['venue_price__duration_unit'])
+
+
+# Largest no. of lots returned by single search
+MAX_SEARCH_RESULTS = 100
+
+
+class LotSearchSerializer(serializers.Serializer):
+    """ Free lot search parameters"""
+    book_from = TimestampField(help_text=_('Reservation start timestamp'))
+    book_to = TimestampField(help_text=_('Reservation end timestamp'))
+    venue = serializers.IntegerField(
+        required=False,
+        help_text=_('Search lots inside this venue only'))
+    company = serializers.IntegerField(
+        required=False,
+        help_text=_('Search lots of this company only'))
+    max_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False,
+        help_text=_('Highest total amount to be paid for reservation'))
+
+    def validate(self, validated_data):
+        """ """
+        if validated_data['book_from'] >= validated_data['book_to']:
+            raise serializers.ValidationError(
+                _('Reservation end time should be'
+                  ' greater than start time')
+            )
+        if not (validated_data.get('venue') or
+                validated_data.get('company')):
+            raise serializers.ValidationError(
+                _('Venue or company should be given'))
+        return validated_data
+
+    def rank_prices(self, lots):
+        """ Rank of every price used by lots, `None` key for lots without
+        price. Lots sharing price cost the same, so only distinct prices
+        quoted. Prices above `max_price` left out.
+        """
+        data = self.validated_data
+        prices = list(lots.order_by().values(*LOT_PRICE_FIELDS).distinct())
+        amounts = pricing.quote_many(
+            [lot_pricing(row) for row in prices],
+            [(data['book_from'], data['book_to'])] * len(prices))
+        positions = dict(
+            (amount, position) for position, amount in enumerate(sorted(set(
+                amount for amount in amounts
+                if data.get('max_price') is None or
+                amount <= data['max_price']))))
+        return dict(
+            (row['venue_price_id'], (positions[amount], amount))
+            for row, amount in zip(prices, amounts) if amount in positions)
+
+    def find_lots(self, user=None):
+        """ Free lots for reservation window ranked by total amount and
+        then by closeness to searched venue in tree
+
+        Lots ordered by price rank & tree level in SQL and read in chunks,
+        availability of every chunk checked at once by availability index
+        till `MAX_SEARCH_RESULTS` free lots found
+        """
+        data = self.validated_data
+        lots = models.Venue.objects.filter(category=models.Venue.LOT)
+        if user is not None and user.is_authenticated:
+            lots = lots.filter(
+                Q(venue_type=models.Venue.PUBLIC) | Q(company__user=user))
+        else:
+            lots = lots.filter(venue_type=models.Venue.PUBLIC)
+        base_level = 0
+        if data.get('venue'):
+            parent = get_object_or_404(models.Venue, id=data['venue'])
+            lots = lots.filter(
+                tree_id=parent.tree_id,
+                lft__gt=parent.lft, rght__lt=parent.rght)
+            base_level = parent.level
+        if data.get('company'):
+            lots = lots.filter(company_id=data['company'])
+
+        ranks = self.rank_prices(lots)
+        if not ranks:
+            return []
+        rank = Case(
+            *[When(venue_price_id=price_id, then=Value(position))
+              if price_id else
+              When(venue_price__isnull=True, then=Value(position))
+              for price_id, (position, amount) in ranks.items()],
+            output_field=IntegerField())
+        lots = lots.annotate(price_rank=rank).filter(
+            price_rank__isnull=False).order_by('price_rank', 'level', 'id')
+
+        results = []
+        offset = 0
+        while len(results) < MAX_SEARCH_RESULTS:
+            rows = list(lots.values(
+                'id', 'name', 'level', 'company__name', 'venue_price_id'
+            )[offset:offset + availability.QUERY_CHUNK_SIZE])
+            if not rows:
+                break
+            offset += len(rows)
+            free = set(availability.free_lots(
+                [row['id'] for row in rows],
+                data['book_from'], data['book_to']))
+            results.extend({
+                'id': row['id'],
+                'name': row['name'],
+                'company_name': row['company__name'],
+                'price': row['venue_price_id'],
+                'total_amount': ranks[row['venue_price_id']][1],
+                'distance': row['level'] - base_level
+            } for row in rows if row['id'] in free)
+        return results[:MAX_SEARCH_RESULTS]
+
+
+class LotSearchResultSerializer(serializers.Serializer):
+    """ Free lot found by search"""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    company_name = serializers.CharField(allow_null=True)
+    price = serializers.IntegerField(
+        allow_null=True, help_text=_('Lot price id'))
+    total_amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2,
+        help_text=_('Amount to be paid for reservation window'))
+    distance = serializers.IntegerField(
+        help_text=_('Tree depth of lot below searched venue'))
+
+
+# Largest no. of windows priced by single quote request
+MAX_QUOTES = 1000
+
+
+class QuoteSerializer(serializers.Serializer):
+    """ Lot & reservation window to be priced"""
+    venue = serializers.IntegerField(help_text=_('Lot id'))
+    book_from = TimestampField(help_text=_('Reservation start timestamp'))
+    book_to = TimestampField(help_text=_('Reservation end timestamp'))
+    price = serializers.IntegerField(
+        read_only=True, help_text=_('Lot price id'))
+    total_amount = serializers.DecimalField(
+        max_digits=10, decimal_places=2, read_only=True,
+        help_text=_('Amount to be paid for reservation window'))
+
+    def validate(self, validated_data):
+        """ """
+        if validated_data['book_from'] > validated_data['book_to']:
+            raise serializers.ValidationError(
+                _('Reservation end time should be'
+                  ' greater than start time')
+            )
+        return validated_data
+
+
+class QuoteRequestSerializer(serializers.Serializer):
+    """ Windows to be priced at once"""
+    windows = QuoteSerializer(many=True)
+
+    def validate_windows(self, windows):
+        """ """
+        if not windows:
+            raise serializers.ValidationError(_('No window given'))
+        if len(windows) > MAX_QUOTES:
+            raise serializers.ValidationError(
+                _('At most %s windows can be priced at once' % (
+                    MAX_QUOTES)))
+        return windows
+
+    def quote(self, user=None):
+        """ Price every window with single lot query, same engine booking
+        charge with
+        """
+        windows = self.validated_data['windows']
+        lots = models.Venue.objects.filter(
+            category=models.Venue.LOT,
+            id__in=set(window['venue'] for window in windows))
+        if user is not None and user.is_authenticated:
+            lots = lots.filter(
+                Q(venue_type=models.Venue.PUBLIC) | Q(company__user=user))
+        else:
+            lots = lots.filter(venue_type=models.Venue.PUBLIC)
+        rows = dict(
+            (row['id'], row)
+            for row in lots.values('id', *LOT_PRICE_FIELDS))
+        unknown = sorted(set(
+            window['venue'] for window in windows) - set(rows))
+        if unknown:
+            raise serializers.ValidationError({
+                'windows': [_('Lot %s not found' % (lot_id))
+                            for lot_id in unknown]})
+        amounts = pricing.quote_many(
+            [lot_pricing(rows[window['venue']]) for window in windows],
+            [(window['book_from'], window['book_to'])
+             for window in windows])
+        return [
+            dict(window, price=rows[window['venue']]['venue_price_id'],
+                 total_amount=amount)
+            for window, amount in zip(windows, amounts)]
+
+
 class PaymentHistorySerializer(serializers.ModelSerializer):
     """ """
     class Meta:
@@ -275,8 +663,29 @@ class ReservationViewSerializer(serializers.ModelSerializer):
             'total_amount', 'user')
 
 
+VENUE_NOT_AVAILABLE = _(
+    'Venue not available in given time.'
+    'Please select another slot')
+
+# Database without row level lock (SQLite) serialize bookings within
+# process instead
+BOOKING_LOCK = threading.Lock()
+
+
+@contextmanager
+def booking_transaction():
+    """ Transaction in which venue row locked for booking"""
+    if connection.features.has_select_for_update:
+        with transaction.atomic():
+            yield
+    else:
+        with BOOKING_LOCK, transaction.atomic():
+            yield
+
+
 class ReservationSerializer(ReservationViewSerializer):
     """ """
+    representation_class = ReservationViewSerializer
     book_from = TimestampField()
     book_to = TimestampField()
     venue = serializers.PrimaryKeyRelatedField(
@@ -300,42 +709,26 @@ class ReservationSerializer(ReservationViewSerializer):
 
     def validate(self, validated_data):
         """ """
-        venue = validated_data['venue']
-        if validated_data['payment_history']:
+        # Partial update keep current value of fields left out
+        current = self.instance
+        venue = validated_data.get('venue') or current.venue
+        if validated_data.get('payment_history'):
             payment = validated_data['payment_history'][0]
         else:
             payment = {}
-        if validated_data['book_from'] > validated_data['book_to']:
+        book_from = validated_data.get('book_from') or current.book_from
+        book_to = validated_data.get('book_to') or current.book_to
+        if to_timestamp(book_from) > to_timestamp(book_to):
             raise serializers.ValidationError(
                 _('Reservation end time should be'
                   ' greater than start time')
             )
-        check_booking = models.Reservation.objects.filter(
-            venue=venue
-        ).filter(
-            Q(
-                book_from__range=(
-                    validated_data['book_from'],
-                    validated_data['book_to']
-                )
-            ) |
-            Q(
-                book_to__range=(
-                    validated_data['book_from'],
-                    validated_data['book_to']
-                )
-            )
-        )
-        if check_booking:
-            raise serializers.ValidationError(
-                _('Venue not available in given time.'
-                  'Please select another slot')
-            )
-        if venue.venue_price:
+        venue_price = price_cache.price_of_venue(venue)
+        if venue_price:
             if (
-                venue.venue_price.pre_paid_amount
+                venue_price.pre_paid_amount
             ) and (
-                venue.venue_price.pre_paid_amount > payment.get('amount', 0)
+                venue_price.pre_paid_amount > payment.get('amount', 0)
             ):
                 raise serializers.ValidationError(
                     _('Pre paid amount not matched')
@@ -343,38 +736,68 @@ class ReservationSerializer(ReservationViewSerializer):
         return validated_data
 
     def update(self, instance, validated_data):
-        instance.__dict__.update(**validated_data)
+        """ Update reservation
+
+        Reservation moved to other lot or time checked for overlap within
+        locked venue row, same as `create`.
+        """
+        validated_data.pop('payment_history', None)
+        moved = any(
+            name in validated_data
+            for name in ('venue', 'book_from', 'book_to'))
+        status = validated_data.get('status', instance.status)
+        if not moved or status in models.Reservation.INACTIVE_STATUS:
+            return self.save_instance(instance, validated_data)
+        with booking_transaction():
+            venue = models.Venue.objects.select_for_update().get(
+                id=validated_data.get('venue', instance.venue).id)
+            if models.Reservation.objects.filter(
+                venue=venue
+            ).overlapping(
+                validated_data.get('book_from', instance.book_from),
+                validated_data.get('book_to', instance.book_to)
+            ).exclude(pk=instance.pk).exists():
+                raise serializers.ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [VENUE_NOT_AVAILABLE]
+                })
+            validated_data['venue'] = venue
+            return self.save_instance(instance, validated_data)
+
+    def save_instance(self, instance, validated_data):
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
         instance.save()
         return instance
 
     def create(self, validated_data):
-        """
+        """ Book venue
+
+        Venue row locked before overlap check, so concurrent booking of
+        same venue wait for each other and only first one get inserted.
         """
         try:
-            with transaction.atomic():
-                venue = validated_data['venue']
+            with booking_transaction():
+                venue = models.Venue.objects.select_for_update().get(
+                    id=validated_data['venue'].id)
+                if models.Reservation.objects.filter(
+                    venue=venue
+                ).overlapping(
+                    validated_data['book_from'], validated_data['book_to']
+                ).exists():
+                    raise serializers.ValidationError({
+                        api_settings.NON_FIELD_ERRORS_KEY: [
+                            VENUE_NOT_AVAILABLE]
+                    })
+                validated_data['venue'] = venue
                 payment = validated_data.pop('payment_history')
                 if payment:
                     payment = payment[0]
-                if venue.venue_price:
-                    venue_price = venue.venue_price
+                venue_price = price_cache.price_of_venue(venue)
+                if venue_price:
                     validated_data['amount'] = venue_price.amount
-                    td = (
-                        validated_data['book_to'] - validated_data['book_from'])
-                    days, hours, minutes = (
-                        td.days, td.seconds // 3600, td.seconds // 60 % 60)
-                    if venue_price.duration_unit == models.LotPrice.DAY:
-                        if hours:
-                            days = days + 1
-                        total_amount = venue_price.amount * math.ceil(
-                            days / venue_price.duration)
-                    else:
-                        if days:
-                            hours = hours + (days * 24)
-                        total_amount = venue_price.amount * math.ceil(
-                            hours / venue_price.duration
-                        )
-                    validated_data['total_amount'] = total_amount
+                    validated_data['total_amount'] = pricing.quote(
+                        venue_price, validated_data['book_from'],
+                        validated_data['book_to'])
                     if validated_data['total_amount'] == payment['amount']:
                         validated_data['payment_status'] = models.Reservation.FULL_PAID
                     elif validated_data['total_amount'] > payment['amount']:
@@ -393,6 +816,117 @@ class ReservationSerializer(ReservationViewSerializer):
             )
 
     def to_representation(self, instance):
-        return ReservationViewSerializer(
+        return self.representation_class(
             instance, context=self.context
         ).data
+
+
+class ReservationImportSerializer(serializers.ModelSerializer):
+    """ Single row of bulk reservation import"""
+    venue = serializers.IntegerField(
+        source='venue_id', help_text=_('Lot id'))
+    book_from = TimestampField()
+    book_to = TimestampField()
+
+    class Meta:
+        model = models.Reservation
+        fields = (
+            'venue', 'book_from', 'book_to', 'license', 'phone_number',
+            'status', 'amount', 'overdue_amount', 'payment_status',
+            'total_amount', 'total_amount_paid')
+
+    def validate(self, validated_data):
+        """ """
+        if validated_data['book_from'] > validated_data['book_to']:
+            raise serializers.ValidationError(
+                _('Reservation end time should be'
+                  ' greater than start time')
+            )
+        return validated_data
+
+
+class ExportSerializer(serializers.Serializer):
+    """ Company data export parameters"""
+    dataset = serializers.ChoiceField(
+        choices=exporter.DATASETS, default=exporter.RESERVATIONS,
+        help_text=_('Reservations by start time or payments by creation'
+                    ' time'))
+    # `format` query parameter select renderer in DRF
+    output = serializers.ChoiceField(
+        choices=exporter.FORMATS, default=exporter.CSV,
+        help_text=_('Output format, CSV when columnar format not'
+                    ' available'))
+    start = TimestampField(help_text=_('Range start timestamp'))
+    end = TimestampField(help_text=_('Range end timestamp, exclusive'))
+
+    def validate(self, validated_data):
+        """ """
+        if validated_data['start'] >= validated_data['end']:
+            raise serializers.ValidationError(
+                _('Range end time should be greater than start time'))
+        return validated_data
+
+
+class ReportSerializer(serializers.Serializer):
+    """ Company revenue & occupancy report parameters"""
+    bucket = serializers.ChoiceField(
+        choices=models.ReservationRollup.BUCKETS,
+        default=models.ReservationRollup.DAY,
+        help_text=_('Period length'))
+    start = TimestampField(help_text=_('Range start timestamp'))
+    end = TimestampField(help_text=_('Range end timestamp, exclusive'))
+    venue = serializers.IntegerField(
+        required=False,
+        help_text=_('Report subtrees of venue children, company buildings'
+                    ' by default'))
+
+    # Longest range in days of each bucket
+    MAX_DAYS = {
+        models.ReservationRollup.DAY: 366,
+        models.ReservationRollup.WEEK: 366 * 2,
+        models.ReservationRollup.MONTH: 366 * 10,
+    }
+
+    def validate(self, validated_data):
+        """ """
+        if validated_data['start'] >= validated_data['end']:
+            raise serializers.ValidationError(
+                _('Range end time should be greater than start time'))
+        days = (validated_data['end'] - validated_data['start']).days
+        if days > self.MAX_DAYS[validated_data['bucket']]:
+            raise serializers.ValidationError(
+                _('Range too long for %s bucket' % (
+                    validated_data['bucket'])))
+        return validated_data
+
+    def build_report(self, company):
+        """ """
+        data = self.validated_data
+        venue = None
+        if data.get('venue'):
+            venue = get_object_or_404(
+                models.Venue, id=data['venue'], company=company)
+        return reports.company_report(
+            company, data['bucket'], data['start'], data['end'], venue)
+
+
+class ReportRowSerializer(serializers.Serializer):
+    """ Totals of venue subtree over single period"""
+    venue = serializers.IntegerField(help_text=_('Subtree root venue id'))
+    venue_name = serializers.CharField()
+    period_start = TimestampField()
+    period_end = TimestampField()
+    closed = serializers.BooleanField(
+        help_text=_('Period ended, totals served from rollup'))
+    reservation_count = serializers.IntegerField()
+    total_amount = serializers.DecimalField(
+        max_digits=14, decimal_places=2)
+    total_amount_paid = serializers.DecimalField(
+        max_digits=14, decimal_places=2)
+    overdue_amount = serializers.DecimalField(
+        max_digits=14, decimal_places=2)
+    lot_hours = serializers.DecimalField(
+        max_digits=14, decimal_places=2,
+        help_text=_('Lot hours reserved by reservations started in period'))
+    occupancy_rate = serializers.FloatField(
+        help_text=_('Reserved lot hours over lot hours of subtree'))
@@ -0,0 +1,165 @@
+""" Discrete time slot bitmap availability store
+
+Hourly and daily priced lots are booked in whole slots, so occupancy of
+every lot for a rolling horizon (default 90 days x 24 hourly slots) kept
+as a row of bits. "Which lots are free in window" then become a single
+OR across window columns of all requested rows, vectorized with NumPy
+when available and with Python integer bit masks otherwise.
+
+Slot marked busy when any reservation touch it, store is conservative:
+it never report lot free which is reserved. Window outside horizon is
+answered by `None` and caller fall back to interval index.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from parkinglot.fields import to_timestamp
+
+from . import models
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# SQLite allow limited no. of query parameters
+QUERY_CHUNK_SIZE = 500
+
+
+class SlotBitmapStore(object):
+    """ Per lot occupancy bitmap
+
+    Parameters
+    ----------
+    slot_seconds : int
+        Length of single slot
+    horizon_slots : int
+        No. of slots kept for every lot starting from current slot
+    use_numpy : bool
+        Store bitmap as NumPy boolean matrix, default when NumPy installed
+    """
+
+    def __init__(self, slot_seconds=3600, horizon_slots=90 * 24,
+                 use_numpy=None):
+        self.slot_seconds = slot_seconds
+        self.horizon_slots = horizon_slots
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.origin = None
+            self._rows = {}
+            # Shared lot version bitmap loaded under
+            self._versions = {}
+            if self.use_numpy:
+                self._bits = numpy.zeros((0, self.horizon_slots), dtype=bool)
+            else:
+                self._bits = []
+
+    def invalidate(self, lot_id):
+        """ Drop lot bitmap, next lookup reload it from database"""
+        with self._lock:
+            self._versions.pop(lot_id, None)
+
+    def _roll(self, now):
+        """ Restart horizon from current slot once a day passed"""
+        if self.origin is None or now - self.origin >= 24 * 3600:
+            self.clear()
+            self.origin = now - now % self.slot_seconds
+
+    def _slot(self, timestamp):
+        return int((timestamp - self.origin) // self.slot_seconds)
+
+    def _row(self, lot_id):
+        """ Return cleared bitmap row of lot, allocating new one"""
+        row = self._rows.get(lot_id)
+        if row is None:
+            row = self._rows[lot_id] = len(self._rows)
+            if self.use_numpy:
+                if row >= len(self._bits):
+                    bits = numpy.zeros(
+                        (max(64, row * 2), self.horizon_slots), dtype=bool)
+                    bits[:len(self._bits)] = self._bits
+                    self._bits = bits
+            else:
+                self._bits.append(0)
+        if self.use_numpy:
+            self._bits[row] = False
+        else:
+            self._bits[row] = 0
+        return row
+
+    def _mark(self, row, first, last):
+        """ Mark slots [first, last] of row busy"""
+        if self.use_numpy:
+            self._bits[row, first:last + 1] = True
+        else:
+            self._bits[row] |= ((1 << (last - first + 1)) - 1) << first
+
+    def _load(self, lot_ids, versions=None):
+        """ Load bitmap of unknown or outdated lots from database"""
+        versions = versions or {}
+        missing = [
+            lot_id for lot_id in set(lot_ids)
+            if lot_id not in self._versions or
+            self._versions[lot_id] != versions.get(lot_id)
+        ]
+        origin = datetime.fromtimestamp(self.origin, timezone.utc)
+        until = origin + timedelta(
+            seconds=self.slot_seconds * self.horizon_slots)
+        last_slot = self.horizon_slots - 1
+        for offset in range(0, len(missing), QUERY_CHUNK_SIZE):
+            chunk = missing[offset:offset + QUERY_CHUNK_SIZE]
+            rows = {lot_id: self._row(lot_id) for lot_id in chunk}
+            for venue_id, book_from, book_to in models.Reservation.objects.filter(
+                venue_id__in=chunk, book_to__gte=origin, book_from__lt=until
+            ).holding().values_list('venue_id', 'book_from', 'book_to'):
+                self._mark(
+                    rows[venue_id],
+                    max(self._slot(to_timestamp(book_from)), 0),
+                    min(self._slot(to_timestamp(book_to)), last_slot))
+            for lot_id in chunk:
+                self._versions[lot_id] = versions.get(lot_id)
+
+    def busy_lots(self, lot_ids, start, end=None, versions=None):
+        """ Return set of lot ids with any busy slot in [start, end],
+        `None` if window not within horizon. Lot bitmap reloaded when its
+        version in `versions` moved.
+        """
+        start = to_timestamp(start)
+        end = start if end is None else to_timestamp(end)
+        with self._lock:
+            self._roll(time.time())
+            first, last = self._slot(start), self._slot(end)
+            if first < 0 or last >= self.horizon_slots:
+                return None
+            lot_ids = list(lot_ids)
+            self._load(lot_ids, versions)
+            if not lot_ids:
+                return set()
+            if self.use_numpy:
+                rows = [self._rows[lot_id] for lot_id in lot_ids]
+                busy = self._bits[rows, first:last + 1].any(axis=1)
+                return set(
+                    lot_id for lot_id, is_busy in zip(lot_ids, busy)
+                    if is_busy)
+            mask = ((1 << (last - first + 1)) - 1) << first
+            return set(
+                lot_id for lot_id in lot_ids
+                if self._bits[self._rows[lot_id]] & mask)
+
+
+def get_store():
+    """ Slot store configured by `PARKING_SLOT_STORE` setting, `None` if
+    disabled
+    """
+    if not getattr(settings, 'PARKING_SLOT_STORE', False):
+        return None
+    return SlotBitmapStore(
+        slot_seconds=getattr(settings, 'PARKING_SLOT_SECONDS', 3600),
+        horizon_slots=getattr(settings, 'PARKING_SLOT_HORIZON', 90 * 24))
@@ -0,0 +1,118 @@
+""" Materialized per user summary
+
+`UserSummary` of every user store no. of its reservations, no. of
+reservations still holding a lot and its last created company, so user
+detail and login read them with user row instead of running COUNT
+queries over reservation history.
+
+Summary row created along with user and recomputed with single set based
+UPDATE in transaction of every reservation or company write of the user.
+Status transitions between holding statuses (see
+`Reservation.INACTIVE_STATUS`) keep active count as is, so bulk status
+updates of `parking.tasks` need no refresh. `rebuild` repair every row.
+"""
+from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import models
+
+
+def _count(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values('user').annotate(
+                total=Count('id')).values('total')[:1],
+            output_field=IntegerField()
+        ), 0)
+
+
+def _summary_values():
+    reservations = models.Reservation.objects.filter(
+        user_id=OuterRef('user_id'))
+    return {
+        'reservation_count': _count(reservations),
+        'active_reservation_count': _count(reservations.holding()),
+        'company_id': Subquery(
+            models.Company.objects.filter(
+                user_id=OuterRef('user_id')
+            ).order_by('-id').values('id')[:1],
+            output_field=IntegerField()),
+        'updated_at': timezone.now()
+    }
+
+
+def create_missing(user_ids=None):
+    """ Insert empty summary of users which have none"""
+    users = User.objects.filter(summary=None)
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    return len(models.UserSummary.objects.bulk_create(
+        [models.UserSummary(user_id=user_id)
+         for user_id in users.values_list('id', flat=True)],
+        batch_size=500, ignore_conflicts=True))
+
+
+def refresh_users(user_ids, fields=None):
+    """ Recompute given fields of summary of given users, every field if
+    `None`
+
+    Return no. of summaries updated
+    """
+    user_ids = set(filter(None, user_ids))
+    if not user_ids:
+        return 0
+    values = _summary_values()
+    if fields is not None:
+        values = dict(
+            (name, value) for name, value in values.items()
+            if name in fields or name == 'updated_at')
+    return models.UserSummary.objects.filter(
+        user_id__in=user_ids).update(**values)
+
+
+def rebuild(user_ids=None):
+    """ Create missing summaries and recompute summaries of given users,
+    every user if `None`
+
+    Return no. of summaries updated
+    """
+    create_missing(user_ids)
+    queryset = models.UserSummary.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return queryset.update(**_summary_values())
+
+
+def get_summary(user):
+    """ Summary of user, created when missing"""
+    try:
+        return user.summary
+    except models.UserSummary.DoesNotExist:
+        rebuild([user.id])
+        user.summary = models.UserSummary.objects.get(user=user)
+        return user.summary
+
+
+def user_queryset():
+    """ Users with summary & login token read together"""
+    return User.objects.select_related('summary', 'auth_token')
+
+
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    """ Create empty summary of new user"""
+    if created and not raw:
+        models.UserSummary.objects.bulk_create(
+            [models.UserSummary(user=instance)], ignore_conflicts=True)
+
+
+def reservation_changed(sender, instance, **kwargs):
+    """ Recount reservations of user of saved or deleted reservation"""
+    refresh_users([instance.user_id], fields=(
+        'reservation_count', 'active_reservation_count'))
+
+
+def company_changed(sender, instance, **kwargs):
+    """ Refresh last company of owner of saved or deleted company"""
+    refresh_users([instance.user_id], fields=('company_id',))
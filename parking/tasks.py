@@ -1,32 +1,190 @@
-from datetime import datetime
+import logging
+from datetime import timedelta
+from celery.signals import worker_ready
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from parkinglot.celery import app
+from parkinglot.mixins import get_response_cache
 
-from . import models
+from . import models, counters
+
+logs = logging.getLogger(__name__)
+
+# Reservation become overdue once end time passed
+OVERDUE_DELAY = timedelta(seconds=1)
+
+# End of last window queued by `schedule_reservation_transitions`
+SCHEDULED_UNTIL_KEY = 'reservation-transitions:until'
+
+
+def apply_status_transitions(queryset, now=None):
+    """ Move reservations of queryset to their time based status
+
+    Each transition run as single UPDATE statement, overdue fee read from
+    venue price with correlated subquery instead of per row lookup.
+
+    Return no. of reservations touched by each transition
+    """
+    now = now or timezone.now()
+    overdue_fee = Coalesce(
+        Subquery(
+            models.Venue.objects.filter(
+                id=OuterRef('venue_id')
+            ).values('venue_price__overdue_amount')[:1],
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        ), 0)
+
+    with transaction.atomic():
+        overdue = queryset.filter(
+            status=models.Reservation.ACTIVE, book_to__lt=now
+        ).update(
+            status=models.Reservation.OVERDUE,
+            overdue_amount=F('overdue_amount') + overdue_fee,
+            total_amount=(
+                F('total_amount') + F('overdue_amount') + overdue_fee),
+            updated_at=now
+        )
+
+        pending = queryset.filter(
+            status=models.Reservation.PENDING,
+            book_from__lte=now, book_to__gt=now)
+        # Active reservation occupy their lot, overdue one already did
+        lot_ids = set(pending.values_list('venue_id', flat=True))
+        active = pending.update(
+            status=models.Reservation.ACTIVE, updated_at=now)
+        counters.refresh_lots(lot_ids)
+
+    return {
+        models.Reservation.OVERDUE: overdue,
+        models.Reservation.ACTIVE: active
+    }
 
 
 @app.task
 def check_reservation_status():
-    """ """
-
-    for reservation in models.Reservation.objects.filter(
-        book_from__date=timezone.now().date(),
-        status__in=[
-            models.Reservation.ACTIVE,
-            models.Reservation.PENDING]
-    ):
-        if (
-            reservation.book_to < timezone.now()
-        ) and reservation.status == models.Reservation.ACTIVE:
-            reservation.status = models.Reservation.OVERDUE
-            reservation.overdue_amount = (
-                reservation.overdue_amount + reservation.venue.price.overdue_amount)
-            reservation.total_amount = reservation.total_amount + reservation.overdue_amount
-            reservation.save()
-
-        elif (
-            reservation.book_from < timezone.now()
-            and reservation.book_to > timezone.now()
-        ) and reservation.status == models.Reservation.PENDING:
-            reservation.status = models.Reservation.ACTIVE
-            reservation.save()
+    """ Polling fallback for today's reservations status
+
+    Return no. of reservations touched by each transition
+    """
+    now = timezone.now()
+    result = apply_status_transitions(
+        models.Reservation.objects.filter(book_from__date=now.date()), now)
+    logs.info('Reservation status updated %s', result)
+    return result
+
+
+@app.task
+def transit_reservation(reservation_id):
+    """ Fired at reservation start or end time to move reservation to
+    next status. Safe to run any no. of times.
+    """
+    return apply_status_transitions(
+        models.Reservation.objects.filter(id=reservation_id))
+
+
+def get_boundaries(status, book_from, book_to):
+    """ Time at which reservation with given status change next"""
+    if status == models.Reservation.PENDING:
+        boundaries = [book_from, book_to + OVERDUE_DELAY]
+    elif status == models.Reservation.ACTIVE:
+        boundaries = [book_to + OVERDUE_DELAY]
+    else:
+        boundaries = []
+    return [
+        timezone.make_aware(x) if timezone.is_naive(x) else x
+        for x in boundaries
+    ]
+
+
+def schedule_reservation(
+        reservation_id, status, book_from, book_to, since=None, until=None):
+    """ Queue `transit_reservation` at reservation boundaries which fall
+    in [since, until) time range. Broker keep them in its delayed queue
+    until boundary reached.
+
+    Return no. of queued tasks
+    """
+    queued = 0
+    for boundary in get_boundaries(status, book_from, book_to):
+        if since and boundary < since:
+            continue
+        if until and boundary >= until:
+            continue
+        transit_reservation.apply_async(
+            args=(reservation_id,), eta=boundary)
+        queued += 1
+    return queued
+
+
+def get_horizon(now):
+    return now + timedelta(seconds=getattr(
+        settings, 'PARKING_TRANSITION_HORIZON', 3600))
+
+
+@app.task
+def schedule_reservation_transitions(rebuild=False):
+    """ Queue transitions of reservations with boundary before horizon
+
+    Run periodically with horizon as interval. Window start where
+    previous run stopped (kept in shared response cache), so boundaries
+    missed by late run are still queued; queuing twice is harmless as
+    transition is idempotent. `rebuild` also queue already passed
+    boundaries, used to rebuild delayed queue on worker startup.
+    """
+    now = timezone.now()
+    until = get_horizon(now)
+    cache = get_response_cache()
+    if rebuild:
+        since = None
+    else:
+        # Previous window end unknown, overlap one horizon instead
+        previous = cache.get(SCHEDULED_UNTIL_KEY) or now - (until - now)
+        since = min(previous, now)
+    started = now if since is None else since - OVERDUE_DELAY
+    queued = 0
+    for row in models.Reservation.objects.filter(
+        Q(
+            status=models.Reservation.PENDING,
+            book_from__lt=until, book_to__gt=started
+        ) | Q(
+            status=models.Reservation.ACTIVE,
+            book_to__lt=until
+        )
+    ).values_list('id', 'status', 'book_from', 'book_to').iterator():
+        queued += schedule_reservation(*row, since=since, until=until)
+    cache.set(SCHEDULED_UNTIL_KEY, until, None)
+    logs.info('Reservation transitions queued %s', queued)
+    return queued
+
+
+@worker_ready.connect
+def rebuild_transition_queue(sender=None, **kwargs):
+    """ Queue every pending transition on worker startup"""
+    schedule_reservation_transitions.delay(rebuild=True)
+
+
+def reservation_pre_save(sender, instance, **kwargs):
+    """ Remember status & time range of reservation before save"""
+    instance._transition_origin = None
+    if instance.pk:
+        instance._transition_origin = models.Reservation.objects.filter(
+            pk=instance.pk).values_list(
+                'status', 'book_from', 'book_to').first()
+
+
+def reservation_saved(sender, instance, created, **kwargs):
+    """ Queue transitions of new or moved reservation within horizon, later
+    one picked up by `schedule_reservation_transitions`. Tasks queued for
+    former time range find nothing to move.
+    """
+    args = (
+        instance.id, instance.status, instance.book_from, instance.book_to)
+    origin = getattr(instance, '_transition_origin', None)
+    if not created and origin and (
+            get_boundaries(*origin) == get_boundaries(*args[1:])):
+        return
+    transaction.on_commit(lambda: schedule_reservation(
+        *args, until=get_horizon(timezone.now())))
@@ -15,6 +15,9 @@ urlpatterns = [
     # Company detail
     path('company/<int:company_id>', views.CompanyDetail.as_view(),
          name='company-detail'),
+    # Company revenue & occupancy report
+    path('company/<int:company_id>/report', views.CompanyReport.as_view(),
+         name='company-report'),
     # Company venue price list
     path('company/<int:company_id>/price',
          views.LotPrice.as_view(), name='lot-price'),
@@ -24,11 +27,18 @@ urlpatterns = [
     # Company venue tree
     path('company/<int:company_id>/venue', views.VenueTree.as_view(),
          name='venue-tree'),
+    # Company building with floors & lots
+    path('company/<int:company_id>/venue/bulk', views.VenueBuild.as_view(),
+         name='venue-build'),
     # Company sub venue list
     path('venue/<int:venue_id>/venue',
          views.Venue.as_view(), name='sub-venue-list'),
     # Company venue detail
     path('venue/<int:venue_id>', views.VenueDetail.as_view(), name='venue-detail'),
+    # Free lot search for reservation window
+    path('venue/search', views.LotSearch.as_view(), name='lot-search'),
+    # Price of lot reservation windows
+    path('venue/quote', views.LotQuote.as_view(), name='lot-quote'),
     # Venue search from all company
     path('venue', views.VenueList.as_view(), name='venue'),
     # Venue booking
@@ -39,6 +49,12 @@ urlpatterns = [
     # Company reservation
     path('company-reservation',
          views.CompanyReservationList.as_view(), name='reservation'),
+    # Bulk import of company reservation
+    path('company/<int:company_id>/reservation/import',
+         views.ReservationImport.as_view(), name='reservation-import'),
+    # Company reservation & payment export
+    path('company/<int:company_id>/reservation/export',
+         views.ReservationExport.as_view(), name='reservation-export'),
     # Venue booking payment
     path('reservation/<int:reservation_id>/payment',
          views.PaymentHistory.as_view(), name='payment')
@@ -1,19 +1,23 @@
 """ parking app view configuration
 """
 from django.db.models import Q
-from django.shortcuts import render
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
 from django.utils.translation import gettext as _
 
 
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from drf_yasg.utils import swagger_auto_schema
 
 from drf_yasg import openapi
 
-from parkinglot import mixins
-from . import serializers, models, filters
+from parkinglot import mixins, pagination
+from . import (
+    serializers, models, filters, importer, exporter, price_cache,
+    response_cache, summaries)
 
 
 # Create your views here.
@@ -60,7 +64,8 @@ class Detail(generics.GenericAPIView):
         """ API endpoint fetch user detail.
         """
         serializer = self.serializer_class(
-            request.user, context=self.get_serializer_context())
+            summaries.user_queryset().get(pk=request.user.pk),
+            context=self.get_serializer_context())
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
@@ -111,8 +116,6 @@ class Company(
     """
     serializer_class = serializers.CompanySerializer
     model_class = serializer_class.Meta.model
-    select_related = ()
-    prefetch_related = ()
     lookup_fields = ()
     lookup_url_kwargs = ()
     search_fields = ('name',)
@@ -162,8 +165,6 @@ class CompanyDetail(
     model_class = serializer_class.Meta.model
     lookup_fields = ('id',)
     lookup_url_kwargs = ('company_id',)
-    select_related = ()
-    prefetch_related = ()
 
     def custom_query_class(self):
         queryset = self.get_queryset()
@@ -223,8 +224,6 @@ class LotPrice(
     model_class = serializer_class.Meta.model
     lookup_fields = ('company_id',)
     lookup_url_kwargs = ('company_id',)
-    select_related = ()
-    prefetch_related = ()
     search_fields = ('name', 'company__name')
 
     @swagger_auto_schema(
@@ -248,6 +247,18 @@ class LotPrice(
         """ API endpoint to create new venue price"""
         return self.create(request, *args, **kwargs)
 
+    def list(self, request, *args, **kwargs):
+        """ Company prices read through per process price cache, unless
+        searched or ordered
+        """
+        if any(request.query_params.get(param) for param in (
+                api_settings.SEARCH_PARAM, api_settings.ORDERING_PARAM)):
+            return super(LotPrice, self).list(request, *args, **kwargs)
+        prices = price_cache.lot_prices.company_prices(
+            self.kwargs['company_id'])
+        return self.conditional_response(
+            request, prices, lambda: self.render_list(prices))
+
     def perform_create(self, serializer):
         serializer.save(company_id=self.kwargs.get('company_id'))
 
@@ -261,8 +272,6 @@ class LotPriceDetail(
     model_class = serializer_class.Meta.model
     lookup_fields = ('company_id', 'id')
     lookup_url_kwargs = ('company_id', 'lot_price_id')
-    select_related = ()
-    prefetch_related = ()
 
     @swagger_auto_schema(
         operation_id="Venue price detail",
@@ -324,6 +333,7 @@ class LotPriceDetail(
 
 
 class VenueTree(
+        mixins.ResponseCacheMixin,
         mixins.MultipleFieldLookupMixin,
         generics.ListCreateAPIView):
     """ API endpoint to get tree view for company
@@ -337,6 +347,11 @@ class VenueTree(
     lookup_fields = ('company_id',)
     lookup_url_kwargs = ('company_id',)
     search_fields = ('name', 'company__name', 'parent__name')
+    pagination_class = pagination.KeysetPagination
+    keyset_ordering = ('tree_id', 'lft')
+
+    def get_cache_scopes(self):
+        return [response_cache.company_scope(self.kwargs.get('company_id'))]
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -371,7 +386,37 @@ class VenueTree(
         serializer.save(company_id=self.kwargs.get('company_id'))
 
 
-class Venue(mixins.MultipleFieldLookupMixin, generics.ListCreateAPIView):
+class VenueBuild(generics.CreateAPIView):
+    """ API endpoint to create whole building of company at once"""
+    serializer_class = serializers.VenueBuildSerializer
+    model_class = models.Venue
+
+    @swagger_auto_schema(
+        operation_id="Create company building",
+        tags=['venue'],
+        request_body=serializers.VenueBuildSerializer,
+        responses={
+            201: serializers.VenueTreeSerializer
+        })
+    def post(self, request, *args, **kwargs):
+        """ API endpoint to create building with floors, lots and prices
+
+        Floors and lots given as nested children, lots can be generated
+        by count with name pattern
+        """
+        return self.create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        company = get_object_or_404(
+            models.Company, id=self.kwargs.get('company_id'),
+            user=self.request.user)
+        serializer.save(company=company)
+
+
+class Venue(
+        mixins.ResponseCacheMixin,
+        mixins.MultipleFieldLookupMixin,
+        generics.ListCreateAPIView):
     """ API endpoint to get or create Venue"""
     serializer_class = serializers.VenueTreeSerializer
     model_class = serializer_class.Meta.model
@@ -381,6 +426,14 @@ class Venue(mixins.MultipleFieldLookupMixin, generics.ListCreateAPIView):
     lookup_url_kwargs = ('venue_id',)
     search_fields = ('name', 'parent__name', 'company__name')
     filter_class = filters.VenueFilter
+    pagination_class = pagination.KeysetPagination
+    keyset_ordering = ('tree_id', 'lft')
+
+    def get_cache_scopes(self):
+        tree_id = response_cache.tree_of(self.kwargs.get('venue_id'))
+        if tree_id is None:
+            return None
+        return [response_cache.tree_scope(tree_id)]
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -426,8 +479,7 @@ class VenueDetail(
     """
     serializer_class = serializers.VenueSerializer
     model_class = serializer_class.Meta.model
-    select_related = ()
-    prefetch_related = ()
+    conditional_related = ('company__updated_at',)
     lookup_fields = ('id',)
     lookup_url_kwargs = ('venue_id',)
 
@@ -484,12 +536,13 @@ class VenueList(
         generics.ListAPIView):
     serializer_class = serializers.VenueSerializer
     model_class = serializer_class.Meta.model
-    select_related = ()
-    prefetch_related = ()
+    conditional_related = ('company__updated_at',)
     lookup_fields = ()
     lookup_url_kwargs = ()
     filter_class = filters.VenueFilter
     search_fields = ('name', 'company__name', 'parent__name')
+    pagination_class = pagination.KeysetPagination
+    keyset_ordering = ('tree_id', 'lft')
 
     def custom_query_class(self):
         """ """
@@ -522,17 +575,77 @@ class VenueList(
         return self.list(request, *args, **kwargs)
 
 
+class LotSearch(generics.GenericAPIView):
+    """ API endpoint to find free lots for reservation window
+
+    Lots ranked by amount to be paid for window and then by closeness to
+    searched venue
+    """
+    serializer_class = serializers.LotSearchSerializer
+    model_class = models.Venue
+
+    @swagger_auto_schema(
+        operation_id="Search free lot",
+        tags=['venue'],
+        query_serializer=serializers.LotSearchSerializer,
+        responses={
+            200: serializers.LotSearchResultSerializer(many=True)
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        """ API endpoint to find free lots for reservation window
+        """
+        search = self.serializer_class(data=request.query_params)
+        search.is_valid(raise_exception=True)
+        results = search.find_lots(user=request.user)
+        page = self.paginate_queryset(results)
+        if page is not None:
+            serializer = serializers.LotSearchResultSerializer(
+                page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = serializers.LotSearchResultSerializer(
+            results, many=True)
+        return Response(serializer.data)
+
+
+class LotQuote(generics.GenericAPIView):
+    """ API endpoint to price many lot reservation windows at once
+
+    Amounts computed by same pricing engine reservation charged with
+    """
+    serializer_class = serializers.QuoteRequestSerializer
+    model_class = models.Venue
+
+    @swagger_auto_schema(
+        operation_id="Quote lot price",
+        tags=['venue'],
+        request_body=serializers.QuoteRequestSerializer,
+        responses={
+            200: serializers.QuoteSerializer(many=True)
+        }
+    )
+    def post(self, request, *args, **kwargs):
+        """ API endpoint to get amount to be paid for lot windows
+        """
+        quote = self.serializer_class(data=request.data)
+        quote.is_valid(raise_exception=True)
+        serializer = serializers.QuoteSerializer(
+            quote.quote(user=request.user), many=True)
+        return Response(serializer.data)
+
+
 class ReservationList(
         mixins.MultipleFieldLookupMixin,
         generics.ListCreateAPIView):
     serializer_class = serializers.ReservationSerializer
     model_class = serializer_class.Meta.model
-    select_related = ()
-    prefetch_related = ()
+    conditional_related = ('venue__updated_at',)
     lookup_fields = ()
     lookup_url_kwargs = ()
     filter_class = filters.ReservationFilter
     search_fields = ('venue__name',)
+    pagination_class = pagination.KeysetPagination
+    keyset_ordering = ('book_from', 'id')
 
     def custom_query_class(self):
         queryset = self.get_queryset()
@@ -577,14 +690,112 @@ class CompanyReservationList(ReservationList):
         )
 
 
+class ReservationImport(generics.GenericAPIView):
+    """ API endpoint to import existing company reservations
+
+    Request body streamed as NDJSON (one reservation object per line) or
+    CSV with header row, selected by `Content-Type`
+    """
+    serializer_class = serializers.ReservationImportSerializer
+    model_class = models.Reservation
+
+    @swagger_auto_schema(
+        operation_id="Import company reservation",
+        tags=['reservation'],
+        request_body=serializers.ReservationImportSerializer(many=True),
+        responses={
+            200: 'Count of created reservation and error of every'
+                 ' rejected row'
+        }
+    )
+    def post(self, request, *args, **kwargs):
+        """ API endpoint to import company reservations
+        """
+        company = get_object_or_404(
+            models.Company, id=self.kwargs.get('company_id'),
+            user=request.user)
+        if 'csv' in request.content_type:
+            format = importer.CSV
+        else:
+            format = importer.NDJSON
+        rows = importer.read_rows(
+            iter(request.stream.readline, b''), format=format)
+        report = importer.ReservationImporter(company).run(rows)
+        return Response(report)
+
+
+class ReservationExport(generics.GenericAPIView):
+    """ API endpoint to export company reservations or payments
+
+    Rows streamed in CSV, Arrow or Parquet without pagination
+    """
+    serializer_class = serializers.ExportSerializer
+    model_class = models.Reservation
+
+    @swagger_auto_schema(
+        operation_id="Export company reservation",
+        tags=['reservation'],
+        query_serializer=serializers.ExportSerializer,
+        responses={
+            200: 'Rows of requested dataset in requested format'
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        """ API endpoint to export company reservations or payments
+        """
+        company = get_object_or_404(
+            models.Company, id=self.kwargs.get('company_id'),
+            user=request.user)
+        params = self.serializer_class(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        export = exporter.Exporter(data['dataset'], format=data['output'])
+        response = StreamingHttpResponse(
+            export.export(company, data['start'], data['end']),
+            content_type=export.content_type)
+        response['Content-Disposition'] = (
+            'attachment; filename="%s-%s.%s"' % (
+                data['dataset'], company.id, export.format))
+        return response
+
+
+class CompanyReport(generics.GenericAPIView):
+    """ API endpoint to get revenue & occupancy of company venues
+
+    Reservations totalled per venue subtree and day, week or month of
+    reservation start
+    """
+    serializer_class = serializers.ReportSerializer
+    model_class = models.ReservationRollup
+
+    @swagger_auto_schema(
+        operation_id="Company revenue report",
+        tags=['company'],
+        query_serializer=serializers.ReportSerializer,
+        responses={
+            200: serializers.ReportRowSerializer(many=True)
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        """ API endpoint to get revenue & occupancy of company venues
+        """
+        company = get_object_or_404(
+            models.Company, id=self.kwargs.get('company_id'),
+            user=request.user)
+        params = self.serializer_class(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        serializer = serializers.ReportRowSerializer(
+            params.build_report(company), many=True)
+        return Response(serializer.data)
+
+
 class ReservationDetail(
         mixins.MultipleFieldLookupMixin,
         generics.RetrieveUpdateAPIView):
     """ API endpoint to get or update reservation detail"""
     serializer_class = serializers.ReservationSerializer
     model_class = serializer_class.Meta.model
-    select_related = ()
-    prefetch_related = ()
+    conditional_related = ('venue__updated_at',)
     lookup_fields = ('id', )
     lookup_url_kwargs = ('reservation_id',)
     filter_class = filters.ReservationFilter
@@ -630,8 +841,6 @@ class PaymentHistory(
 ):
     serializer_class = serializers.PaymentHistorySerializer
     model_class = serializer_class.Meta.model
-    select_related = ('reservation',)
-    prefetch_related = ()
     lookup_fields = ('reservation_id',)
     lookup_url_kwargs = ('reservation_id',)
 
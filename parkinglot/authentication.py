@@ -0,0 +1,170 @@
+""" Token authentication with per process cache
+
+Every authenticated request otherwise join token with its user. Snapshot
+of both rows kept in process memory by token key for
+`AUTH_TOKEN_CACHE_TIMEOUT` seconds, at most `AUTH_TOKEN_CACHE_SIZE`
+tokens, and request get fresh instances built from snapshot.
+
+Snapshot stored along with version of its user scope kept in shared
+response cache (see `mixins.get_cache_versions`). Deleting token or
+saving user (e.g. deactivation) bump that version, so every process
+drop snapshot on next request. Version read once rows fetched, so
+snapshot racing with concurrent deactivation or shared cache eviction
+live at most till timeout.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .mixins import bump_cache_versions, get_cache_versions
+
+
+def user_scope(user_id):
+    return 'auth-user:%s' % (user_id)
+
+
+def snapshot(instance):
+    """ Column values of model instance"""
+    fields = instance._meta.concrete_fields
+    return (
+        [field.attname for field in fields],
+        [getattr(instance, field.attname) for field in fields])
+
+
+def restore(model, values, db='default'):
+    names, values = values
+    return model.from_db(db, names, values)
+
+
+class TokenCache(object):
+    """ Bounded LRU of token snapshots expiring after timeout
+
+    Parameters
+    ----------
+    size : int
+        Max no. of tokens kept, `AUTH_TOKEN_CACHE_SIZE` setting by default
+    timeout : int
+        Seconds snapshot kept, `AUTH_TOKEN_CACHE_TIMEOUT` setting by
+        default
+    """
+
+    def __init__(self, size=None, timeout=None):
+        self._size = size
+        self._timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self):
+        if self._size is None:
+            return getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000)
+        return self._size
+
+    @property
+    def timeout(self):
+        if self._timeout is None:
+            return getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60)
+        return self._timeout
+
+    def get(self, key):
+        """ (user id, version, token, user) snapshot of live entry"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def forget_user(self, user_id):
+        with self.lock:
+            for key in [
+                    key for key, (expires, value) in self.entries.items()
+                    if value[0] == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """ Hit & miss counters of process"""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'tokens': len(self.entries),
+            }
+
+
+tokens = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ `TokenAuthentication` reading token & user from `tokens` cache"""
+    cache = tokens
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        user_model = model._meta.get_field('user').related_model
+        cached = self.cache.get(key)
+        if cached is not None:
+            user_id, version, token_values, user_values = cached
+            if get_cache_versions([user_scope(user_id)])[0] == version:
+                token = restore(model, token_values)
+                token.user = restore(user_model, user_values)
+                return (token.user, token)
+            self.cache.delete(key)
+
+        try:
+            token = model.objects.select_related('user').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        version = get_cache_versions([user_scope(token.user_id)])[0]
+        self.cache.set(key, (
+            token.user_id, version, snapshot(token), snapshot(token.user)))
+        return (token.user, token)
+
+
+def forget_user(user_id):
+    tokens.forget_user(user_id)
+    bump_cache_versions([user_scope(user_id)])
+
+
+def token_deleted(sender, instance, **kwargs):
+    """ Expire snapshot of deleted token in every process"""
+    tokens.delete(instance.key)
+    forget_user(instance.user_id)
+
+
+def user_changed(sender, instance, **kwargs):
+    """ Expire snapshots of saved or deleted user, deactivated user
+    rejected on next request
+    """
+    forget_user(instance.pk)
@@ -1,5 +1,13 @@
 from rest_framework import serializers
 from datetime import datetime
+from django.utils import timezone
+
+
+def to_timestamp(value):
+    """ Convert naive or aware datetime to UTC timestamp"""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.timestamp()
 
 
 class TimestampField(serializers.DateTimeField):
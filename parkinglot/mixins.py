@@ -1,14 +1,42 @@
+import hashlib
+import json
 import logging
+import time
 from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import Permission
 
+from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import queryplan
 
 logs = logging.getLogger(__name__)
 
+
+def get_lookup_value(instance, lookup):
+    """ Value of `__` separated forward lookup, `None` past empty
+    relation
+    """
+    for name in lookup.split('__'):
+        if instance is None:
+            return None
+        instance = getattr(instance, name)
+    return instance
+
+
+def latest(values):
+    """ Latest of given modification times, `None` if none set"""
+    return max((value for value in values if value is not None), default=None)
+
+
 class MultipleFieldLookupMixin(object):
     """
     View mixins to perform filter operation on model for
@@ -22,21 +50,48 @@ class MultipleFieldLookupMixin(object):
       note :: Both lookup_fields, lookup_url_kwargs related to each other
         (i.e. In filter `lookup_fields` act as Key & `lookup_url_kwargs` act
         as Value)
+    select_related, prefetch_related : Tuple
+        Optional lookups added on top of query plan of response
+        serializer (see `parkinglot.queryplan`)
+    conditional_field : str
+        Model modification time field, `ETag` & `Last-Modified` of list and
+        retrieve response computed from its maximum and row count before
+        serializing, so conditional request answered with 304 without
+        building body. `None` to disable
+    conditional_related : Tuple
+        Modification time lookups of forward related rows rendered in
+        response (e.g. `venue__updated_at`), their latest value taken
+        into validators as well
     """
+    conditional_field = 'updated_at'
+    conditional_related = ()
+    select_related = ()
+    prefetch_related = ()
+
+    def get_representation_serializer_class(self):
+        """ Serializer rendering response, serializer delegating
+        representation name it by `representation_class`
+        """
+        serializer_class = self.get_serializer_class()
+        return getattr(
+            serializer_class, 'representation_class', serializer_class)
 
     def get_queryset(self, *args, **kwargs):
         """ Generate basic queryset based on URL view
-            `select_related`, `prefetch_related` parameter pass from
-            APIView
+            Related rows & columns read by response serializer loaded by
+            its query plan, unused columns deferred on read only requests
         """
-        queryset = self.model_class.objects
-        try:
-            if self.select_related:
-                queryset = queryset.select_related(*self.select_related)
-            if self.prefetch_related:
-                queryset = queryset.prefetch_related(*self.prefetch_related)
-        except Exception as e:
-            logs.info(e)
+        queryset = self.model_class.objects.all()
+        plan = queryplan.get_query_plan(
+            self.get_representation_serializer_class())
+        if plan is not None and issubclass(self.model_class, plan.model):
+            request = getattr(self, 'request', None)
+            queryset = plan.apply(queryset, defer=request is not None and (
+                request.method in ('GET', 'HEAD')))
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
         return queryset
 
     def get_object(self):
@@ -71,15 +126,106 @@ class MultipleFieldLookupMixin(object):
             ]
         return queryset.filter(**filter)
 
-    def list(self, *args, **kwargs):
-        """ Return list objects based on queryset
+    def get_list_queryset(self):
+        """ Queryset of list, lookup & filter parameters applied
         """
         try:
             queryset = self.filter_queryset(self.custom_query_class())
         except Exception as e:
             logs.info(e)
             queryset = self.filter_queryset(self.get_queryset())
-        queryset = self.custom_lookup_filter(queryset)
+        return self.custom_lookup_filter(queryset)
+
+    def get_validators(self, request, queryset):
+        """ Return (`ETag`, last modification timestamp) of queryset with
+        single aggregate query, or of list of rows without query, `None`
+        if model do not track modification time or queryset is empty
+        """
+        field = self.conditional_field
+        if not field:
+            return None
+        try:
+            self.model_class._meta.get_field(field)
+        except FieldDoesNotExist:
+            return None
+        fields = (field,) + tuple(self.conditional_related)
+        if isinstance(queryset, (list, tuple)):
+            # Rows already in memory, e.g. read from cache
+            rows = [
+                (row.pk,) + tuple(
+                    get_lookup_value(row, lookup) for lookup in fields)
+                for row in queryset]
+            modified = latest(value for row in rows for value in row[1:])
+            rows = ','.join(str(row[0]) for row in rows)
+        elif queryset.query.can_filter():
+            result = queryset.order_by().values(field).aggregate(
+                count=Count('pk'), **dict(
+                    ('modified_%s' % (index), Max(lookup))
+                    for index, lookup in enumerate(fields)))
+            rows = result.pop('count')
+            modified = latest(result.values())
+        else:
+            # Sliced window (see `get_validator_queryset`) slide over next
+            # row when one is deleted, its ordered keys tell change apart
+            rows = list(queryset.values_list('pk', *fields))
+            modified = latest(value for row in rows for value in row[1:])
+            rows = ','.join(str(row[0]) for row in rows)
+        if modified is None:
+            return None
+        last_modified = int(modified.timestamp())
+        etag = hashlib.md5(('%s:%s:%s:%s' % (
+            request.get_full_path(), request.user.pk,
+            modified.isoformat(), rows)
+        ).encode('utf-8')).hexdigest()
+        return '"%s"' % (etag), last_modified
+
+    def conditional_response(self, request, queryset, render):
+        """ Answer conditional request from queryset validators, call
+        `render` for full response only when client copy is stale
+        """
+        validators = self.get_validators(request, queryset)
+        if validators is None:
+            return render()
+        etag, last_modified = validators
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+        if response.status_code in (
+                status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """ Return single object, 304 if client copy not modified
+        """
+        return self.conditional_response(
+            request, self.get_list_queryset(),
+            lambda: super(MultipleFieldLookupMixin, self).retrieve(
+                request, *args, **kwargs))
+
+    def list(self, request, *args, **kwargs):
+        """ Return list objects based on queryset
+        """
+        queryset = self.get_list_queryset()
+        return self.conditional_response(
+            request, self.get_validator_queryset(queryset),
+            lambda: self.render_list(queryset))
+
+    def get_validator_queryset(self, queryset):
+        """ Rows list response built from, keyset paginated page depend
+        only on its own window unless total count asked for. Window
+        validated by its ordered keys along with latest modification
+        """
+        paginator = self.paginator
+        window = getattr(paginator, 'window_queryset', None)
+        if window is None or self.request.query_params.get(
+                paginator.count_query_param):
+            return queryset
+        return window(queryset, self.request, self)
+
+    def render_list(self, queryset):
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -88,6 +234,96 @@ class MultipleFieldLookupMixin(object):
         return Response(serializer.data)
 
 
+def get_response_cache():
+    """ Cache holding rendered responses and their scope versions"""
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def get_cache_versions(scopes):
+    """ Current version of every scope, unknown scopes started at current
+    time in milliseconds so version never go back after cache eviction
+    """
+    cache = get_response_cache()
+    keys = ['version:%s' % (scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = dict(
+        (key, int(time.time() * 1000)) for key in keys
+        if key not in versions)
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_cache_versions(scopes):
+    """ Expire every response cached under given scopes"""
+    cache = get_response_cache()
+    for scope in set(scopes):
+        key = 'version:%s' % (scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+
+
+class ResponseCacheMixin(object):
+    """
+    View mixins to cache list response per request path under versioned
+    scopes
+    Response reused till any of its scope version bumped (see
+    `bump_cache_versions`) or `RESPONSE_CACHE_TIMEOUT` passed. Response
+    carry `ETag` and matching `If-None-Match` answered with 304.
+    Parameters
+    ----------
+    get_cache_scopes : method
+        Return list of scope names response depend on, `None` to skip
+        cache
+    """
+    # Response ETag computed from cached content instead
+    conditional_field = None
+
+    def get_cache_scopes(self):
+        return None
+
+    def get_cache_key(self, request):
+        scopes = self.get_cache_scopes()
+        if scopes is None:
+            return None
+        versions = get_cache_versions(scopes)
+        path = hashlib.md5(
+            request.get_full_path().encode('utf-8')).hexdigest()
+        return 'response:%s:%s:%s' % (
+            self.__class__.__name__,
+            '.'.join(str(version) for version in versions), path)
+
+    def list(self, request, *args, **kwargs):
+        """ Return cached list response, render & cache on miss
+        """
+        key = self.get_cache_key(request)
+        if key is None:
+            return super(ResponseCacheMixin, self).list(
+                request, *args, **kwargs)
+        cache = get_response_cache()
+        cached = cache.get(key)
+        if cached is None:
+            response = super(ResponseCacheMixin, self).list(
+                request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = json.loads(json.dumps(response.data, cls=JSONEncoder))
+            etag = '"%s"' % (hashlib.md5(json.dumps(
+                data, sort_keys=True).encode('utf-8')).hexdigest())
+            cached = (etag, data)
+            cache.set(
+                key, cached,
+                getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+        etag, data = cached
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
+
+
 class DynamicFieldsMixin(object):
     """
     View mixins to filter specific fields from model
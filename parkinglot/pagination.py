@@ -0,0 +1,201 @@
+""" Keyset pagination
+
+Page continue from values of unique ordering columns of last row seen
+(`WHERE (a, b) > (x, y) ORDER BY a, b LIMIT n`) instead of skipping
+`OFFSET n` rows, so every page cost the same whatever its depth.
+Position carried in opaque cursor. Total count not computed unless
+asked for with `?count=exact` or `?count=estimate`.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.translation import gettext as _
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+EXACT = 'exact'
+ESTIMATE = 'estimate'
+
+
+def estimate_count(queryset):
+    """ Row count estimated by query planner, exact count where database
+    do not provide estimate
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over unique ordering of view
+    Parameters
+    ----------
+    ordering : tuple
+        Default ordering, view `keyset_ordering` take precedence. Columns
+        together must be unique, prefix column name with `-` for
+        descending order
+    """
+    ordering = ('pk',)
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, position, reverse):
+        # Full precision ISO format, JSON encoder of Django drop
+        # microseconds
+        position = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in position]
+        data = json.dumps({'p': position, 'r': reverse})
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, model, ordering):
+        """ Return (position, reverse) of request cursor, (None, False)
+        for first page
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(
+                cursor.encode('ascii')).decode('utf-8'))
+            values = data['p']
+            if len(values) != len(ordering):
+                raise ValueError
+            position = [
+                self.get_field(model, name).to_python(value)
+                for name, value in zip(ordering, values)]
+            return position, bool(data['r'])
+        except (TypeError, ValueError, KeyError, ValidationError,
+                UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_field(self, model, name):
+        name = name.lstrip('-')
+        if name == 'pk':
+            return model._meta.pk
+        return model._meta.get_field(name)
+
+    def keyset_filter(self, ordering, position, reverse):
+        """ Q object matching rows after `position` in `ordering`, before
+        it when `reverse`
+        """
+        condition = None
+        for name, value in reversed(list(zip(ordering, position))):
+            descending = name.startswith('-') != reverse
+            name = name.lstrip('-')
+            after = Q(**{
+                '%s__%s' % (name, 'lt' if descending else 'gt'): value})
+            if condition is not None:
+                # Equal on this column, later column decide
+                after |= Q(**{name: value}) & condition
+            condition = after
+        return condition
+
+    def order_queryset(self, queryset, ordering, reverse):
+        if reverse:
+            ordering = [
+                name[1:] if name.startswith('-') else '-' + name
+                for name in ordering]
+        return queryset.order_by(*ordering)
+
+    def window_queryset(self, queryset, request, view=None):
+        """ Rows page will be built from, one extra row to know whether
+        another page follow
+        """
+        ordering = self.get_ordering(view)
+        position, reverse = self.decode_cursor(
+            request, queryset.model, ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self.keyset_filter(ordering, position, reverse))
+        return self.order_queryset(queryset, ordering, reverse)[
+            :self.get_page_size(request) + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(
+            request, queryset.model, self.keyset)
+
+        self.count = None
+        count = request.query_params.get(self.count_query_param)
+        if count == EXACT:
+            self.count = queryset.count()
+        elif count == ESTIMATE:
+            self.count = estimate_count(queryset)
+
+        rows = list(self.window_queryset(queryset, request, view))
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.first = self.get_position(rows[0]) if rows else None
+        self.last = self.get_position(rows[-1]) if rows else None
+        if not rows and position is not None:
+            # Page emptied by deletes, keep both directions reachable
+            self.first = self.last = position
+        return rows
+
+    def get_position(self, instance):
+        return [
+            getattr(instance, name.lstrip('-')) for name in self.keyset]
+
+    def get_link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        if position is None:
+            return None
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(position, reverse))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.get_link(self.last, False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.get_link(self.first, True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
@@ -0,0 +1,167 @@
+""" Query plan inferred from serializer fields
+
+Walk field tree of serializer and collect everything needed to render it
+from single queryset:
+
+* `select_related` for nested serializer & dotted source (`company.name`)
+  crossing to-one relation
+* `Prefetch` for `many=True` nested serializer & related field, with its
+  own plan applied to prefetched queryset
+* `only()` columns, every column of model kept when any field read an
+  attribute which is not a model field (method, property)
+
+Plan depend only on serializer class, so it's built once per class.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import relations, serializers
+
+_plans = {}
+
+
+def get_field(model, name):
+    """ Model field by name, `None` for any other attribute"""
+    if name == 'pk':
+        return model._meta.pk
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def is_to_one(field):
+    return field is not None and field.is_relation and (
+        field.many_to_one or field.one_to_one)
+
+
+def required_columns(model):
+    """ Columns model need whenever instance created"""
+    names = {model._meta.pk.name}
+    mptt_meta = getattr(model, '_mptt_meta', None)
+    if mptt_meta is not None:
+        # MPTT read tree fields on every instance init
+        names.update((
+            mptt_meta.parent_attr, mptt_meta.tree_id_attr,
+            mptt_meta.left_attr, mptt_meta.right_attr,
+            mptt_meta.level_attr))
+        names.update(mptt_meta.order_insertion_by)
+    return names
+
+
+class QueryPlan(object):
+    """ Related rows & columns serializer read from `model` instances
+
+    Parameters
+    ----------
+    model : Model
+        Model of rendered instances
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.select_related = []
+        self.prefetch_related = []
+        # `None` once every column of model needed
+        self.only = set(required_columns(model))
+
+    def add_columns(self, model, prefix, names=None):
+        """ Keep columns of `model` reached through `prefix`, every column
+        if `names` not given
+        """
+        if self.only is None:
+            return
+        if names is None:
+            if not prefix:
+                self.only = None
+                return
+            names = [field.name for field in model._meta.concrete_fields]
+        names = set(names) | required_columns(model)
+        self.only.update(prefix + name for name in names)
+
+    def walk(self, serializer, model, prefix=''):
+        """ Add fields of `serializer` rendering `model` reached through
+        `prefix`
+        """
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if field.source == '*':
+                if isinstance(field, serializers.Serializer):
+                    self.walk(field, model, prefix)
+                else:
+                    # Method field may read anything
+                    self.add_columns(model, prefix)
+                continue
+            attrs = field.source.split('.')
+            current, path = model, prefix
+            for attr in attrs[:-1]:
+                relation = get_field(current, attr)
+                if not is_to_one(relation):
+                    self.add_columns(current, path)
+                    break
+                self.add_columns(current, path, [attr])
+                self.select_related.append(path + attr)
+                current, path = relation.related_model, path + attr + '__'
+            else:
+                self.add_field(field, current, path, attrs[-1])
+
+    def add_field(self, field, model, path, attr):
+        """ Add single serializer field reading `attr` of `model`"""
+        model_field = get_field(model, attr)
+        if model_field is None:
+            self.add_columns(model, path)
+            return
+        many = isinstance(field, (
+            serializers.ListSerializer, relations.ManyRelatedField))
+        nested = field.child if isinstance(
+            field, serializers.ListSerializer) else field
+        if many and model_field.is_relation:
+            related_model = model_field.related_model
+            plan = QueryPlan(related_model)
+            if isinstance(nested, serializers.BaseSerializer):
+                plan.walk(nested, related_model)
+            if model_field.one_to_many:
+                # Prefetch join rows back to parent by foreign key
+                plan.add_columns(related_model, '', [model_field.field.name])
+            self.prefetch_related.append(Prefetch(
+                path + attr,
+                queryset=plan.apply(related_model._default_manager.all())))
+        elif isinstance(nested, serializers.BaseSerializer):
+            if not is_to_one(model_field):
+                self.add_columns(model, path)
+                return
+            self.add_columns(model, path, [attr])
+            self.select_related.append(path + attr)
+            self.walk(
+                nested, model_field.related_model, path + attr + '__')
+        elif model_field.concrete:
+            self.add_columns(model, path, [attr])
+        else:
+            self.add_columns(model, path)
+
+    def apply(self, queryset, defer=True):
+        """ Return queryset loading everything serializer read, `defer`
+        unused columns as well
+        """
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if defer and self.only is not None:
+            queryset = queryset.only(*sorted(self.only))
+        return queryset
+
+
+def get_query_plan(serializer_class):
+    """ Cached `QueryPlan` of model serializer class, `None` if serializer
+    do not render model instances from its fields
+    """
+    if serializer_class not in _plans:
+        model = getattr(getattr(serializer_class, 'Meta', None), 'model', None)
+        plan = None
+        if model is not None and getattr(
+                serializer_class, 'plan_queries', True):
+            plan = QueryPlan(model)
+            plan.walk(serializer_class(), model)
+        _plans[serializer_class] = plan
+    return _plans[serializer_class]
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import djcelery
 import os
+from datetime import timedelta
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -120,6 +121,18 @@ CELERY_TIMEZONE = 'Europe/Amsterdam'
 # CELERY_ALWAYS_EAGER = True
 CELERYBEAT_SCHEDULER = 'djcelery.schedulers.DatabaseScheduler'
 
+# Reservation status change at their start & end time through delayed
+# tasks. Boundaries within horizon (seconds) are queued, periodic task
+# below queue next horizon and `check_reservation_status` remain as
+# polling fallback
+PARKING_TRANSITION_HORIZON = 3600
+CELERYBEAT_SCHEDULE = {
+    'schedule-reservation-transitions': {
+        'task': 'parking.tasks.schedule_reservation_transitions',
+        'schedule': timedelta(seconds=PARKING_TRANSITION_HORIZON),
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -162,9 +175,7 @@ STATIC_ROOT = 'static'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.TokenAuthentication'
+        'parkinglot.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -182,6 +193,46 @@ REST_FRAMEWORK = {
     'DATETIME_INPUT_FORMATS': '%s'
 }
 
+# Rendered responses of public venue endpoints, see
+# `parkinglot.mixins.ResponseCacheMixin`. Cache shared by every process so
+# scope versions bumped by one process expire responses of all
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 300
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    RESPONSE_CACHE_ALIAS: {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://localhost:6379/2',
+    }
+}
+
+# Keep hourly occupancy bitmap of every lot for rolling horizon to answer
+# availability search, see `parking.slots`
+PARKING_SLOT_STORE = False
+PARKING_SLOT_SECONDS = 3600
+PARKING_SLOT_HORIZON = 90 * 24
+
+# Max no. of lots kept in per process reservation interval index, see
+# `parking.availability`
+PARKING_AVAILABILITY_SIZE = 10000
+
+# Max no. of prices kept in memory by every process, see
+# `parking.price_cache`
+LOT_PRICE_CACHE_SIZE = 1000
+LOT_PRICE_CACHE_LOG_EVERY = 1000
+
+# Token & user snapshots kept in memory by every process, see
+# `parkinglot.authentication`
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+
+# Password hashing worker pool of login, see `parking.login`
+LOGIN_HASH_WORKERS = 2
+LOGIN_HASH_QUEUE = 8
+LOGIN_HASH_TIMEOUT = 10
+
 # Django extensions provide graph model funcationlity which help to
 # generate graphical image of database relationship
 GRAPH_MODELS = {
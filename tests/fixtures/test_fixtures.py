@@ -1,14 +1,50 @@
 import pytest
 import factory
+from contextlib import contextmanager
 from pytest_factoryboy import register
 
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework.authtoken.models import Token
 
+from parking import availability
+from parkinglot.mixins import get_response_cache
 from parking.models import Company, Venue, LotPrice
 
+
+@pytest.fixture(autouse=True)
+def clear_availability_index():
+    """ Database rolled back after each test, so is availability index"""
+    availability.index.clear()
+    yield
+    availability.index.clear()
+
+
+@pytest.fixture
+def assert_max_queries():
+    """ Context manager failing test when block run more queries than
+    given no.
+    """
+    @contextmanager
+    def check(count):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        assert len(context) <= count, '\n'.join(
+            query['sql'] for query in context.captured_queries)
+    return check
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """ Cached responses refer rolled back rows as well"""
+    get_response_cache().clear()
+    yield
+    get_response_cache().clear()
+
+
 @register
 class UserFactory(factory.DjangoModelFactory):
 
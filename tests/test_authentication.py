@@ -0,0 +1,75 @@
+import io
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from parkinglot import authentication
+from rest_framework.authtoken.models import Token
+
+
+@pytest.mark.django_db
+class TestCachedTokenAuthentication(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_token):
+        self.client = client
+        self.token = user_token
+        self.user = user_token.user
+        authentication.tokens.clear()
+
+    def get(self):
+        return self.client.get(
+            reverse('company', kwargs={'version': 1}),
+            HTTP_AUTHORIZATION='Token %s' % (self.token.key))
+
+    def test_token_cached(self):
+        """ Second request authenticated without token query"""
+        with CaptureQueriesContext(connection) as miss:
+            assert self.get().status_code == 200
+        with CaptureQueriesContext(connection) as cached:
+            assert self.get().status_code == 200
+        assert len(cached) == len(miss) - 1
+        assert authentication.tokens.stats()['hits'] >= 1
+        assert not any(
+            'authtoken_token' in query['sql'] for query in cached)
+
+    def test_deleted_token(self):
+        """ """
+        assert self.get().status_code == 200
+        Token.objects.filter(key=self.token.key).delete()
+        assert self.get().status_code == 401
+
+    def test_deactivated_user(self):
+        """ Snapshot of other process dropped as well"""
+        other_process = authentication.TokenCache()
+        auth = authentication.CachedTokenAuthentication()
+        auth.cache = other_process
+        assert auth.authenticate_credentials(self.token.key)[0] == self.user
+        self.user.is_active = False
+        self.user.save()
+        assert len(other_process.entries) == 1
+        with pytest.raises(authentication.exceptions.AuthenticationFailed):
+            auth.authenticate_credentials(self.token.key)
+        assert self.get().status_code == 401
+
+    def test_bounded_and_expired(self):
+        """ """
+        cache = authentication.TokenCache(size=2, timeout=60)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, (1, 1, None, None))
+        assert list(cache.entries) == ['b', 'c']
+        expired = authentication.TokenCache(timeout=0)
+        expired.set('a', (1, 1, None, None))
+        assert expired.get('a') is None
+        assert expired.stats()['misses'] == 1
+
+    def test_benchmark_command(self):
+        """ """
+        output = io.StringIO()
+        call_command('benchmark_auth', '--requests', '5', stdout=output)
+        lines = output.getvalue().splitlines()
+        assert len(lines) == 2
+        assert 'cached token' in lines[1]
+        assert Token.objects.count() == 1
@@ -0,0 +1,181 @@
+import pytest
+from dateutil.relativedelta import relativedelta
+from django.utils import timezone
+
+from django.urls import reverse
+
+from parking import availability, slots
+from parking.models import Company, Reservation, Venue
+
+from .fixtures.test_fixtures import BuildingVenueFactory, LotFactory
+
+SLOT_BACKENDS = [False] + ([True] if slots.numpy is not None else [])
+
+
+def test_lot_intervals_overlap():
+    """ """
+    intervals = availability.LotIntervals([(10, 20), (0, 100), (30, 40)])
+    assert intervals.overlaps(50, 50)
+    assert intervals.overlaps(100, 200)
+    assert not intervals.overlaps(101, 200)
+    intervals = availability.LotIntervals([(10, 20), (30, 40)])
+    assert intervals.overlaps(5, 10)
+    assert intervals.overlaps(15, 35)
+    assert not intervals.overlaps(21, 29)
+    assert not intervals.overlaps(0, 9)
+    assert not availability.LotIntervals().overlaps(0, 100)
+
+
+@pytest.mark.django_db
+class TestAvailabilityIndex(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_company):
+        self.company = user_company
+        self.now = timezone.now()
+        self.lots = [
+            LotFactory(
+                company=self.company, name='Parking %s' % (x), parent=None)
+            for x in range(1, 4)
+        ]
+
+    def reserve(self, lot, hours_from, hours_to, status=Reservation.PENDING):
+        return Reservation.objects.create(
+            venue=lot,
+            book_from=self.now + relativedelta(hours=hours_from),
+            book_to=self.now + relativedelta(hours=hours_to),
+            license='MH 04 1234',
+            phone_number='+918082611337',
+            status=status)
+
+    def test_busy_lots(self):
+        """ """
+        self.reserve(self.lots[0], -1, 1)
+        self.reserve(self.lots[1], 2, 3)
+        lot_ids = [lot.id for lot in self.lots]
+        assert availability.busy_lots(lot_ids, self.now) == {
+            self.lots[0].id}
+        assert availability.free_lots(
+            lot_ids,
+            self.now + relativedelta(hours=1, minutes=30),
+            self.now + relativedelta(hours=4)
+        ) == [self.lots[0].id, self.lots[2].id]
+
+    def test_window_inside_reservation(self):
+        """ """
+        self.reserve(self.lots[0], 1, 10)
+        assert not availability.is_free(
+            self.lots[0].id,
+            self.now + relativedelta(hours=2),
+            self.now + relativedelta(hours=3))
+
+    def test_inactive_reservation_ignored(self):
+        """ """
+        self.reserve(self.lots[0], -1, 1, status=Reservation.CLOSED)
+        self.reserve(self.lots[1], -1, 1, status=Reservation.CANCELED)
+        assert not availability.busy_lots(
+            [lot.id for lot in self.lots], self.now)
+
+    def test_index_follow_reservation_change(self):
+        """ """
+        lot = self.lots[0]
+        assert availability.is_free(lot.id, self.now)
+        reservation = self.reserve(lot, -1, 1)
+        assert not availability.is_free(lot.id, self.now)
+        reservation.status = Reservation.CANCELED
+        reservation.save()
+        assert availability.is_free(lot.id, self.now)
+
+    def test_other_process_index(self):
+        """ Lot changed by other process reloaded, least recently used lot
+        dropped
+        """
+        other_process = availability.AvailabilityIndex(size=2)
+        lot_ids = [lot.id for lot in self.lots[:2]]
+        assert not other_process.busy_lots(lot_ids, self.now)
+        reservation = self.reserve(self.lots[0], -1, 1)
+        assert other_process.busy_lots(lot_ids, self.now) == {lot_ids[0]}
+        other_process.get_intervals([self.lots[2].id])
+        assert list(other_process._lots) == [lot_ids[0], self.lots[2].id]
+
+        # Lot changed while loading kept under outdated version
+        versions = availability.lot_versions(lot_ids)
+        reservation.status = Reservation.CANCELED
+        reservation.save()
+        other_process.get_intervals(lot_ids, versions)
+        assert other_process._lots[lot_ids[0]].version != (
+            availability.lot_versions(lot_ids)[lot_ids[0]])
+        assert not other_process.busy_lots(lot_ids, self.now)
+
+    def test_company_available_lot(self):
+        """ """
+        self.reserve(self.lots[0], -1, 1, status=Reservation.ACTIVE)
+        company = Company.objects.get(id=self.company.id)
+        assert company.total_lot() == 3
+        assert company.available_lot() == 2
+
+    @pytest.mark.parametrize('use_numpy', SLOT_BACKENDS)
+    def test_slot_store(self, use_numpy):
+        """ """
+        store = slots.SlotBitmapStore(horizon_slots=48, use_numpy=use_numpy)
+        self.reserve(self.lots[0], 2, 3)
+        self.reserve(self.lots[1], 5, 6, status=Reservation.CANCELED)
+        lot_ids = [lot.id for lot in self.lots]
+        assert store.busy_lots(
+            lot_ids,
+            self.now + relativedelta(hours=2, minutes=30)
+        ) == {self.lots[0].id}
+        assert store.busy_lots(
+            lot_ids,
+            self.now + relativedelta(hours=5),
+            self.now + relativedelta(hours=10)
+        ) == set()
+        # Outside horizon
+        assert store.busy_lots(
+            lot_ids, self.now + relativedelta(days=3)) is None
+
+        self.reserve(self.lots[2], 10, 12)
+        store.invalidate(self.lots[2].id)
+        assert store.busy_lots(
+            lot_ids,
+            self.now + relativedelta(hours=9),
+            self.now + relativedelta(hours=10)
+        ) == {self.lots[2].id}
+
+    def test_exclude_busy(self):
+        """ Lots filtered in SQL, no lot id sent as parameter"""
+        self.reserve(self.lots[0], -1, 1)
+        self.reserve(self.lots[1], -1, 1, status=Reservation.CANCELED)
+        self.reserve(self.lots[2], 2, 3)
+        queryset = availability.exclude_busy(
+            Venue.objects.filter(company=self.company), self.now)
+        assert '"parking_venue"."id" IN' not in str(queryset.query)
+        assert sorted(venue.id for venue in queryset) == [
+            self.lots[1].id, self.lots[2].id]
+        assert availability.exclude_busy(
+            Venue.objects.filter(company=self.company), self.now,
+            self.now + relativedelta(hours=2)
+        ).get().id == self.lots[1].id
+
+    def test_available_window_filter(self, client):
+        """ """
+        building = BuildingVenueFactory(company=self.company)
+        lots = [
+            LotFactory(parent=building, name='Parking %s' % (x))
+            for x in range(1, 4)
+        ]
+        self.reserve(lots[0], 1, 10)
+        response = client.get(
+            reverse(
+                'sub-venue-list',
+                kwargs={'version': 1, 'venue_id': building.id}),
+            {
+                'available': int(
+                    (self.now + relativedelta(hours=2)).timestamp()),
+                'available_to': int(
+                    (self.now + relativedelta(hours=3)).timestamp())
+            }
+        )
+        assert response.status_code == 200
+        assert sorted(x['id'] for x in response.json()['results']) == [
+            lots[1].id, lots[2].id]
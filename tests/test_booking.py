@@ -0,0 +1,120 @@
+import json
+import threading
+import pytest
+from dateutil.relativedelta import relativedelta
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from parking.models import LotPrice, PaymentHistory, Reservation
+
+from .fixtures.test_fixtures import LotFactory, PriceFactory
+
+# No. of clients trying to book same lot at same time
+PARALLEL_BOOKING = 8
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentReservation(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_token, user_company):
+        self.token = user_token.key
+        price = PriceFactory(
+            name='Car price', company=user_company,
+            duration=1, duration_unit=LotPrice.HOUR,
+            pre_paid_amount=10, amount=100, overdue_amount=5)
+        self.lot = LotFactory(
+            company=user_company, name='Parking 1',
+            venue_price=price, parent=None)
+
+    def reservation_data(self, minutes_from, minutes_to):
+        # Start beyond transition horizon so no task is queued
+        now = timezone.now() + relativedelta(days=2)
+        return {
+            'venue': self.lot.id,
+            'book_from': int(
+                (now + relativedelta(minutes=minutes_from)).strftime('%s')),
+            'book_to': int(
+                (now + relativedelta(minutes=minutes_to)).strftime('%s')),
+            'payments': [{
+                'amount': 10,
+                'payment_type': PaymentHistory.CASH
+            }],
+            'license': 'MH 04 1234',
+            'phone_number': '+918082611337'
+        }
+
+    def post(self, json_data):
+        return Client().post(
+            reverse('reservation', kwargs={'version': 1}),
+            data=json.dumps(json_data),
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Token %s' % (self.token)
+        )
+
+    def test_parallel_booking(self):
+        """ Only one of parallel overlapping booking should succeed"""
+        barrier = threading.Barrier(PARALLEL_BOOKING)
+        status_codes = []
+
+        def book(minutes_from):
+            try:
+                json_data = self.reservation_data(
+                    minutes_from, minutes_from + 60)
+                barrier.wait()
+                status_codes.append(self.post(json_data).status_code)
+            except Exception as e:
+                status_codes.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=book, args=(5 + x,))
+            for x in range(PARALLEL_BOOKING)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert status_codes.count(201) == 1
+        assert Reservation.objects.filter(venue=self.lot).count() == 1
+
+    def test_booking_inside_existing_reservation(self):
+        """ """
+        assert self.post(self.reservation_data(5, 180)).status_code == 201
+        response = self.post(self.reservation_data(30, 60))
+        assert response.status_code == 400
+        assert response.json()['non_field_errors']
+
+    def change(self, method, reservation_id, json_data):
+        return getattr(Client(), method)(
+            reverse('reservation-detail', kwargs={
+                'version': 1, 'reservation_id': reservation_id}),
+            data=json.dumps(json_data),
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Token %s' % (self.token)
+        )
+
+    def test_update_onto_existing_reservation(self):
+        """ Reservation can not be moved over other reservation"""
+        assert self.post(self.reservation_data(0, 60)).status_code == 201
+        response = self.post(self.reservation_data(120, 180))
+        reservation_id = response.json()['id']
+
+        response = self.change(
+            'put', reservation_id, self.reservation_data(30, 90))
+        assert response.status_code == 400
+        assert response.json()['non_field_errors']
+        moved = self.reservation_data(45, 100)
+        response = self.change('patch', reservation_id, {
+            'book_from': moved['book_from'], 'book_to': moved['book_to']})
+        assert response.status_code == 400
+
+        response = self.change(
+            'put', reservation_id, self.reservation_data(90, 150))
+        assert response.status_code == 200, response.content
+        reservation = Reservation.objects.get(id=reservation_id)
+        assert (reservation.book_to - reservation.book_from).seconds == 3600
@@ -0,0 +1,95 @@
+import pytest
+from dateutil.relativedelta import relativedelta
+from django.urls import reverse
+from django.utils import timezone
+
+from parking import counters
+from parking.models import Company, Reservation, Venue
+
+from .fixtures.test_fixtures import (
+    BuildingVenueFactory, FloorVenueFactory, LotFactory)
+
+
+@pytest.mark.django_db
+class TestLotCounters(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_company):
+        self.company = user_company
+        self.building = BuildingVenueFactory(company=self.company)
+        self.floor = FloorVenueFactory(parent=self.building)
+        self.lots = [
+            LotFactory(parent=self.floor, name='Parking %s' % (x))
+            for x in range(1, 4)
+        ]
+
+    def reserve(self, lot, status=Reservation.ACTIVE):
+        now = timezone.now()
+        return Reservation.objects.create(
+            venue=lot,
+            book_from=now - relativedelta(hours=1),
+            book_to=now + relativedelta(hours=1),
+            license='MH 04 1234',
+            phone_number='+918082611337',
+            status=status)
+
+    def test_lot_count(self):
+        """ """
+        floor = Venue.objects.get(id=self.floor.id)
+        company = Company.objects.get(id=self.company.id)
+        assert floor.lot_count == 3
+        assert floor.free_lot_count == 3
+        assert company.lot_count == 3
+        assert Venue.objects.get(id=self.building.id).lot_count == 0
+
+    def test_occupied_lot_count(self):
+        """ """
+        reservation = self.reserve(self.lots[0])
+        self.reserve(self.lots[1], status=Reservation.PENDING)
+        assert Venue.objects.get(id=self.lots[0].id).is_occupied
+        assert Venue.objects.get(id=self.floor.id).free_lot_count == 2
+        assert Company.objects.get(
+            id=self.company.id).occupied_lot_count == 1
+
+        reservation.status = Reservation.CLOSED
+        reservation.save()
+        assert Venue.objects.get(id=self.floor.id).free_lot_count == 3
+
+    def test_lot_moved_and_deleted(self):
+        """ """
+        other_floor = FloorVenueFactory(parent=self.building, name='Floor 2')
+        lot = Venue.objects.get(id=self.lots[0].id)
+        lot.parent = other_floor
+        lot.save()
+        assert Venue.objects.get(id=self.floor.id).lot_count == 2
+        assert Venue.objects.get(id=other_floor.id).lot_count == 1
+        lot.delete()
+        assert Venue.objects.get(id=other_floor.id).lot_count == 0
+        assert Company.objects.get(id=self.company.id).lot_count == 2
+
+    def test_rebuild(self):
+        """ """
+        self.reserve(self.lots[0])
+        Venue.objects.update(
+            is_occupied=False, lot_count=0, occupied_lot_count=0)
+        counters.rebuild()
+        floor = Venue.objects.get(id=self.floor.id)
+        assert floor.lot_count == 3
+        assert floor.occupied_lot_count == 1
+
+    def test_list_and_detail_agree(self, client, user_token):
+        """ Pending reservation do not occupy lot anywhere"""
+        self.reserve(self.lots[0])
+        self.reserve(self.lots[1], status=Reservation.PENDING)
+        headers = {'HTTP_AUTHORIZATION': 'Token %s' % (user_token.key)}
+        listed = client.get(
+            reverse('company', kwargs={'version': 1}), **headers
+        ).json()['results'][0]
+        detail = client.get(reverse('company-detail', kwargs={
+            'version': 1, 'company_id': self.company.id}), **headers).json()
+        company = Company.objects.get(id=self.company.id)
+        assert (listed['total_lot'], listed['available_lot']) == (3, 2)
+        assert (detail['total_lot'], detail['available_lot']) == (3, 2)
+        assert (company.total_lot(), company.available_lot()) == (3, 2)
+        floor = Venue.objects.get(id=self.floor.id)
+        assert (floor.total_lot(), floor.available_lot()) == (3, 2)
@@ -0,0 +1,120 @@
+import csv
+import io
+import pytest
+from dateutil.relativedelta import relativedelta
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from parking import exporter
+from parking.models import PaymentHistory, Reservation
+
+from .fixtures.test_fixtures import CompanyFactory, LotFactory, UserFactory
+
+
+@pytest.mark.django_db
+class TestReservationExport(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_token, user_company):
+        self.client = client
+        self.token = user_token.key
+        self.company = user_company
+        self.lot = LotFactory(
+            company=user_company, name='Parking 1',
+            venue_price=None, parent=None)
+        self.now = timezone.now() + relativedelta(days=2)
+        for hours in range(5):
+            reservation = Reservation.objects.create(
+                venue=self.lot, user=user_token.user,
+                book_from=self.now + relativedelta(hours=hours),
+                book_to=self.now + relativedelta(hours=hours, minutes=30),
+                license='MH 04 1234', phone_number='+918082611337',
+                total_amount=100)
+            reservation.payment_history.create(
+                amount=10, payment_type=PaymentHistory.CASH)
+        other = LotFactory(
+            company=CompanyFactory(
+                name='Company 2', user=UserFactory(username='other')),
+            parent=None)
+        Reservation.objects.create(
+            venue=other, book_from=self.now,
+            book_to=self.now + relativedelta(hours=1),
+            license='MH 04 1234', phone_number='+918082611337')
+
+    def get(self, company_id=None, **params):
+        params.setdefault('start', int(self.now.timestamp()))
+        params.setdefault(
+            'end', int((self.now + relativedelta(hours=3)).timestamp()))
+        return self.client.get(
+            reverse('reservation-export', kwargs={
+                'version': 1,
+                'company_id': company_id or self.company.id
+            }),
+            params, HTTP_AUTHORIZATION='Token %s' % (self.token))
+
+    def read(self, response):
+        content = b''.join(response.streaming_content).decode('utf-8')
+        return list(csv.DictReader(io.StringIO(content)))
+
+    def test_reservation_csv(self):
+        """ Only company rows within range"""
+        response = self.get()
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/csv'
+        rows = self.read(response)
+        assert len(rows) == 3
+        assert rows[0]['venue_name'] == 'Parking 1'
+        assert rows[0]['phone_number'] == '+918082611337'
+        assert float(rows[0]['total_amount']) == 100
+
+    def test_payment_csv(self):
+        """ """
+        response = self.get(
+            dataset=exporter.PAYMENTS,
+            start=int((timezone.now() - relativedelta(hours=1)).timestamp()))
+        assert response.status_code == 200
+        rows = self.read(response)
+        assert len(rows) == 5
+        assert set(row['venue_id'] for row in rows) == {str(self.lot.id)}
+
+    @pytest.mark.skipif(
+        exporter.pyarrow is not None, reason='pyarrow installed')
+    def test_columnar_fallback(self):
+        """ CSV written when pyarrow not available"""
+        response = self.get(output=exporter.PARQUET)
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/csv'
+        assert len(self.read(response)) == 3
+
+    def test_invalid_range(self):
+        """ """
+        assert self.get(end=int(self.now.timestamp())).status_code == 400
+
+    def test_other_company(self):
+        """ """
+        company = CompanyFactory(
+            name='Company 3', user=UserFactory(username='third'))
+        assert self.get(company_id=company.id).status_code == 404
+
+    def test_export_chunks(self):
+        """ Rows written chunk by chunk"""
+        chunks = list(exporter.Exporter(
+            exporter.RESERVATIONS, chunk_size=2
+        ).export(
+            self.company, self.now,
+            self.now + relativedelta(hours=5)))
+        assert len(chunks) == 4
+        assert sum(chunk.count(b'\n') for chunk in chunks) == 6
+
+    def test_export_command(self, tmpdir):
+        """ """
+        path = tmpdir.join('reservations.csv')
+        call_command(
+            'export_reservations', str(self.company.id),
+            exporter.RESERVATIONS,
+            (self.now - relativedelta(days=1)).date().isoformat(),
+            (self.now + relativedelta(days=2)).date().isoformat(),
+            '--output', str(path), '--chunk-size', '2')
+        with open(str(path), newline='') as lines:
+            assert len(list(csv.DictReader(lines))) == 5
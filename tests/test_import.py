@@ -0,0 +1,147 @@
+import json
+import pytest
+from dateutil.relativedelta import relativedelta
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from parking import availability, importer
+from parking.models import Reservation
+
+from .fixtures.test_fixtures import CompanyFactory, LotFactory, UserFactory
+
+
+@pytest.mark.django_db
+class TestReservationImport(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_token, user_company):
+        self.client = client
+        self.token = user_token.key
+        self.company = user_company
+        self.lot = LotFactory(
+            company=user_company, name='Parking 1',
+            venue_price=None, parent=None)
+        self.now = timezone.now() + relativedelta(days=2)
+
+    def row(self, hours_from, hours_to, venue=None, **kwargs):
+        row = {
+            'venue': venue or self.lot.id,
+            'book_from': int(
+                (self.now + relativedelta(hours=hours_from)).timestamp()),
+            'book_to': int(
+                (self.now + relativedelta(hours=hours_to)).timestamp()),
+            'license': 'MH 04 1234',
+            'phone_number': '+918082611337'
+        }
+        row.update(kwargs)
+        return row
+
+    def other_company(self):
+        return CompanyFactory(
+            name='Company 2', user=UserFactory(username='other'))
+
+    def post(self, body, content_type, company_id=None):
+        return self.client.post(
+            reverse('reservation-import', kwargs={
+                'version': 1,
+                'company_id': company_id or self.company.id
+            }),
+            data=body, content_type=content_type,
+            HTTP_AUTHORIZATION='Token %s' % (self.token)
+        )
+
+    def test_ndjson_import(self):
+        """ Overlapping, invalid and foreign lot rows rejected"""
+        other_lot = LotFactory(
+            company=self.other_company(), name='Parking 2',
+            venue_price=None, parent=None)
+        rows = [
+            json.dumps(self.row(1, 2)),
+            json.dumps(self.row(3, 4)),
+            # Overlap row 1
+            json.dumps(self.row(1, 3)),
+            # Canceled reservation do not hold lot
+            json.dumps(self.row(1, 3, status=Reservation.CANCELED)),
+            json.dumps(self.row(5, 4)),
+            json.dumps(self.row(5, 6, venue=other_lot.id)),
+            '{not json',
+        ]
+        response = self.post('\n'.join(rows), 'application/x-ndjson')
+        assert response.status_code == 200
+        data = response.json()
+        assert data['created'] == 3
+        assert [error['row'] for error in data['errors']] == [3, 5, 6, 7]
+        assert Reservation.objects.filter(venue=self.lot).count() == 3
+        assert not availability.is_free(
+            self.lot.id, self.now + relativedelta(hours=1))
+        self.lot.refresh_from_db()
+        assert not self.lot.is_occupied
+
+    def test_csv_import_conflict_with_existing(self):
+        """ """
+        existing = self.row(1, 2)
+        self.post(json.dumps(existing), 'application/x-ndjson')
+        header = 'venue,book_from,book_to,license,phone_number,status'
+        lines = [header] + [
+            ','.join(str(row[key]) for key in header.split(','))
+            for row in [
+                self.row(1, 2, status=Reservation.PENDING),
+                self.row(2, 3, status=Reservation.BOOKED),
+            ]
+        ]
+        response = self.post('\n'.join(lines), 'text/csv')
+        data = response.json()
+        assert data['created'] == 0
+        assert len(data['errors']) == 2
+
+    def test_import_other_company(self):
+        """ """
+        response = self.post(
+            json.dumps(self.row(1, 2)), 'application/x-ndjson',
+            company_id=self.other_company().id)
+        assert response.status_code == 404
+
+    def test_import_command(self, tmpdir):
+        """ """
+        path = tmpdir.join('reservations.ndjson')
+        path.write('\n'.join(
+            json.dumps(self.row(hours, hours + 1))
+            for hours in range(0, 10, 2)))
+        call_command(
+            'import_reservations', str(self.company.id), str(path),
+            '--batch-size', '2')
+        assert Reservation.objects.filter(venue=self.lot).count() == 5
+
+    def test_index_synced_every_batch(self):
+        """ Rows of earlier batches and rows written or canceled meanwhile
+        by others checked
+        """
+        canceled = Reservation.objects.create(
+            venue=self.lot, book_from=self.now + relativedelta(hours=10),
+            book_to=self.now + relativedelta(hours=11),
+            license='MH 04 1234', phone_number='+918082611337')
+        Reservation.objects.create(
+            venue=self.lot, book_from=self.now,
+            book_to=self.now + relativedelta(hours=1),
+            license='MH 04 1234', phone_number='+918082611337')
+
+        def rows():
+            yield self.row(2, 3)
+            yield self.row(4, 5)
+            # Booked & canceled through API while import running
+            Reservation.objects.create(
+                venue=self.lot, book_from=self.now + relativedelta(hours=8),
+                book_to=self.now + relativedelta(hours=9),
+                license='MH 04 1234', phone_number='+918082611337')
+            canceled.status = Reservation.CANCELED
+            canceled.save()
+            yield self.row(2, 3, license='MH 04 4321')
+            yield self.row(8, 9)
+            yield self.row(0, 1)
+            yield self.row(10, 11)
+
+        report = importer.ReservationImporter(
+            self.company, batch_size=2).run(rows())
+        assert report['created'] == 3
+        assert [error['row'] for error in report['errors']] == [3, 4, 5]
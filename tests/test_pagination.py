@@ -0,0 +1,121 @@
+import pytest
+from dateutil.relativedelta import relativedelta
+from django.urls import reverse
+from django.utils import timezone
+
+from parking.models import Reservation
+
+from .fixtures.test_fixtures import (
+    BuildingVenueFactory, FloorVenueFactory, LotFactory)
+
+
+@pytest.mark.django_db
+class TestKeysetPagination(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_token, user_company):
+        self.client = client
+        self.token = user_token.key
+        self.user = user_token.user
+        self.company = user_company
+        self.lot = LotFactory(
+            company=user_company, name='Parking 1', parent=None)
+        start = timezone.now() + relativedelta(days=2)
+        # Pairs of reservation share start time
+        for x in range(7):
+            Reservation.objects.create(
+                venue=self.lot, user=self.user,
+                book_from=start + relativedelta(
+                    hours=x // 2, microseconds=x // 2),
+                book_to=start + relativedelta(hours=x // 2 + 1),
+                license='MH 04 1234', phone_number='+918082611337')
+        self.expected = list(Reservation.objects.order_by(
+            'book_from', 'id').values_list('id', flat=True))
+
+    def get(self, url):
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION='Token %s' % (self.token))
+        assert response.status_code == 200
+        return response.json()
+
+    def test_walk_pages(self):
+        """ Following next then previous links visit every row once"""
+        url = reverse('reservation', kwargs={'version': 1}) + '?limit=3'
+        pages = []
+        while url:
+            page = self.get(url)
+            assert page['count'] is None
+            pages.append([row['id'] for row in page['results']])
+            url = page['next']
+        assert [len(ids) for ids in pages] == [3, 3, 1]
+        assert sum(pages, []) == self.expected
+
+        url = page['previous']
+        backward = []
+        while url:
+            page = self.get(url)
+            backward.insert(0, [row['id'] for row in page['results']])
+            url = page['previous']
+        assert backward == pages[:-1]
+
+    def test_count(self):
+        """ """
+        url = reverse('reservation', kwargs={'version': 1})
+        assert self.get(url + '?count=exact')['count'] == 7
+        assert self.get(url + '?count=estimate')['count'] == 7
+
+    def test_invalid_cursor(self):
+        """ """
+        response = self.client.get(
+            reverse('reservation', kwargs={'version': 1}) + '?cursor=abc',
+            HTTP_AUTHORIZATION='Token %s' % (self.token))
+        assert response.status_code == 404
+
+    def test_window_validators(self):
+        """ Row deleted inside page window change ETag even when newest
+        modification and window size stay same
+        """
+        url = reverse('reservation', kwargs={'version': 1}) + '?limit=3'
+        Reservation.objects.get(id=self.expected[0]).save()
+        etag = self.client.get(
+            url, HTTP_AUTHORIZATION='Token %s' % (self.token))['ETag']
+        Reservation.objects.filter(id=self.expected[1]).delete()
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION='Token %s' % (self.token),
+            HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert [row['id'] for row in response.json()['results']] == [
+            self.expected[0], self.expected[2], self.expected[3]]
+
+    def test_related_validators(self):
+        """ Renamed venue embedded in reservations change ETag of page and
+        detail
+        """
+        headers = {'HTTP_AUTHORIZATION': 'Token %s' % (self.token)}
+        urls = [
+            reverse('reservation', kwargs={'version': 1}) + '?limit=3',
+            reverse('reservation-detail', kwargs={
+                'version': 1, 'reservation_id': self.expected[0]})]
+        etags = [self.client.get(url, **headers)['ETag'] for url in urls]
+        self.lot.name = 'Parking 2'
+        self.lot.save()
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **headers)
+            assert response.status_code == 200
+            assert 'Parking 2' in response.content.decode('utf-8')
+
+    def test_venue_pages(self):
+        """ Venues paged in tree order"""
+        building = BuildingVenueFactory(company=self.company)
+        floors = [
+            FloorVenueFactory(parent=building, name='Floor %s' % (x))
+            for x in range(5)]
+        url = reverse(
+            'sub-venue-list',
+            kwargs={'version': 1, 'venue_id': building.id}) + '?limit=2'
+        names = []
+        while url:
+            page = self.get(url)
+            names.extend(row['name'] for row in page['results'])
+            url = page['next']
+        assert names == [floor.name for floor in floors]
@@ -0,0 +1,116 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from parking import price_cache
+from parking.models import LotPrice
+
+from .fixtures.test_fixtures import LotFactory, PriceFactory
+
+
+@pytest.mark.django_db
+class TestPriceCache(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_company):
+        self.company = user_company
+        self.prices = [
+            PriceFactory(company=user_company, name='Price %s' % (x))
+            for x in range(3)]
+        self.cache = price_cache.PriceCache(size=2)
+
+    def count_queries(self, function, *args):
+        with CaptureQueriesContext(connection) as context:
+            result = function(*args)
+        return result, len(context)
+
+    def test_hit_and_miss(self):
+        """ """
+        price, queries = self.count_queries(
+            self.cache.get, self.prices[0].id)
+        assert price.name == 'Price 0'
+        assert queries == 1
+        price, queries = self.count_queries(
+            self.cache.get, self.prices[0].id)
+        assert price.name == 'Price 0'
+        assert queries == 0
+        assert self.cache.get(None) is None
+        stats = self.cache.stats()
+        assert (stats['hits'], stats['misses']) == (1, 1)
+
+    def test_least_recently_used_evicted(self):
+        """ """
+        self.cache.get_many([price.id for price in self.prices[:2]])
+        self.cache.get(self.prices[0].id)
+        self.cache.get(self.prices[2].id)
+        assert list(self.cache.prices) == [
+            self.prices[0].id, self.prices[2].id]
+
+    def test_company_prices(self):
+        """ """
+        prices, queries = self.count_queries(
+            self.cache.company_prices, self.company.id)
+        assert [price.id for price in prices] == [
+            price.id for price in self.prices]
+        assert queries == 1
+        assert self.count_queries(
+            self.cache.company_prices, self.company.id)[1] == 0
+
+    def test_saved_price_expire_every_process(self):
+        """ Entries of other cache instance dropped on next lookup"""
+        self.cache.get(self.prices[0].id)
+        self.cache.company_prices(self.company.id)
+        price = LotPrice.objects.get(id=self.prices[0].id)
+        price.amount = 75
+        price.save()
+        assert self.cache.get(price.id).amount == 75
+        assert self.cache.company_prices(self.company.id)[0].amount == 75
+
+    def test_deleted_price(self):
+        """ """
+        price = self.prices[1]
+        self.cache.get(price.id)
+        price.delete()
+        assert self.cache.get(self.prices[1].id) is None
+
+    def test_venue_price(self):
+        """ """
+        lot = LotFactory(
+            company=self.company, parent=None, venue_price=self.prices[2])
+        free_lot = LotFactory(
+            company=self.company, parent=None, venue_price=None)
+        price_cache.lot_prices.clear()
+        assert price_cache.price_of_venue(lot).id == self.prices[2].id
+        assert self.count_queries(price_cache.price_of_venue, lot)[1] == 0
+        assert price_cache.price_of_venue(free_lot) is None
+
+    def test_company_price_list(self, client, user_token):
+        """ Price list endpoint served from cache"""
+        url = reverse(
+            'lot-price', kwargs={'version': 1, 'company_id': self.company.id})
+        headers = {'HTTP_AUTHORIZATION': 'Token %s' % (user_token.key)}
+        price_cache.lot_prices.clear()
+        client.get(url, **headers)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, **headers)
+        assert response.status_code == 200
+        assert [row['name'] for row in response.json()['results']] == [
+            'Price 0', 'Price 1', 'Price 2']
+        assert not any(
+            'parking_lotprice' in query['sql'] for query in context)
+        not_modified = client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'], **headers)
+        assert not_modified.status_code == 304
+
+        PriceFactory(company=self.company, name='Price 3')
+        response = client.get(url, **headers)
+        assert len(response.json()['results']) == 4
+
+    def test_stats_logged(self, settings, caplog):
+        """ """
+        settings.LOT_PRICE_CACHE_LOG_EVERY = 2
+        with caplog.at_level('INFO', logger='parking.price_cache'):
+            self.cache.get(self.prices[0].id)
+            self.cache.get(self.prices[0].id)
+        assert "'hits': 1" in caplog.text
@@ -0,0 +1,133 @@
+import json
+import math
+import random
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.urls import reverse
+from django.utils import timezone
+
+from parking import pricing
+from parking.models import LotPrice, PaymentHistory, Reservation
+
+from .fixtures.test_fixtures import (
+    CompanyFactory, LotFactory, PriceFactory, UserFactory)
+
+PRICING_BACKENDS = [False] + ([True] if pricing.numpy is not None else [])
+
+
+def reference_amount(amount, duration, duration_unit, book_from, book_to):
+    """ Per booking calculation pricing engine replaced"""
+    td = book_to - book_from
+    days, hours = td.days, td.seconds // 3600
+    if duration_unit == LotPrice.DAY:
+        if hours:
+            days = days + 1
+        return amount * math.ceil(days / duration)
+    if days:
+        hours = hours + (days * 24)
+    return amount * math.ceil(hours / duration)
+
+
+@pytest.mark.parametrize('use_numpy', PRICING_BACKENDS)
+def test_quote_many_same_as_single_booking(use_numpy):
+    """ """
+    generator = random.Random(7)
+    start = timezone.now()
+    prices, windows = [], []
+    for x in range(500):
+        prices.append((
+            Decimal(generator.randint(0, 50000)) / 100,
+            generator.randint(1, 5),
+            generator.choice((LotPrice.HOUR, LotPrice.DAY))))
+        book_from = start + timedelta(seconds=generator.randint(0, 10 ** 6))
+        windows.append((book_from, book_from + timedelta(
+            seconds=generator.randint(0, 10 ** 7))))
+    amounts = pricing.quote_many(prices, windows, use_numpy=use_numpy)
+    assert amounts == [
+        reference_amount(*(price + window))
+        for price, window in zip(prices, windows)]
+
+
+@pytest.mark.parametrize('use_numpy', PRICING_BACKENDS)
+def test_quote_many_free_lot(use_numpy):
+    """ """
+    now = timezone.now()
+    amounts = pricing.quote_many(
+        [None, (Decimal('10.50'), 2, LotPrice.HOUR)],
+        [(now, now + timedelta(hours=3))] * 2, use_numpy=use_numpy)
+    assert amounts == [0, Decimal('21.00')]
+
+
+@pytest.mark.django_db
+class TestQuoteAPI(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_token, user_company):
+        self.client = client
+        self.token = user_token.key
+        self.hourly = PriceFactory(
+            company=user_company, duration=1, duration_unit=LotPrice.HOUR,
+            amount=10, pre_paid_amount=0)
+        self.daily = PriceFactory(
+            company=user_company, duration=1, duration_unit=LotPrice.DAY,
+            amount=150, pre_paid_amount=0)
+        self.lot = LotFactory(
+            company=user_company, parent=None, venue_price=self.hourly)
+        self.daily_lot = LotFactory(
+            company=user_company, parent=None, venue_price=self.daily)
+        self.free_lot = LotFactory(
+            company=user_company, parent=None, venue_price=None)
+        self.now = timezone.now() + relativedelta(days=1)
+
+    def window(self, lot, hours):
+        return {
+            'venue': lot.id,
+            'book_from': int(self.now.timestamp()),
+            'book_to': int((self.now + timedelta(hours=hours)).timestamp())
+        }
+
+    def post(self, url, data):
+        return self.client.post(
+            url, data=json.dumps(data), content_type='application/json',
+            HTTP_AUTHORIZATION='Token %s' % (self.token))
+
+    def quote(self, windows):
+        return self.post(
+            reverse('lot-quote', kwargs={'version': 1}),
+            {'windows': windows})
+
+    def test_quote(self):
+        """ """
+        response = self.quote([
+            self.window(self.lot, 3), self.window(self.daily_lot, 30),
+            self.window(self.free_lot, 3)])
+        assert response.status_code == 200
+        results = response.json()
+        assert [row['total_amount'] for row in results] == [
+            '30.00', '300.00', '0.00']
+        assert results[0]['price'] == self.hourly.id
+        assert results[2]['price'] is None
+
+    def test_quote_unknown_lot(self):
+        """ Lot of other company private, not priced"""
+        other = LotFactory(
+            company=CompanyFactory(
+                user=UserFactory(username='other'), name='Company 2'),
+            parent=None, venue_type='private')
+        response = self.quote([self.window(other, 1)])
+        assert response.status_code == 400
+
+    def test_booking_charge_same_as_quote(self):
+        """ """
+        window = self.window(self.lot, 5)
+        quoted = self.quote([window]).json()[0]['total_amount']
+        response = self.post(
+            reverse('reservation', kwargs={'version': 1}),
+            dict(window, license='MH 04 1234',
+                 phone_number='+918082611337',
+                 payments=[{'amount': 0, 'payment_type': PaymentHistory.CASH}]))
+        assert response.status_code == 201, response.content
+        reservation = Reservation.objects.get(id=response.json()['id'])
+        assert reservation.total_amount == Decimal(quoted)
@@ -0,0 +1,62 @@
+""" Query plan regression of hot queries
+
+Fail when a hot query fall back to full table scan, e.g. index dropped or
+query changed so index no longer apply.
+"""
+import re
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from parking.models import Reservation, Venue
+
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)')
+
+# Composite index each hot query expected to search with
+EXPECTED_INDEX = {
+    'booking conflict': 'reservation_venue_window_idx',
+    'user reservation page': 'reservation_user_start_idx',
+    'overdue transition': 'reservation_status_start_idx',
+    'active transition': 'reservation_status_start_idx',
+    'company venue search': 'venue_company_category_idx',
+    'venue tree': 'venue_tree_order_idx',
+}
+
+
+def full_scans(queryset):
+    """ Tables read by full scan in SQLite query plan of queryset"""
+    return FULL_SCAN.findall(queryset.explain())
+
+
+def hot_queries():
+    now = timezone.now()
+    return {
+        'booking conflict': Reservation.objects.filter(
+            venue_id=1).overlapping(now, now),
+        'availability load': Reservation.objects.filter(
+            venue_id__in=[1, 2, 3]).holding(),
+        'user reservation page': Reservation.objects.filter(
+            user_id=1).order_by('book_from', 'id')[:21],
+        'overdue transition': Reservation.objects.filter(
+            status=Reservation.ACTIVE, book_to__lt=now),
+        'active transition': Reservation.objects.filter(
+            status=Reservation.PENDING, book_from__lte=now,
+            book_to__gt=now),
+        'company venue search': Venue.objects.filter(
+            company_id=1, category=Venue.LOT, venue_type=Venue.PUBLIC),
+        'venue tree': Venue.objects.filter(
+            tree_id=1, lft__gte=1, rght__lte=10).order_by('tree_id', 'lft'),
+    }
+
+
+@pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='Plan format of SQLite')
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', sorted(hot_queries()))
+def test_no_full_table_scan(name):
+    """ """
+    queryset = hot_queries()[name]
+    plan = queryset.explain()
+    assert full_scans(queryset) == [], plan
+    if name in EXPECTED_INDEX:
+        assert EXPECTED_INDEX[name] in plan, plan
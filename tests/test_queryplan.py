@@ -0,0 +1,88 @@
+import pytest
+from rest_framework import serializers
+
+from parking import serializers as parking_serializers
+from parking.models import Company
+from parkinglot.queryplan import QueryPlan, get_query_plan
+
+from .fixtures.test_fixtures import CompanyFactory, LotFactory, PriceFactory
+
+
+class CompanyVenueSerializer(serializers.ModelSerializer):
+    """ """
+    owner = serializers.CharField(source='user.username')
+    venues = parking_serializers.ReservationVenueSerializer(many=True)
+    prices = serializers.PrimaryKeyRelatedField(
+        many=True, read_only=True, source='lot_prices')
+
+    class Meta:
+        model = Company
+        fields = ('id', 'name', 'owner', 'venues', 'prices')
+
+
+class TestQueryPlan(object):
+
+    def test_dotted_source_selected(self):
+        """ """
+        plan = QueryPlan(Company)
+        plan.walk(CompanyVenueSerializer(), Company)
+        assert plan.select_related == ['user']
+        assert {'name', 'user', 'user__username'} <= plan.only
+        assert 'user__password' not in plan.only
+
+    def test_many_relations_prefetched(self):
+        """ Prefetched rows keep foreign key back to parent"""
+        plan = QueryPlan(Company)
+        plan.walk(CompanyVenueSerializer(), Company)
+        prefetch = dict(
+            (lookup.prefetch_through, lookup.queryset)
+            for lookup in plan.prefetch_related)
+        assert sorted(prefetch) == ['lot_prices', 'venues']
+        only, defer = prefetch['venues'].query.deferred_loading
+        assert not defer
+        # Tree fields always loaded for MPTT model
+        assert {'id', 'name', 'company', 'tree_id', 'lft'} <= only
+        assert 'venue_type' not in only
+        only, defer = prefetch['lot_prices'].query.deferred_loading
+        assert only == {'id', 'company'}
+
+    def test_unknown_attribute_keep_columns(self):
+        """ Method & property source may read any column"""
+        plan = get_query_plan(parking_serializers.VenueViewSerializer)
+        assert plan.select_related == ['venue_price', 'company']
+        assert plan.only is None
+
+    def test_cached_per_class(self):
+        """ """
+        assert get_query_plan(
+            parking_serializers.ReservationViewSerializer
+        ) is get_query_plan(parking_serializers.ReservationViewSerializer)
+        assert get_query_plan(parking_serializers.VenueTreeSerializer) is None
+
+
+@pytest.mark.django_db
+def test_venue_list_queries(client, user_token, assert_max_queries):
+    """ Company & price of every venue loaded with the page"""
+    def get():
+        response = client.get(
+            '/v1/venue', HTTP_AUTHORIZATION='Token %s' % (user_token.key))
+        assert response.status_code == 200
+        return response.json()['results']
+
+    def add_lots(count):
+        for x in range(count):
+            company = CompanyFactory(user=user_token.user, name='Co %s' % x)
+            LotFactory(
+                company=company, parent=None,
+                venue_price=PriceFactory(company=company))
+
+    add_lots(2)
+    with assert_max_queries(100) as context:
+        get()
+    expected = len(context)
+    add_lots(5)
+    with assert_max_queries(expected):
+        results = get()
+    assert len(results) == 7
+    assert results[-1]['company_name'] == 'Co 4'
+    assert results[-1]['price']['amount']
@@ -0,0 +1,161 @@
+import pytest
+from datetime import datetime, time, timedelta
+from django.urls import reverse
+from django.utils import timezone
+
+from parking.models import Reservation, ReservationRollup
+
+from .fixtures.test_fixtures import (
+    BuildingVenueFactory, CompanyFactory, FloorVenueFactory, LotFactory,
+    UserFactory)
+
+
+@pytest.mark.django_db
+class TestCompanyReport(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_token, user_company):
+        self.client = client
+        self.token = user_token.key
+        self.company = user_company
+        self.building = BuildingVenueFactory(company=user_company)
+        self.floors = []
+        self.lots = []
+        for number in range(2):
+            floor = FloorVenueFactory(
+                parent=self.building, name='Floor %s' % (number + 1))
+            self.floors.append(floor)
+            self.lots.append([
+                LotFactory(parent=floor, name='Lot %s' % (x))
+                for x in range(2)])
+        self.today = timezone.make_aware(
+            datetime.combine(timezone.localdate(), time()))
+        self.start = self.today - timedelta(days=2)
+        # Two hours on floor 1 two days ago, one hour on floor 2 yesterday
+        self.reserve(self.lots[0][0], self.start, 2, total_amount=20)
+        self.reserve(
+            self.lots[1][1], self.start + timedelta(days=1), 1,
+            total_amount=10, total_amount_paid=10, overdue_amount=5)
+        self.reserve(
+            self.lots[1][0], self.start + timedelta(days=1), 3,
+            total_amount=30, status=Reservation.CANCELED)
+        other = LotFactory(
+            company=CompanyFactory(
+                name='Company 2', user=UserFactory(username='other')),
+            parent=None)
+        self.reserve(other, self.start, 5, total_amount=50)
+
+    def reserve(self, lot, start, hours, **kwargs):
+        return Reservation.objects.create(
+            venue=lot, book_from=start + timedelta(hours=1),
+            book_to=start + timedelta(hours=1 + hours),
+            license='MH 04 1234', phone_number='+918082611337', **kwargs)
+
+    def get(self, **params):
+        params.setdefault('start', int(self.start.timestamp()))
+        params.setdefault(
+            'end', int((self.today + timedelta(days=1)).timestamp()))
+        response = self.client.get(
+            reverse('company-report', kwargs={
+                'version': 1, 'company_id': self.company.id}),
+            params, HTTP_AUTHORIZATION='Token %s' % (self.token))
+        return response
+
+    def rows(self, **params):
+        response = self.get(**params)
+        assert response.status_code == 200
+        return dict(
+            ((row['venue'], row['period_start']), row)
+            for row in response.json())
+
+    def test_building_totals(self):
+        """ """
+        rows = self.rows()
+        assert len(rows) == 3
+        first = rows[(self.building.id, self.start.timestamp())]
+        assert first['closed']
+        assert first['reservation_count'] == 1
+        assert float(first['total_amount']) == 20
+        assert float(first['lot_hours']) == 2
+        assert first['occupancy_rate'] == round(2 / (4 * 24.0), 4)
+        second = rows[(
+            self.building.id, (self.start + timedelta(days=1)).timestamp())]
+        assert second['reservation_count'] == 1
+        assert float(second['total_amount_paid']) == 10
+        assert float(second['overdue_amount']) == 5
+        today = rows[(self.building.id, self.today.timestamp())]
+        assert not today['closed']
+        assert today['reservation_count'] == 0
+
+    def test_floor_subtrees(self):
+        """ """
+        rows = self.rows(venue=self.building.id)
+        assert len(rows) == 6
+        day = self.start.timestamp()
+        assert rows[(self.floors[0].id, day)]['reservation_count'] == 1
+        assert rows[(self.floors[1].id, day)]['reservation_count'] == 0
+        day = (self.start + timedelta(days=1)).timestamp()
+        assert float(rows[(self.floors[1].id, day)]['lot_hours']) == 1
+
+    def test_closed_periods_rolled_up(self, assert_max_queries):
+        """ Closed periods read from rollup on next report"""
+        self.rows()
+        assert ReservationRollup.objects.filter(
+            company=self.company).count() == 2
+        # Token, company, venues, rollups, staleness, open period, lots
+        with assert_max_queries(7) as context:
+            rows = self.rows()
+        aggregate = [
+            query['sql'] for query in context.captured_queries
+            if 'SUM(' in query['sql']]
+        assert len(aggregate) == 1
+        # History not rescanned
+        assert str(self.start.date()) not in aggregate[0]
+        assert rows[(self.building.id, self.start.timestamp())][
+            'reservation_count'] == 1
+
+    def test_rollup_refreshed(self):
+        """ Modified or deleted reservation recomputed"""
+        self.rows()
+        reservation = Reservation.objects.get(
+            venue=self.lots[0][0], book_from__gte=self.start)
+        reservation.total_amount = 25
+        reservation.save()
+        day = self.start.timestamp()
+        assert float(self.rows()[(self.building.id, day)][
+            'total_amount']) == 25
+        reservation.delete()
+        assert self.rows()[(self.building.id, day)][
+            'reservation_count'] == 0
+
+    def test_moved_reservation(self):
+        """ Reservation moved between closed periods counted once"""
+        self.rows()
+        reservation = Reservation.objects.get(
+            venue=self.lots[0][0], book_from__gte=self.start)
+        reservation.book_from += timedelta(days=1)
+        reservation.book_to += timedelta(days=1)
+        reservation.save()
+        rows = self.rows()
+        first = self.start.timestamp()
+        second = (self.start + timedelta(days=1)).timestamp()
+        assert rows[(self.building.id, first)]['reservation_count'] == 0
+        assert rows[(self.building.id, second)]['reservation_count'] == 2
+        assert sum(row['reservation_count'] for row in rows.values()) == 2
+
+    def test_week_bucket(self):
+        """ """
+        rows = self.rows(bucket=ReservationRollup.WEEK)
+        assert sum(row['reservation_count'] for row in rows.values()) == 2
+
+    def test_invalid(self):
+        """ """
+        assert self.get(end=int(self.start.timestamp())).status_code == 400
+        company = CompanyFactory(
+            name='Company 3', user=UserFactory(username='third'))
+        response = self.client.get(
+            reverse('company-report', kwargs={
+                'version': 1, 'company_id': company.id}),
+            {'start': 0, 'end': 10},
+            HTTP_AUTHORIZATION='Token %s' % (self.token))
+        assert response.status_code == 404
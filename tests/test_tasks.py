@@ -0,0 +1,173 @@
+import pytest
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.utils import timezone
+
+from parking import importer, tasks
+from parking.models import LotPrice, Reservation, Venue
+from parking.tasks import (
+    OVERDUE_DELAY, check_reservation_status, get_boundaries,
+    schedule_reservation_transitions)
+
+from .fixtures.test_fixtures import LotFactory, PriceFactory
+
+
+@pytest.mark.django_db
+class TestCheckReservationStatus(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_company):
+        self.company = user_company
+        self.now = timezone.now()
+        self.price = PriceFactory(
+            company=self.company, duration=1,
+            duration_unit=LotPrice.HOUR, amount=100, overdue_amount=10)
+        self.lot = LotFactory(
+            company=self.company, parent=None, venue_price=self.price)
+        self.free_lot = LotFactory(
+            company=self.company, parent=None, name='Parking 2')
+
+    def reserve(self, lot, minutes_from, minutes_to, status):
+        return Reservation.objects.create(
+            venue=lot,
+            book_from=self.now + relativedelta(minutes=minutes_from),
+            book_to=self.now + relativedelta(minutes=minutes_to),
+            license='MH 04 1234',
+            phone_number='+918082611337',
+            status=status,
+            total_amount=100)
+
+    def test_status_transitions(self):
+        """ """
+        if (self.now - relativedelta(minutes=2)).date() != self.now.date():
+            pytest.skip('Reservation window cross midnight')
+        overdue = self.reserve(self.lot, -2, -1, Reservation.ACTIVE)
+        active = self.reserve(self.free_lot, -1, 60, Reservation.PENDING)
+        future = self.reserve(self.free_lot, 120, 180, Reservation.PENDING)
+
+        result = check_reservation_status()
+        assert result == {Reservation.OVERDUE: 1, Reservation.ACTIVE: 1}
+
+        overdue.refresh_from_db()
+        assert overdue.status == Reservation.OVERDUE
+        assert overdue.overdue_amount == Decimal('10')
+        assert overdue.total_amount == Decimal('110')
+        active.refresh_from_db()
+        assert active.status == Reservation.ACTIVE
+        future.refresh_from_db()
+        assert future.status == Reservation.PENDING
+        assert Venue.objects.get(id=self.free_lot.id).is_occupied
+
+    def test_overdue_without_price(self):
+        """ """
+        if (self.now - relativedelta(minutes=2)).date() != self.now.date():
+            pytest.skip('Reservation window cross midnight')
+        overdue = self.reserve(self.free_lot, -2, -1, Reservation.ACTIVE)
+        assert check_reservation_status()[Reservation.OVERDUE] == 1
+        overdue.refresh_from_db()
+        assert overdue.total_amount == Decimal('100')
+
+
+@pytest.mark.django_db
+class TestReservationTransitionSchedule(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_company):
+        self.now = timezone.now()
+        self.lot = LotFactory(company=user_company, parent=None)
+
+    def reserve(self, minutes_from, minutes_to, status):
+        return Reservation.objects.create(
+            venue=self.lot,
+            book_from=self.now + relativedelta(minutes=minutes_from),
+            book_to=self.now + relativedelta(minutes=minutes_to),
+            license='MH 04 1234',
+            phone_number='+918082611337',
+            status=status)
+
+    def test_boundaries(self):
+        """ """
+        reservation = self.reserve(10, 20, Reservation.PENDING)
+        assert get_boundaries(
+            reservation.status, reservation.book_from, reservation.book_to
+        ) == [reservation.book_from, reservation.book_to + OVERDUE_DELAY]
+        assert get_boundaries(
+            Reservation.CLOSED, reservation.book_from, reservation.book_to
+        ) == []
+
+    def test_schedule_within_horizon(self):
+        """ Eager tasks run right away, transition apply only once
+        boundary passed
+        """
+        started = self.reserve(-1, 30, Reservation.PENDING)
+        later = self.reserve(120, 180, Reservation.PENDING)
+        assert schedule_reservation_transitions(rebuild=True) == 2
+        started.refresh_from_db()
+        assert started.status == Reservation.ACTIVE
+        later.refresh_from_db()
+        assert later.status == Reservation.PENDING
+        # Only end boundary of started reservation left within horizon
+        assert schedule_reservation_transitions() == 1
+
+    def test_late_run(self, monkeypatch):
+        """ Boundaries between previous window end and late run start still
+        queued
+        """
+        queued = []
+        monkeypatch.setattr(
+            tasks.transit_reservation, 'apply_async',
+            lambda args, eta: queued.append((args[0], eta)))
+        reservation = self.reserve(70, 200, Reservation.PENDING)
+        assert schedule_reservation_transitions() == 0
+        late = self.now + relativedelta(minutes=75)
+        monkeypatch.setattr(tasks.timezone, 'now', lambda: late)
+        assert schedule_reservation_transitions() == 1
+        assert queued == [(reservation.id, reservation.book_from)]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestReservationTransitionReschedule(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, user_company, monkeypatch):
+        self.company = user_company
+        self.now = timezone.now()
+        self.lot = LotFactory(company=user_company, parent=None)
+        self.queued = []
+        monkeypatch.setattr(
+            tasks.transit_reservation, 'apply_async',
+            lambda args, eta: self.queued.append((args[0], eta)))
+
+    def test_moved_reservation(self):
+        """ """
+        reservation = Reservation.objects.create(
+            venue=self.lot, book_from=self.now + relativedelta(hours=3),
+            book_to=self.now + relativedelta(hours=4),
+            license='MH 04 1234', phone_number='+918082611337')
+        reservation.license = 'MH 04 4321'
+        reservation.save()
+        assert self.queued == []
+        reservation.book_from = self.now + relativedelta(minutes=10)
+        reservation.save()
+        assert self.queued == [(reservation.id, reservation.book_from)]
+
+    def test_imported_reservation(self):
+        """ """
+        row = {
+            'venue': self.lot.id,
+            'book_from': int(
+                (self.now + relativedelta(minutes=10)).timestamp()),
+            'book_to': int(
+                (self.now + relativedelta(minutes=40)).timestamp()),
+            'license': 'MH 04 1234',
+            'phone_number': '+918082611337'
+        }
+        later = dict(
+            row, book_from=row['book_from'] + 7200,
+            book_to=row['book_to'] + 7200)
+        report = importer.ReservationImporter(self.company).run([row, later])
+        assert report['created'] == 2
+        reservation = Reservation.objects.order_by('book_from').first()
+        assert self.queued == [
+            (reservation.id, reservation.book_from),
+            (reservation.id, reservation.book_to + OVERDUE_DELAY)]
@@ -1,10 +1,20 @@
+import io
 import json
 import pytest
+import threading
+import time
 import urllib
 
+from dateutil.relativedelta import relativedelta
+from django.core.management import call_command
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework import exceptions
 
-from .fixtures.test_fixtures import CompanyFactory
+from parking import login
+from parking.models import Reservation, UserSummary
+
+from .fixtures.test_fixtures import CompanyFactory, LotFactory, UserFactory
 
 
 @pytest.mark.django_db
@@ -201,3 +211,146 @@ class TestUserAPI(object):
         json_response = response.json()
         company_key = list(json_response.keys())
         assert self.company_key == company_key.sort()
+
+
+@pytest.mark.django_db
+class TestLoginFastPath(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_company):
+        self.client = client
+        self.user = user_company.user
+
+    def login(self, password='sidh@123'):
+        return self.client.post(
+            reverse('login', kwargs={'version': 1}),
+            data=json.dumps({'username': 'sidh711', 'password': password}),
+            content_type='application/json')
+
+    def test_login_single_query(self, assert_max_queries):
+        """ User, token, company & reservation count read together"""
+        token = self.login().json()['authentication_code']
+        with assert_max_queries(1):
+            response = self.login()
+        assert response.status_code == 200
+        assert response.json()['authentication_code'] == token
+        assert response.json()['company_id'] == (
+            self.user.companies.last().id)
+        assert response.json()['reservation_count'] == 0
+
+    def test_invalid_login(self):
+        """ """
+        assert self.login(password='wrong').status_code == 400
+        self.user.is_active = False
+        self.user.save()
+        assert self.login().status_code == 400
+
+    def test_login_throttled_when_pool_full(self):
+        """ """
+        pool, slots = login.get_pool()
+        acquired = 0
+        while slots.acquire(blocking=False):
+            acquired += 1
+        try:
+            assert self.login().status_code == 429
+        finally:
+            for x in range(acquired):
+                slots.release()
+        assert self.login().status_code == 200
+
+    def free_slots(self, slots):
+        acquired = 0
+        while slots.acquire(blocking=False):
+            acquired += 1
+        for x in range(acquired):
+            slots.release()
+        return acquired
+
+    def test_timed_out_hash_hold_slot(self, settings):
+        """ Abandoned hash count against pool bound till it finish"""
+        settings.LOGIN_HASH_TIMEOUT = 0.05
+        pool, slots = login.get_pool()
+        free = self.free_slots(slots)
+        finish = threading.Event()
+        with pytest.raises(exceptions.Throttled):
+            login.run_hasher(finish.wait, 5)
+        assert self.free_slots(slots) == free - 1
+        finish.set()
+        for x in range(100):
+            if self.free_slots(slots) == free:
+                break
+            time.sleep(0.01)
+        assert self.free_slots(slots) == free
+
+
+@pytest.mark.django_db
+class TestUserSummary(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_token, user_company):
+        self.client = client
+        self.token = user_token.key
+        self.user = user_token.user
+        self.company = user_company
+        self.lot = LotFactory(company=user_company, parent=None)
+
+    def reserve(self, status=Reservation.PENDING):
+        now = timezone.now()
+        return Reservation.objects.create(
+            venue=self.lot, user=self.user, status=status,
+            book_from=now + relativedelta(days=1),
+            book_to=now + relativedelta(days=1, hours=1),
+            license='MH 04 1234', phone_number='+918082611337')
+
+    def summary(self):
+        return UserSummary.objects.get(user=self.user)
+
+    def detail(self):
+        return self.client.get(
+            reverse('detail', kwargs={'version': 1}),
+            HTTP_AUTHORIZATION='Token %s' % (self.token)).json()
+
+    def test_reservation_counts(self):
+        """ """
+        reservation = self.reserve()
+        self.reserve(status=Reservation.CANCELED)
+        summary = self.summary()
+        assert summary.reservation_count == 2
+        assert summary.active_reservation_count == 1
+        reservation.status = Reservation.CLOSED
+        reservation.save()
+        assert self.summary().active_reservation_count == 0
+        reservation.delete()
+        assert self.summary().reservation_count == 1
+
+    def test_last_company(self):
+        """ """
+        assert self.summary().company_id == self.company.id
+        company = CompanyFactory(user=self.user, name='Company 2')
+        assert self.summary().company_id == company.id
+        company.delete()
+        assert self.summary().company_id == self.company.id
+
+    def test_detail_single_query(self, assert_max_queries):
+        """ """
+        self.reserve()
+        self.detail()
+        with assert_max_queries(1):
+            response = self.detail()
+        assert response['reservation_count'] == 1
+        assert response['active_reservation_count'] == 1
+        assert response['company_id'] == self.company.id
+
+    def test_rebuild(self):
+        """ Drifted and missing summaries repaired"""
+        self.reserve()
+        UserSummary.objects.update(reservation_count=7, company=None)
+        other = UserFactory(username='other')
+        UserSummary.objects.filter(user=other).delete()
+        output = io.StringIO()
+        call_command('rebuild_user_summaries', stdout=output)
+        assert '2 user summaries rebuilt' in output.getvalue()
+        summary = self.summary()
+        assert summary.reservation_count == 1
+        assert summary.company_id == self.company.id
+        assert UserSummary.objects.filter(user=other).exists()
@@ -4,9 +4,12 @@ import urllib
 import http.client
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from django.urls import reverse
+from parking import availability, builder, response_cache, serializers
 from parking.models import (
     Company, Venue, LotPrice, Reservation, PaymentHistory)
 
@@ -15,6 +18,7 @@ from .fixtures.test_fixtures import (
     FloorVenueFactory, LotFactory, PriceFactory,
     UserFactory)
 from parking.models import Venue
+from parkinglot.mixins import get_cache_versions
 
 
 @pytest.mark.django_db
@@ -134,6 +138,115 @@ class TestCompanyAPI(object):
                     assert z['category'] in [
                         Venue.BUILDING, Venue.FLOOR, Venue.LOT]
 
+    def test_venue_tree_queries(self, client, user_company):
+        """ Tree rendering cost should not grow with no. of venues"""
+        company = user_company
+        build = BuildingVenueFactory(company=company, name='Building 1')
+        for floor in range(1, 4):
+            each_floor = FloorVenueFactory(
+                parent=build, name='Floor %s' % (floor))
+            for lot in range(1, 5):
+                LotFactory(parent=each_floor, name='Parking %s' % (lot))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse(
+                    'sub-venue-list',
+                    kwargs={
+                        'version': 1,
+                        'venue_id': build.id
+                    }
+                ),
+                content_type='application/json',
+                HTTP_AUTHORIZATION='Token %s' % (self.token)
+            )
+        assert response.status_code == 200
+        # Cache scope lookup, page and tree, no count with keyset pages
+        assert len(queries) <= 3
+        json_response = response.json()
+        assert json_response['count'] is None
+        assert len(json_response['results']) == 3
+        for floor in json_response['results']:
+            assert floor['total_lot'] == 4
+            assert floor['available_lot'] == 4
+            assert len(floor['children']) == 4
+            for lot in floor['children']:
+                assert lot['category'] == Venue.LOT
+                assert lot['children'] == []
+
+    def test_bulk_venue_build(self, client, user_company):
+        """ Whole building created with constant no. of queries"""
+        BuildingVenueFactory(company=user_company, name='Building 1')
+        spec = {
+            'name': 'Building 2',
+            'prices': [{
+                'key': 'hourly', 'name': 'Car price', 'duration': 1,
+                'duration_unit': LotPrice.HOUR, 'amount': 100
+            }],
+            'price': 'hourly',
+            'children': [
+                {'name': 'Floor %s' % (floor),
+                 'lots': {'count': 50, 'name': 'F%s-{number}' % (floor)}}
+                for floor in range(1, 4)
+            ] + [{'name': 'Entrance lot', 'category': Venue.LOT}]
+        }
+        url = reverse('venue-build', kwargs={
+            'version': 1, 'company_id': user_company.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                url, data=json.dumps(spec),
+                content_type='application/json',
+                HTTP_AUTHORIZATION='Token %s' % (self.token))
+        assert response.status_code == 201
+        assert len(queries) <= 20
+        json_response = response.json()
+        assert json_response['name'] == 'Building 2'
+        assert json_response['total_lot'] == 1
+        assert [floor['total_lot'] for floor in json_response[
+            'children']] == [50, 50, 50, 0]
+
+        building = Venue.objects.get(id=json_response['id'])
+        assert building.get_descendant_count() == 154
+        assert builder.next_tree_id() == building.tree_id + 1
+        assert building.lot_count == 1
+        assert building.get_children()[1].lot_count == 50
+        lots = building.get_descendants().filter(category=Venue.LOT)
+        assert set(lots.values_list('venue_price__name', flat=True)) == {
+            'Car price'}
+        user_company.refresh_from_db()
+        assert user_company.lot_count == 151
+        assert lots.get(name='F2-3').location == (
+            'Floor 2 floor, Company 1')
+        assert lots.get(name='Entrance lot').location == 'Company 1'
+
+        # Tree fields same as MPTT would compute
+        tree = list(Venue.objects.filter(tree_id=building.tree_id).order_by(
+            'id').values_list('lft', 'rght', 'level', 'parent_id'))
+        Venue.objects.partial_rebuild(building.tree_id)
+        assert tree == list(Venue.objects.filter(
+            tree_id=building.tree_id).order_by('id').values_list(
+                'lft', 'rght', 'level', 'parent_id'))
+
+    def test_bulk_venue_build_invalid(self, client, user_company):
+        """ """
+        spec = {
+            'name': 'Building 1',
+            'children': [
+                {'name': 'Floor 1', 'lots': {'count': 2, 'price': 'daily'}},
+                {'name': 'Lot 1', 'category': Venue.LOT,
+                 'children': [{'name': 'Lot 2'}]}
+            ]
+        }
+        response = self.client.post(
+            reverse('venue-build', kwargs={
+                'version': 1, 'company_id': user_company.id}),
+            data=json.dumps(spec),
+            content_type='application/json',
+            HTTP_AUTHORIZATION='Token %s' % (self.token))
+        assert response.status_code == 400
+        assert response.json()['children'][1]
+        assert not Venue.objects.filter(company=user_company).exists()
+
     def test_list_get_rate(self, client, user_company):
         """ """
         company = user_company
@@ -516,4 +629,324 @@ class TestReservationAPI(object):
         assert response.status_code == 400
         json_response = response.json()
         assert json_response['book_from']
-        assert json_response['book_to']
\ No newline at end of file
+        assert json_response['book_to']
+
+    # Both list share url name, so paths given directly
+    @pytest.mark.parametrize(
+        'url', ['/v1/reservation', '/v1/company-reservation'])
+    def test_reservation_list_queries(self, url, assert_max_queries):
+        """ Reservation page rendered without per row query"""
+        lot = LotFactory(
+            company=self.company, name='Parking 1', parent=None)
+        start = timezone.now() + relativedelta(days=2)
+        for x in range(10):
+            reservation = Reservation.objects.create(
+                venue=lot, user=self.user,
+                book_from=start + relativedelta(hours=x),
+                book_to=start + relativedelta(hours=x, minutes=30),
+                license='MH 04 1234', phone_number='+918082611337')
+            reservation.payment_history.create(
+                amount=10, payment_type=PaymentHistory.CASH)
+
+        # Token, validators, page and payments
+        with assert_max_queries(4):
+            response = self.client.get(
+                url, HTTP_AUTHORIZATION='Token %s' % (self.token))
+        assert response.status_code == 200
+        results = response.json()['results']
+        assert len(results) == 10
+        assert results[0]['venue']['name'] == 'Parking 1'
+        assert len(results[0]['payments']) == 1
+
+
+@pytest.mark.django_db
+class TestLotSearchAPI(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_token, user_company):
+        self.client = client
+        self.token = user_token.key
+        self.company = user_company
+        self.now = timezone.now()
+        cheap = PriceFactory(
+            company=self.company, duration=1,
+            duration_unit=LotPrice.HOUR, amount=10)
+        costly = PriceFactory(
+            company=self.company, duration=1,
+            duration_unit=LotPrice.HOUR, amount=50)
+        self.building = BuildingVenueFactory(company=self.company)
+        floor = FloorVenueFactory(parent=self.building)
+        self.near = LotFactory(
+            parent=self.building, name='Parking 1', venue_price=cheap)
+        self.far = LotFactory(
+            parent=floor, name='Parking 2', venue_price=cheap)
+        self.costly = LotFactory(
+            parent=floor, name='Parking 3', venue_price=costly)
+        self.busy = LotFactory(
+            parent=floor, name='Parking 4', venue_price=cheap)
+        Reservation.objects.create(
+            venue=self.busy,
+            book_from=self.now,
+            book_to=self.now + relativedelta(hours=10),
+            license='MH 04 1234',
+            phone_number='+918082611337')
+
+    def search(self, **params):
+        params.update({
+            'book_from': int(
+                (self.now + relativedelta(hours=1)).timestamp()),
+            'book_to': int((self.now + relativedelta(hours=3)).timestamp())
+        })
+        return self.client.get(
+            reverse('lot-search', kwargs={'version': 1}),
+            params,
+            HTTP_AUTHORIZATION='Token %s' % (self.token)
+        )
+
+    def test_search_ranking(self):
+        """ """
+        response = self.search(venue=self.building.id)
+        assert response.status_code == 200
+        results = response.json()['results']
+        assert [x['id'] for x in results] == [
+            self.near.id, self.far.id, self.costly.id]
+        assert results[0]['total_amount'] == '20.00'
+        assert results[0]['distance'] == 1
+        assert results[1]['distance'] == 2
+
+    def test_search_price_ceiling(self):
+        """ """
+        response = self.search(company=self.company.id, max_price=50)
+        assert response.status_code == 200
+        assert self.costly.id not in [
+            x['id'] for x in response.json()['results']]
+
+    def test_search_limited(self, monkeypatch):
+        """ Lots read in ranked chunks till enough free lots found"""
+        monkeypatch.setattr(serializers, 'MAX_SEARCH_RESULTS', 2)
+        monkeypatch.setattr(availability, 'QUERY_CHUNK_SIZE', 1)
+        availability.index.clear()
+        response = self.search(company=self.company.id)
+        assert [x['id'] for x in response.json()['results']] == [
+            self.near.id, self.far.id]
+        assert set(availability.index._lots) == {self.near.id, self.far.id}
+
+    def test_search_without_scope(self):
+        """ """
+        assert self.search().status_code == 400
+
+    def test_search_invalid_window(self):
+        """ """
+        response = self.client.get(
+            reverse('lot-search', kwargs={'version': 1}),
+            {'book_from': 20, 'book_to': 10},
+            HTTP_AUTHORIZATION='Token %s' % (self.token)
+        )
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestVenueResponseCache(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_company):
+        self.client = client
+        self.company = user_company
+        self.building = BuildingVenueFactory(
+            company=user_company, name='Building 1')
+        self.floor = FloorVenueFactory(parent=self.building, name='Floor 1')
+        self.lot = LotFactory(parent=self.floor, name='Parking 1')
+
+    def get(self, name, etag='', **kwargs):
+        kwargs['version'] = 1
+        return self.client.get(
+            reverse(name, kwargs=kwargs), content_type='application/json',
+            HTTP_IF_NONE_MATCH=etag)
+
+    def test_cached_venue_tree(self):
+        """ Repeated request served from cache with ETag"""
+        response = self.get('venue-tree', company_id=self.company.id)
+        assert response.status_code == 200
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.get('venue-tree', company_id=self.company.id)
+        assert len(queries) == 0
+        assert cached.json() == response.json()
+        assert cached['ETag'] == etag
+
+        not_modified = self.get(
+            'venue-tree', etag=etag, company_id=self.company.id)
+        assert not_modified.status_code == 304
+        assert not_modified['ETag'] == etag
+
+    def test_venue_write_expire_cache(self):
+        """ """
+        url_kwargs = {'venue_id': self.building.id}
+        response = self.get('sub-venue-list', **url_kwargs)
+        assert response.json()['results'][0]['total_lot'] == 1
+        tree = self.get('venue-tree', company_id=self.company.id).json()
+
+        LotFactory(parent=self.floor, name='Parking 2')
+
+        response = self.get('sub-venue-list', **url_kwargs)
+        assert response.json()['results'][0]['total_lot'] == 2
+        assert self.get(
+            'venue-tree', company_id=self.company.id).json() != tree
+
+    def test_reservation_write_expire_cache(self):
+        """ """
+        url_kwargs = {'venue_id': self.building.id}
+        response = self.get('sub-venue-list', **url_kwargs)
+        assert response.json()['results'][0]['available_lot'] == 1
+        now = timezone.now()
+        Reservation.objects.create(
+            venue=self.lot, book_from=now - relativedelta(hours=1),
+            book_to=now + relativedelta(hours=1), license='MH 04 1234',
+            phone_number='+918082611337', status=Reservation.ACTIVE)
+
+        response = self.get('sub-venue-list', **url_kwargs)
+        assert response.json()['results'][0]['available_lot'] == 0
+
+    def test_price_write_expire_cache(self):
+        """ """
+        etag = self.get('venue-tree', company_id=self.company.id)['ETag']
+        versions = get_cache_versions(
+            [response_cache.company_scope(self.company.id)])
+        PriceFactory(company=self.company)
+        assert get_cache_versions(
+            [response_cache.company_scope(self.company.id)]) != versions
+        assert self.get(
+            'venue-tree', company_id=self.company.id, etag=etag
+        ).status_code == 304
+
+
+@pytest.mark.django_db
+class TestConditionalGet(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_token, user_company):
+        self.client = client
+        self.token = user_token.key
+        self.user = user_token.user
+        self.company = user_company
+        self.price = PriceFactory(company=user_company)
+        self.lot = LotFactory(
+            company=user_company, name='Parking 1',
+            venue_price=self.price, parent=None)
+
+    def get(self, name, etag=None, **kwargs):
+        kwargs['version'] = 1
+        headers = {'HTTP_AUTHORIZATION': 'Token %s' % (self.token)}
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get(reverse(name, kwargs=kwargs), **headers)
+
+    def test_reservation_detail(self):
+        """ Unchanged reservation answered with 304 without body"""
+        now = timezone.now()
+        reservation = Reservation.objects.create(
+            venue=self.lot, book_from=now + relativedelta(days=2),
+            book_to=now + relativedelta(days=3), license='MH 04 1234',
+            phone_number='+918082611337', user=self.user)
+        response = self.get(
+            'reservation-detail', reservation_id=reservation.id)
+        assert response.status_code == 200
+        etag = response['ETag']
+        assert response['Last-Modified']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(
+                'reservation-detail', etag=etag,
+                reservation_id=reservation.id)
+        assert response.status_code == 304
+        assert response.content == b''
+        # Validator aggregate only, token served from auth cache
+        assert len(queries) == 1
+
+        reservation.license = 'MH 04 4321'
+        reservation.save()
+        response = self.get(
+            'reservation-detail', etag=etag, reservation_id=reservation.id)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_company_list(self):
+        """ Lot counter change modify company"""
+        etag = self.get('company')['ETag']
+        assert self.get('company', etag=etag).status_code == 304
+        self.lot.delete()
+        response = self.get('company', etag=etag)
+        assert response.status_code == 200
+        assert response.json()['results'][0]['total_lot'] == 0
+
+    def test_venue_detail_price_change(self):
+        """ """
+        etag = self.get('venue-detail', venue_id=self.lot.id)['ETag']
+        assert self.get(
+            'venue-detail', etag=etag, venue_id=self.lot.id
+        ).status_code == 304
+        self.price.amount = 150
+        self.price.save()
+        response = self.get('venue-detail', etag=etag, venue_id=self.lot.id)
+        assert response.status_code == 200
+        assert float(response.json()['price']['amount']) == 150
+
+
+@pytest.mark.django_db
+class TestVenueLocation(object):
+
+    @pytest.fixture(autouse=True)
+    def setup(self, client, user_token, user_company):
+        self.client = client
+        self.token = user_token.key
+        self.company = user_company
+        self.building = BuildingVenueFactory(company=user_company)
+        self.floor = FloorVenueFactory(parent=self.building)
+        self.lot = LotFactory(parent=self.floor)
+
+    def location(self, venue):
+        venue.refresh_from_db()
+        return venue.location
+
+    def test_location(self):
+        """ """
+        assert self.location(self.building) == 'Company 1'
+        assert self.location(self.floor) == 'Company 1'
+        assert self.location(self.lot) == 'Floor 1 floor, Company 1'
+
+    def test_ancestor_renamed(self):
+        """ """
+        self.floor.name = 'Ground'
+        self.floor.save()
+        assert self.location(self.lot) == 'Ground floor, Company 1'
+        self.company.name = 'Company 2'
+        self.company.save()
+        assert self.location(self.floor) == 'Company 2'
+        assert self.location(self.lot) == 'Ground floor, Company 2'
+
+    def test_venue_moved(self):
+        """ """
+        other = BuildingVenueFactory(company=CompanyFactory(
+            user=UserFactory(username='other'), name='Company 2'))
+        floor = FloorVenueFactory(parent=other, name='Floor 2')
+        self.floor.parent = other
+        self.floor.save()
+        assert self.location(self.floor) == 'Company 2'
+        self.lot.parent = floor
+        self.lot.save()
+        assert self.location(self.lot) == 'Floor 2 floor, Company 2'
+
+    def test_venue_list_queries(self, assert_max_queries):
+        """ Location read without query per venue"""
+        for x in range(5):
+            LotFactory(parent=self.floor, name='Lot %s' % (x + 2))
+        with assert_max_queries(6):
+            response = self.client.get(
+                '/v1/venue', HTTP_AUTHORIZATION='Token %s' % (self.token))
+        assert response.status_code == 200
+        lots = [
+            venue for venue in response.json()['results']
+            if venue['category'] == Venue.LOT]
+        assert len(lots) == 6
+        assert set(venue['location'] for venue in lots) == {
+            'Floor 1 floor, Company 1'}